@@ -4,12 +4,12 @@ Run from project root:
     python app.py
 """
 
+import cProfile
 import os
-import csv
-import io
 import secrets
 import time
 import uuid
+from contextlib import nullcontext
 from urllib.parse import urlparse
 from datetime import datetime
 from datetime import timedelta
@@ -17,9 +17,15 @@ from datetime import timezone
 from pathlib import Path
 from typing import Any
 
-from flask import Flask, Response, g, jsonify, redirect, render_template, request, session as flask_session, url_for
+try:
+    import resource
+except ImportError:  # pragma: no cover - non-POSIX
+    resource = None
+
+from flask import Flask, Response, g, has_request_context, jsonify, redirect, render_template, request, session as flask_session, url_for
 
 from bac_app import calculations
+from bac_app import capture, memtrack, metrics, querytrace
 from bac_app.auth_store import (
     add_friendship,
     are_friends,
@@ -41,6 +47,7 @@ from bac_app.auth_store import (
     list_friends,
     list_favorite_drinks,
     list_recent_session_payloads,
+    backfill_session_summaries,
     list_emergency_contacts,
     add_emergency_contact,
     delete_emergency_contact,
@@ -65,10 +72,14 @@ from bac_app.auth_store import (
     create_group_alert,
     get_group_snapshot_by_guardian_token,
     maybe_create_threshold_alert,
+    normalize_presence_cursor,
+    presence_cursor_now,
     get_active_auto_session,
     upsert_auto_session,
     finalize_active_auto_session,
-    upsert_presence,
+    apply_session_event_changes,
+    reset_session_events,
+    record_presence,
     list_guardian_links,
     revoke_guardian_link,
     set_guardian_link_alerts,
@@ -80,10 +91,16 @@ from bac_app.auth_store import (
 from bac_app.catalog import list_all_flat, list_by_category
 from bac_app.drive import get_drive_advice
 from bac_app.drinks import list_drink_types
+from bac_app.export import stream_account_archive, stream_session_export
+from bac_app.importer import IMPORT_SESSION_GAP_HOURS, import_sessions
+from bac_app.maintenance import MaintenanceScheduler
 from bac_app.feedback_store import init_db as init_feedback_db
 from bac_app.feedback_store import list_recent, save_feedback
 from bac_app.hangover import get_plan as get_hangover_plan
+from bac_app.presence import presence_model
+from bac_app.profiling import StackSampler, format_stats
 from bac_app.session import Session
+from bac_app.timing import PhaseTimer
 
 app = Flask(__name__)
 app.config["SECRET_KEY"] = os.environ.get("APP_SECRET_KEY", "dev-only-change-me")
@@ -91,6 +108,8 @@ app.config["SESSION_COOKIE_SAMESITE"] = "Lax"
 app.config["SESSION_COOKIE_HTTPONLY"] = True
 app.config["SESSION_COOKIE_SECURE"] = os.environ.get("SESSION_COOKIE_SECURE", "0") == "1"
 app.config["PERMANENT_SESSION_LIFETIME"] = timedelta(days=30)
+if os.environ.get("MEMORY_TRACKING", "0").strip().lower() in {"1", "true", "yes", "on"}:
+    memtrack.start(int(os.environ.get("MEMORY_TRACKING_FRAMES", memtrack.DEFAULT_TRACE_FRAMES)))
 
 MIN_WEIGHT_LB = 80.0
 MAX_WEIGHT_LB = 400.0
@@ -104,6 +123,9 @@ CSRF_TOKEN_KEY = "csrf_token"
 INACTIVITY_EXPIRE_HOURS = 3.0
 MAX_ACTIVE_SESSION_HOURS = 12.0
 AUTOSAVE_INTERVAL_MINUTES = 15.0
+SESSION_PAGE_SIZE = 200
+SESSION_DATES_PAGE_SIZE = 120
+SESSION_IMPORT_MAX_BYTES = 5 * 1024 * 1024
 LOGIN_RATE_LIMIT_WINDOW_SEC = 300
 LOGIN_RATE_LIMIT_MAX_ATTEMPTS = 8
 PASSWORD_RESET_RATE_LIMIT_WINDOW_SEC = 3600
@@ -112,6 +134,11 @@ FEEDBACK_RATE_LIMIT_WINDOW_SEC = 60
 FEEDBACK_RATE_LIMIT_MAX_REQUESTS = 8
 SOCIAL_WRITE_RATE_LIMIT_WINDOW_SEC = 60
 SOCIAL_WRITE_RATE_LIMIT_MAX_REQUESTS = 20
+ACCOUNT_EXPORT_RATE_LIMIT_WINDOW_SEC = 3600
+ACCOUNT_EXPORT_RATE_LIMIT_MAX_REQUESTS = 5
+PROFILE_RATE_LIMIT_WINDOW_SEC = 300
+PROFILE_RATE_LIMIT_MAX_REQUESTS = 5
+REQUEST_PROFILE_RATE_LIMIT_MAX_REQUESTS = 30
 DEFAULT_WRITE_RATE_LIMIT_WINDOW_SEC = 60
 DEFAULT_WRITE_RATE_LIMIT_MAX_REQUESTS = 90
 ALLOWED_SIP_MINUTES = {0, 15, 30}
@@ -157,12 +184,26 @@ CATALOG_CACHE: dict[str, Any] | None = None
 LOGIN_ATTEMPTS: dict[str, list[float]] = {}
 RATE_LIMIT_BUCKETS: dict[str, dict[str, list[float]]] = {}
 STARTUP_CHECK_DONE = False
+# (kind, db_path) -> identity of the database file when its schema pass last ran.
+INITIALIZED_DBS: dict[tuple[str, str], tuple[int, int] | None] = {}
+MAINTENANCE_SCHEDULER: MaintenanceScheduler | None = None
+STACK_SAMPLER = StackSampler()
 
 
 @app.before_request
 def _start_timer():
-    g._request_started = time.time()
+    g._request_started = time.perf_counter()
     g._request_id = str(uuid.uuid4())
+    metrics.track_in_flight(1)
+    g._in_flight = True
+    g._query_trace = querytrace.start(request.path)
+    g._timings = PhaseTimer()
+    g._alloc_start = memtrack.begin_request()
+    g._capture_actor = _capture_actor()
+    g._capture = capture.should_capture(request.path, g._capture_actor)
+    if request.args.get("profile") == "1" and _request_profiling_allowed():
+        g._profiler = cProfile.Profile()
+        g._profiler.enable()
     if request.path not in {"/healthz", "/readyz"}:
         _run_startup_storage_checks()
     if _csrf_required_for_request():
@@ -184,26 +225,84 @@ def _start_timer():
 
 @app.after_request
 def _log_request(response):
+    profiler = g.pop("_profiler", None)
+    if profiler is not None:
+        profiler.disable()
+        status = response.status_code
+        response = Response(format_stats(profiler), mimetype="text/plain")
+        response.headers["X-Profiled-Status"] = str(status)
     started = getattr(g, "_request_started", None)
     request_id = getattr(g, "_request_id", None) or str(uuid.uuid4())
     response.headers["X-Request-ID"] = request_id
     if started is not None:
-        elapsed_ms = int((time.time() - started) * 1000)
+        elapsed = time.perf_counter() - started
+        route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        metrics.observe_request(method=request.method, route=route, status=response.status_code, seconds=elapsed)
+        alloc_peak = memtrack.request_peak(getattr(g, "_alloc_start", None))
+        if alloc_peak is not None:
+            metrics.observe_request_alloc(method=request.method, route=route, peak_bytes=alloc_peak)
+        trace = getattr(g, "_query_trace", None)
+        timings = getattr(g, "_timings", None)
+        if timings is not None:
+            if trace is not None and trace.query_count:
+                timings.add("db", trace.total_ms)
+            timings.add("total", elapsed * 1000.0)
+            if request.path.startswith("/api/"):
+                response.headers["Server-Timing"] = timings.header()
         app.logger.info(
-            "request_id=%s %s %s -> %s in %sms",
+            "request_id=%s %s %s -> %s in %.1fms queries=%s conns=%s db_ms=%.1f rows=%s timing=%s",
             request_id,
             request.method,
             request.path,
             response.status_code,
-            elapsed_ms,
+            elapsed * 1000.0,
+            trace.query_count if trace else 0,
+            trace.connections if trace else 0,
+            trace.total_ms if trace else 0.0,
+            trace.rows if trace else 0,
+            timings.log_fields() if timings is not None else "",
         )
+        for stats in trace.repeated() if trace else []:
+            app.logger.warning(
+                "request_id=%s possible N+1: %s statements x%s (%.1fms): %s",
+                request_id,
+                request.path,
+                stats.count,
+                stats.total_ms,
+                stats.fingerprint[:200],
+            )
+        if g.pop("_capture", False):
+            capture.write(
+                capture.build_record(
+                    ts=time.time() - elapsed,
+                    method=request.method,
+                    route=route,
+                    status=response.status_code,
+                    duration_ms=elapsed * 1000.0,
+                    # Logging in or registering sets the actor mid-request; logging out clears it.
+                    actor=_capture_actor() or g.get("_capture_actor"),
+                    view_args=request.view_args,
+                    query_keys=list(request.args.keys()),
+                    body=request.get_json(silent=True) if request.method in {"POST", "PUT", "PATCH", "DELETE"} else None,
+                )
+            )
     if request.path.startswith("/api/"):
         response.headers["Cache-Control"] = "no-store, no-cache, must-revalidate, max-age=0"
         response.headers["Pragma"] = "no-cache"
         response.headers["Expires"] = "0"
+    metrics.maybe_flush()
     return response
 
 
+@app.teardown_request
+def _end_request(_exc):
+    if g.pop("_in_flight", False):
+        metrics.track_in_flight(-1)
+    trace = g.pop("_query_trace", None)
+    if trace is not None:
+        querytrace.finish(trace)
+
+
 def _feedback_db_path() -> str:
     explicit = os.environ.get("FEEDBACK_DB_PATH")
     if explicit is not None and str(explicit).strip():
@@ -223,20 +322,43 @@ def _is_db_url(value: str) -> bool:
     return value.startswith("postgres://") or value.startswith("postgresql://")
 
 
+def _db_file_id(db_path: str) -> tuple[int, int] | None:
+    """(device, inode) of a SQLite file, so a deleted or replaced file is set up again."""
+    if _is_db_url(db_path):
+        return None
+    try:
+        stat = os.stat(db_path)
+    except OSError:
+        return (0, 0)
+    return (stat.st_dev, stat.st_ino)
+
+
+def _schema_ready(kind: str, db_path: str) -> bool:
+    key = (kind, db_path)
+    return key in INITIALIZED_DBS and INITIALIZED_DBS[key] == _db_file_id(db_path)
+
+
 def _ensure_feedback_db() -> None:
     db_path = _feedback_db_path()
+    if _schema_ready("feedback", db_path):
+        return
     if not _is_db_url(db_path):
         path_obj = Path(db_path)
         path_obj.parent.mkdir(parents=True, exist_ok=True)
     init_feedback_db(str(db_path))
+    INITIALIZED_DBS[("feedback", db_path)] = _db_file_id(db_path)
 
 
 def _ensure_auth_db() -> None:
+    # Routes call this on every request; the schema pass only needs to run once per database file.
     db_path = _auth_db_path()
+    if _schema_ready("auth", db_path):
+        return
     if not _is_db_url(db_path):
         path_obj = Path(db_path)
         path_obj.parent.mkdir(parents=True, exist_ok=True)
     init_auth_db(str(db_path))
+    INITIALIZED_DBS[("auth", db_path)] = _db_file_id(db_path)
 
 
 def _run_startup_storage_checks() -> None:
@@ -253,6 +375,35 @@ def _run_startup_storage_checks() -> None:
         app.logger.exception("startup storage check failed")
         raise
     STARTUP_CHECK_DONE = True
+    try:
+        backfilled = backfill_session_summaries(auth_path)
+    except Exception:
+        app.logger.exception("session summary backfill failed")
+    else:
+        if backfilled:
+            app.logger.info("session summary backfill rows=%s", backfilled)
+    _start_maintenance_scheduler()
+
+
+def _maintenance_enabled() -> bool:
+    if app.config.get("TESTING"):
+        return False
+    raw = os.environ.get("MAINTENANCE_SCHEDULER", "1")
+    return str(raw).strip().lower() not in {"0", "false", "no", "off"}
+
+
+def _start_maintenance_scheduler() -> None:
+    global MAINTENANCE_SCHEDULER
+    if MAINTENANCE_SCHEDULER is not None or not _maintenance_enabled():
+        return
+    MAINTENANCE_SCHEDULER = MaintenanceScheduler(
+        _auth_db_path(),
+        feedback_db_path=_feedback_db_path(),
+        interval_sec=_env_int("MAINTENANCE_INTERVAL_SEC", 300, min_value=30, max_value=86400),
+        inactive_hours=INACTIVITY_EXPIRE_HOURS,
+        max_active_hours=MAX_ACTIVE_SESSION_HOURS,
+    )
+    MAINTENANCE_SCHEDULER.start()
 
 
 
@@ -261,12 +412,39 @@ def _admin_token() -> str:
     return os.environ.get("ADMIN_TOKEN", "")
 
 
+def _admin_header_ok() -> bool:
+    """Admin token from `Authorization: Bearer` or `X-Admin-Token`, for routes where `token` means something else."""
+    expected = _admin_token()
+    auth = request.headers.get("Authorization", "")
+    provided = auth[len("Bearer ") :].strip() if auth.startswith("Bearer ") else request.headers.get("X-Admin-Token", "")
+    return bool(expected) and secrets.compare_digest(provided, expected)
+
+
+def _profiling_enabled() -> bool:
+    raw = os.environ.get("PROFILING_ENABLED", "0")
+    return str(raw).strip().lower() in {"1", "true", "yes", "on"}
+
+
+def _request_profiling_allowed() -> bool:
+    if not _profiling_enabled() or not _admin_header_ok():
+        return False
+    return _check_rate_limit(
+        "request_profile",
+        "admin",
+        window_sec=PROFILE_RATE_LIMIT_WINDOW_SEC,
+        max_requests=REQUEST_PROFILE_RATE_LIMIT_MAX_REQUESTS,
+    )
+
+
 def _check_login_rate_limit(key: str) -> bool:
     now = time.time()
     attempts = LOGIN_ATTEMPTS.get(key, [])
     attempts = [x for x in attempts if now - x <= LOGIN_RATE_LIMIT_WINDOW_SEC]
     LOGIN_ATTEMPTS[key] = attempts
-    return len(attempts) < LOGIN_RATE_LIMIT_MAX_ATTEMPTS
+    if len(attempts) >= LOGIN_RATE_LIMIT_MAX_ATTEMPTS:
+        metrics.record_rate_limit_rejection("login")
+        return False
+    return True
 
 
 def _record_login_attempt(key: str) -> None:
@@ -285,6 +463,7 @@ def _check_rate_limit(bucket: str, key: str, *, window_sec: int, max_requests: i
     attempts = [x for x in attempts if now - x <= window]
     if len(attempts) >= cap:
         bucket_map[key] = attempts
+        metrics.record_rate_limit_rejection(bucket)
         return False
     attempts.append(now)
     bucket_map[key] = attempts
@@ -567,8 +746,21 @@ def _compare_curve_from_history(user_id: int, model: Session, base_curve: list[t
     return points
 
 
+def _presence_model(model: Session | None) -> str | None:
+    if model is None:
+        return None
+    return presence_model(model.events_bac, model.weight_lb, model.is_male)
+
+
+def _timed(phase: str):
+    """Time a block as a Server-Timing phase of the current request."""
+    timings = getattr(g, "_timings", None) if has_request_context() else None
+    return timings.phase(phase) if timings is not None else nullcontext()
+
+
 def get_session() -> Session | None:
-    return _session_from_cookie(flask_session.get(SESSION_KEY))
+    with _timed("session_decode"):
+        return _session_from_cookie(flask_session.get(SESSION_KEY))
 
 
 def set_session(model: Session | None):
@@ -637,7 +829,19 @@ def _touch_tracking_meta(*, on_drink: bool = False, reset: bool = False) -> dict
     return meta
 
 
-def _record_auto_session(user_id: int, model: Session, *, touch_last_event: bool) -> None:
+def _absolute_events(events: list[tuple[float, float, int, float, float]], *, now_epoch: float) -> list[tuple[int, float, int, float, float]]:
+    return [
+        (int(round(now_epoch + float(t) * 3600.0)), float(grams), int(calories), float(carbs), float(sugar))
+        for t, grams, calories, carbs, sugar in events
+    ]
+
+
+def _record_auto_session(user_id: int, model: Session, *, touch_last_event: bool, seed_events: bool = False) -> None:
+    """Write a compacted snapshot of the active auto session.
+
+    With `seed_events` the session's event log is also reset to the model's
+    drinks, for sessions created before the log existed or after a mismatch.
+    """
     _ensure_auth_db()
     meta = _get_tracking_meta()
     event_time_iso = _now_iso()
@@ -646,8 +850,7 @@ def _record_auto_session(user_id: int, model: Session, *, touch_last_event: bool
     if not meta.get("session_started_at"):
         meta["session_started_at"] = event_time_iso
     meta["last_autosave_at"] = event_time_iso
-    _set_tracking_meta(meta)
-    upsert_auto_session(
+    session_id = upsert_auto_session(
         _auth_db_path(),
         user_id=user_id,
         name=_default_auto_session_name(),
@@ -655,11 +858,62 @@ def _record_auto_session(user_id: int, model: Session, *, touch_last_event: bool
         event_time_iso=event_time_iso,
         touch_last_event=touch_last_event,
     )
+    meta["auto_session_id"] = session_id
+    _set_tracking_meta(meta)
+    if seed_events:
+        reset_session_events(
+            _auth_db_path(),
+            user_id=user_id,
+            session_id=session_id,
+            events=_absolute_events(model.events_full, now_epoch=time.time()),
+            logged_at_iso=event_time_iso,
+        )
+
+
+def _log_session_changes(
+    user_id: int,
+    model: Session,
+    *,
+    removed: list[tuple[float, float, int, float, float]] | None = None,
+    added: list[tuple[float, float, int, float, float]] | None = None,
+    touch_last_event: bool = False,
+) -> None:
+    """Append drink edits to the session event log instead of rewriting the snapshot.
+
+    Falls back to a full snapshot (and log reset) when there is no known active
+    session or the log no longer matches the client's events.
+    """
+    _ensure_auth_db()
+    meta = _get_tracking_meta()
+    session_id = meta.get("auto_session_id")
+    now_epoch = time.time()
+    event_time_iso = _now_iso()
+    if isinstance(session_id, int) and apply_session_event_changes(
+        _auth_db_path(),
+        user_id=user_id,
+        session_id=session_id,
+        removed=_absolute_events(removed or [], now_epoch=now_epoch),
+        added=_absolute_events(added or [], now_epoch=now_epoch),
+        logged_at_iso=event_time_iso,
+    ):
+        if touch_last_event:
+            meta["last_drink_at"] = event_time_iso
+        if not meta.get("session_started_at"):
+            meta["session_started_at"] = event_time_iso
+        _set_tracking_meta(meta)
+        return
+    if model.events_full:
+        _record_auto_session(user_id, model, touch_last_event=touch_last_event, seed_events=True)
 
 
 def _finalize_auto_session_and_reset(user_id: int, model: Session | None) -> None:
     _ensure_auth_db()
-    finalize_active_auto_session(_auth_db_path(), user_id=user_id, ended_at_iso=_now_iso())
+    finalize_active_auto_session(
+        _auth_db_path(),
+        user_id=user_id,
+        ended_at_iso=_now_iso(),
+        payload=_session_to_cookie(model) if model is not None and model.events else None,
+    )
     if model is not None:
         set_session(Session(weight_lb=model.weight_lb, is_male=model.is_male))
     _set_tracking_meta(None)
@@ -690,6 +944,11 @@ def _require_user_id() -> int | None:
     return user_id if isinstance(user_id, int) else None
 
 
+def _capture_actor() -> str | None:
+    user_id = _require_user_id()
+    return capture.pseudonym("user", user_id) if user_id is not None else None
+
+
 def _get_current_user() -> dict[str, Any] | None:
     user_id = _require_user_id()
     if user_id is None:
@@ -710,6 +969,21 @@ def _is_valid_date_yyyy_mm_dd(value: str) -> bool:
         return False
 
 
+def _incremental_cursor_args() -> tuple[int | None, str | None, bool]:
+    """Parse `since_alert_id` / `updated_since` query cursors.
+
+    Returns (since_alert_id, updated_since, cursor_expired). An expired or
+    malformed `updated_since` is dropped so the caller serves a full resync.
+    """
+    since_alert_id = request.args.get("since_alert_id", type=int)
+    if since_alert_id is not None and since_alert_id < 0:
+        since_alert_id = None
+    raw_updated_since = request.args.get("updated_since", type=str)
+    updated_since = normalize_presence_cursor(raw_updated_since)
+    cursor_expired = bool(raw_updated_since) and updated_since is None
+    return since_alert_id, updated_since, cursor_expired
+
+
 def _social_payload(user_id: int) -> dict[str, Any]:
     _ensure_auth_db()
     return {
@@ -991,6 +1265,25 @@ def api_account_privacy_summary():
     return jsonify({"ok": True, "summary": get_privacy_summary(_auth_db_path(), user_id=user_id)})
 
 
+@app.route("/api/account/export")
+def api_account_export():
+    user_id = _require_user_id()
+    if user_id is None:
+        return _auth_required_error()
+    if not _check_rate_limit(
+        "account_export",
+        f"user:{user_id}",
+        window_sec=ACCOUNT_EXPORT_RATE_LIMIT_WINDOW_SEC,
+        max_requests=ACCOUNT_EXPORT_RATE_LIMIT_MAX_REQUESTS,
+    ):
+        return jsonify({"error": "Too many export requests. Please try again later."}), 429
+    _ensure_auth_db()
+
+    filename_date = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+    headers = {"Content-Disposition": f'attachment; filename="bac-account-{filename_date}.zip"'}
+    return Response(stream_account_archive(_auth_db_path(), user_id=user_id), headers=headers, mimetype="application/zip")
+
+
 @app.route("/api/account/emergency-contacts")
 def api_account_emergency_contacts_list():
     user_id = _require_user_id()
@@ -1191,8 +1484,17 @@ def api_social_feed():
     if user_id is None:
         return _auth_required_error()
     _ensure_auth_db()
-    items = list_friend_feed(_auth_db_path(), user_id=user_id)
-    return jsonify({"items": items})
+    _, updated_since, cursor_expired = _incremental_cursor_args()
+    issued_at = presence_cursor_now()
+    items = list_friend_feed(_auth_db_path(), user_id=user_id, updated_since=updated_since)
+    return jsonify(
+        {
+            "items": items,
+            "incremental": updated_since is not None,
+            "resync": cursor_expired,
+            "cursor": {"updated_since": issued_at},
+        }
+    )
 
 
 @app.route("/api/social/groups")
@@ -1256,9 +1558,18 @@ def api_social_group_snapshot(group_id: int):
     if user_id is None:
         return _auth_required_error()
     _ensure_auth_db()
-    snap = get_group_snapshot(_auth_db_path(), group_id=group_id, user_id=user_id)
+    since_alert_id, updated_since, cursor_expired = _incremental_cursor_args()
+    snap = get_group_snapshot(
+        _auth_db_path(),
+        group_id=group_id,
+        user_id=user_id,
+        since_alert_id=since_alert_id,
+        updated_since=updated_since,
+    )
     if snap is None:
         return jsonify({"error": "Group not found or access denied"}), 404
+    if cursor_expired:
+        snap["resync"] = True
     return jsonify(snap)
 
 
@@ -1324,9 +1635,17 @@ def api_social_group_guardian_links_alerts(group_id: int, link_id: int):
 @app.route("/api/guardian/<token>")
 def api_guardian_snapshot(token: str):
     _ensure_auth_db()
-    snap = get_group_snapshot_by_guardian_token(_auth_db_path(), token=token)
+    since_alert_id, updated_since, cursor_expired = _incremental_cursor_args()
+    snap = get_group_snapshot_by_guardian_token(
+        _auth_db_path(),
+        token=token,
+        since_alert_id=since_alert_id,
+        updated_since=updated_since,
+    )
     if snap is None:
         return jsonify({"error": "Guardian link is invalid or revoked"}), 404
+    if cursor_expired:
+        snap["resync"] = True
     return jsonify(snap)
 
 
@@ -1397,7 +1716,14 @@ def api_social_group_location(group_id: int):
     model = get_session()
     bac_now = round(model.bac_now(0.0), 4) if model else 0.0
     drink_count = len(model.events) if model else 0
-    upsert_presence(_auth_db_path(), user_id=user_id, bac_now=bac_now, drink_count=drink_count, location_note=note)
+    record_presence(
+        _auth_db_path(),
+        user_id=user_id,
+        bac_now=bac_now,
+        drink_count=drink_count,
+        location_note=note,
+        bac_model=_presence_model(model),
+    )
     if preset == "home_safe":
         create_group_alert(
             _auth_db_path(),
@@ -1629,10 +1955,15 @@ def api_setup():
     data = request.get_json() or {}
     weight = _clamp_float(data.get("weight_lb"), 160.0, MIN_WEIGHT_LB, MAX_WEIGHT_LB)
     is_male = _parse_bool(data.get("is_male"), default=True)
+    previous = get_session()
     set_session(Session(weight_lb=weight, is_male=is_male))
     _set_tracking_meta(None)
     _ensure_auth_db()
-    finalize_active_auto_session(_auth_db_path(), user_id=user_id)
+    finalize_active_auto_session(
+        _auth_db_path(),
+        user_id=user_id,
+        payload=_session_to_cookie(previous) if previous is not None and previous.events else None,
+    )
     return jsonify({"ok": True, "weight_lb": weight, "is_male": is_male})
 
 
@@ -1663,6 +1994,7 @@ def api_drink():
     # Sip mode approximates a drink consumed over time by placing the event at
     # the midpoint of the selected sipping window.
     effective_hours_ago = min(MAX_HOURS_AGO, hours_ago + (sip_minutes / 120.0))
+    before_events = list(model.events_full)
 
     if data.get("catalog_id"):
         catalog_id = data["catalog_id"]
@@ -1675,7 +2007,10 @@ def api_drink():
         model.add_drink_ago(effective_hours_ago, drink_key, count)
 
     set_session(model)
-    _record_auto_session(user_id, model, touch_last_event=True)
+    added = list(model.events_full)
+    for event in before_events:
+        added.remove(event)
+    _log_session_changes(user_id, model, added=added, touch_last_event=True)
     return jsonify({"ok": True})
 
 
@@ -1692,23 +2027,25 @@ def api_state():
 
     if model is None:
         _ensure_auth_db()
-        upsert_presence(_auth_db_path(), user_id=user_id, bac_now=0.0, drink_count=0)
+        record_presence(_auth_db_path(), user_id=user_id, bac_now=0.0, drink_count=0)
         return jsonify({"authenticated": True, **_empty_state()})
 
     events = model.events
-    start_h = min((t for t, _ in events), default=0) - 0.5
-    start_h = min(start_h, -0.25)
-    end_h = model.hours_until_sober_from_now() + 1.0
-    curve = model.curve(step_hours=0.25, start_hours=start_h, max_hours=max(end_h, 2))
+    with _timed("compute.curve"):
+        start_h = min((t for t, _ in events), default=0) - 0.5
+        start_h = min(start_h, -0.25)
+        end_h = model.hours_until_sober_from_now() + 1.0
+        curve = model.curve(step_hours=0.25, start_hours=start_h, max_hours=max(end_h, 2))
 
     hangover_plan = None
-    if hours_until_target is not None and hours_until_target >= 0:
-        hangover_plan = get_hangover_plan(
-            model.events_bac,
-            model.weight_lb,
-            model.is_male,
-            hours_until_target,
-        )
+    with _timed("compute.plan"):
+        if hours_until_target is not None and hours_until_target >= 0:
+            hangover_plan = get_hangover_plan(
+                model.events_bac,
+                model.weight_lb,
+                model.is_male,
+                hours_until_target,
+            )
 
     bac_now = round(model.bac_now(0.0), 4)
     _ensure_auth_db()
@@ -1717,24 +2054,33 @@ def api_state():
         mins_since_save = _minutes_since(meta.get("last_autosave_at"))
         if mins_since_save is None or mins_since_save >= AUTOSAVE_INTERVAL_MINUTES:
             _record_auto_session(user_id, model, touch_last_event=False)
-    upsert_presence(_auth_db_path(), user_id=user_id, bac_now=bac_now, drink_count=len(events))
-    maybe_create_threshold_alert(_auth_db_path(), user_id=user_id, bac_now=bac_now)
-    one_more_events = list(model.events_bac) + [(0.0, 14.0)]
-    bac_30_if_one_more = calculations.bac_at_time(0.5, one_more_events, model.weight_lb, model.is_male)
-    grams_per_hour = _estimate_rate_grams_per_hour(model.events_bac)
-    drinks_per_hour = grams_per_hour / 14.0 if grams_per_hour > 0 else 0.0
-    pace_curve = _project_curve_with_rate(
-        model.events_bac,
-        grams_per_hour=grams_per_hour,
-        weight_lb=model.weight_lb,
-        is_male=model.is_male,
-        horizon_hours=max(0.0, model.hours_until_sober_from_now()),
+    record_presence(
+        _auth_db_path(),
+        user_id=user_id,
+        bac_now=bac_now,
+        drink_count=len(events),
+        bac_model=_presence_model(model),
     )
-    confidence = _confidence_band(curve)
-    markers = _event_markers(model.events_bac, weight_lb=model.weight_lb, is_male=model.is_male)
-    compare_curve = _compare_curve_from_history(user_id, model, curve)
-    what_if_one_now = _single_drink_projection(model.events_bac, at_hours=0.0, weight_lb=model.weight_lb, is_male=model.is_male)
-    what_if_one_in_1h = _single_drink_projection(model.events_bac, at_hours=1.0, weight_lb=model.weight_lb, is_male=model.is_male)
+    maybe_create_threshold_alert(_auth_db_path(), user_id=user_id, bac_now=bac_now)
+    with _timed("compute.curve"):
+        one_more_events = list(model.events_bac) + [(0.0, 14.0)]
+        bac_30_if_one_more = calculations.bac_at_time(0.5, one_more_events, model.weight_lb, model.is_male)
+        grams_per_hour = _estimate_rate_grams_per_hour(model.events_bac)
+        drinks_per_hour = grams_per_hour / 14.0 if grams_per_hour > 0 else 0.0
+        pace_curve = _project_curve_with_rate(
+            model.events_bac,
+            grams_per_hour=grams_per_hour,
+            weight_lb=model.weight_lb,
+            is_male=model.is_male,
+            horizon_hours=max(0.0, model.hours_until_sober_from_now()),
+        )
+        confidence = _confidence_band(curve)
+        markers = _event_markers(model.events_bac, weight_lb=model.weight_lb, is_male=model.is_male)
+    with _timed("compute.history"):
+        compare_curve = _compare_curve_from_history(user_id, model, curve)
+    with _timed("compute.curve"):
+        what_if_one_now = _single_drink_projection(model.events_bac, at_hours=0.0, weight_lb=model.weight_lb, is_male=model.is_male)
+        what_if_one_in_1h = _single_drink_projection(model.events_bac, at_hours=1.0, weight_lb=model.weight_lb, is_male=model.is_male)
 
     below_legal_time = None
     if bac_now >= 0.08:
@@ -1768,24 +2114,27 @@ def api_state():
         ),
     }
 
-    return jsonify({
-        "authenticated": True,
-        "configured": True,
-        "weight_lb": model.weight_lb,
-        "is_male": model.is_male,
-        "bac_now": bac_now,
-        "curve": [{"t": t, "bac": bac} for t, bac in curve],
-        "hours_until_sober_from_now": model.hours_until_sober_from_now(),
-        "session_events": _session_events_payload(model),
-        "drink_count": len(events),
-        "total_calories": model.total_calories,
-        "total_carbs_g": round(model.total_carbs_g, 1),
-        "total_sugar_g": round(model.total_sugar_g, 1),
-        "hangover_plan": hangover_plan,
-        "drive_advice": get_drive_advice(bac_now, model.hours_until_sober_from_now()),
-        "pace_prediction": pace_prediction,
-        "chart_data": chart_data,
-    })
+    with _timed("compute.plan"):
+        drive_advice = get_drive_advice(bac_now, model.hours_until_sober_from_now())
+    with _timed("serialize"):
+        return jsonify({
+            "authenticated": True,
+            "configured": True,
+            "weight_lb": model.weight_lb,
+            "is_male": model.is_male,
+            "bac_now": bac_now,
+            "curve": [{"t": t, "bac": bac} for t, bac in curve],
+            "hours_until_sober_from_now": model.hours_until_sober_from_now(),
+            "session_events": _session_events_payload(model),
+            "drink_count": len(events),
+            "total_calories": model.total_calories,
+            "total_carbs_g": round(model.total_carbs_g, 1),
+            "total_sugar_g": round(model.total_sugar_g, 1),
+            "hangover_plan": hangover_plan,
+            "drive_advice": drive_advice,
+            "pace_prediction": pace_prediction,
+            "chart_data": chart_data,
+        })
 
 
 @app.route("/api/session/events", methods=["PATCH"])
@@ -1815,19 +2164,17 @@ def api_session_events_patch():
             sugar = float(restore.get("sugar_g", 0.0))
         except (TypeError, ValueError):
             return jsonify({"error": "restore_event is invalid"}), 400
-        events.insert(
-            restore_index,
-            (
-                -max(0.0, min(MAX_HOURS_AGO, hours_ago)),
-                max(MIN_COUNT, min(MAX_COUNT, standard_drinks)) * 14.0,
-                max(0, calories),
-                max(0.0, carbs),
-                max(0.0, sugar),
-            ),
+        restored_event = (
+            -max(0.0, min(MAX_HOURS_AGO, hours_ago)),
+            max(MIN_COUNT, min(MAX_COUNT, standard_drinks)) * 14.0,
+            max(0, calories),
+            max(0.0, carbs),
+            max(0.0, sugar),
         )
+        events.insert(restore_index, restored_event)
         next_model = _rebuild_model_from_events(model, events)
         set_session(next_model)
-        _record_auto_session(user_id, next_model, touch_last_event=False)
+        _log_session_changes(user_id, next_model, added=[restored_event])
         return jsonify({"ok": True, "events": _session_events_payload(next_model)})
 
     try:
@@ -1841,8 +2188,7 @@ def api_session_events_patch():
         deleted_event = events.pop(index)
         next_model = _rebuild_model_from_events(model, events)
         set_session(next_model)
-        if events:
-            _record_auto_session(user_id, next_model, touch_last_event=False)
+        _log_session_changes(user_id, next_model, removed=[deleted_event])
         return jsonify(
             {
                 "ok": True,
@@ -1860,7 +2206,8 @@ def api_session_events_patch():
     hours_ago = max(0.0, min(MAX_HOURS_AGO, hours_ago))
     standard_drinks = max(MIN_COUNT, min(MAX_COUNT, standard_drinks))
 
-    old_t, old_grams, old_cal, old_carbs, old_sugar = events[index]
+    old_event = events[index]
+    old_t, old_grams, old_cal, old_carbs, old_sugar = old_event
     new_grams = standard_drinks * 14.0
     ratio = (new_grams / old_grams) if old_grams > 0 else 1.0
     events[index] = (
@@ -1872,7 +2219,7 @@ def api_session_events_patch():
     )
     next_model = _rebuild_model_from_events(model, events)
     set_session(next_model)
-    _record_auto_session(user_id, next_model, touch_last_event=False)
+    _log_session_changes(user_id, next_model, removed=[old_event], added=[events[index]])
     return jsonify({"ok": True, "events": _session_events_payload(next_model)})
 
 
@@ -1975,9 +2322,19 @@ def api_session_list():
     include_active = _parse_bool(request.args.get("include_active"), default=False)
     if session_date and not _is_valid_date_yyyy_mm_dd(session_date):
         return jsonify({"error": "date must be YYYY-MM-DD"}), 400
+    before_id = request.args.get("before_id", type=int)
+    limit = int(_clamp_float(request.args.get("limit"), SESSION_PAGE_SIZE, 1, SESSION_PAGE_SIZE))
 
-    items = list_user_sessions(_auth_db_path(), user_id=user_id, session_date=session_date, include_active=include_active)
-    return jsonify({"items": items})
+    items = list_user_sessions(
+        _auth_db_path(),
+        user_id=user_id,
+        session_date=session_date,
+        include_active=include_active,
+        before_id=before_id,
+        limit=limit,
+    )
+    next_cursor = {"before_id": items[-1]["id"]} if len(items) == limit else None
+    return jsonify({"items": items, "next_cursor": next_cursor})
 
 
 @app.route("/api/session/dates")
@@ -1986,7 +2343,49 @@ def api_session_dates():
     if user_id is None:
         return _auth_required_error()
     _ensure_auth_db()
-    return jsonify({"items": list_session_dates(_auth_db_path(), user_id=user_id)})
+    before_date = request.args.get("before_date", type=str)
+    if before_date and not _is_valid_date_yyyy_mm_dd(before_date):
+        return jsonify({"error": "before_date must be YYYY-MM-DD"}), 400
+    limit = int(_clamp_float(request.args.get("limit"), SESSION_DATES_PAGE_SIZE, 1, SESSION_DATES_PAGE_SIZE))
+    items = list_session_dates(_auth_db_path(), user_id=user_id, before_date=before_date, limit=limit)
+    next_cursor = {"before_date": items[-1]["session_date"]} if len(items) == limit else None
+    return jsonify({"items": items, "next_cursor": next_cursor})
+
+
+def _session_export_response(user_id: int, *, fmt: str, detail: str):
+    session_date = request.args.get("date", type=str)
+    include_active = _parse_bool(request.args.get("include_active"), default=False)
+    if session_date and not _is_valid_date_yyyy_mm_dd(session_date):
+        return jsonify({"error": "date must be YYYY-MM-DD"}), 400
+    try:
+        chunks = stream_session_export(
+            _auth_db_path(),
+            user_id=user_id,
+            fmt=fmt,
+            detail=detail,
+            session_date=session_date,
+            include_active=include_active,
+        )
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+
+    filename_date = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+    suffix = "sessions" if detail == "sessions" else "drinks"
+    headers = {"Content-Disposition": f'attachment; filename="bac-{suffix}-{filename_date}.{fmt}"'}
+    mimetype = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    return Response(chunks, headers=headers, mimetype=mimetype)
+
+
+@app.route("/api/session/export")
+def api_session_export():
+    user_id = _require_user_id()
+    if user_id is None:
+        return _auth_required_error()
+
+    _ensure_auth_db()
+    fmt = str(request.args.get("format", "csv")).strip().lower()
+    detail = str(request.args.get("detail", "sessions")).strip().lower()
+    return _session_export_response(user_id, fmt=fmt, detail=detail)
 
 
 @app.route("/api/session/export.csv")
@@ -1996,53 +2395,50 @@ def api_session_export_csv():
         return _auth_required_error()
 
     _ensure_auth_db()
-    session_date = request.args.get("date", type=str)
-    include_active = _parse_bool(request.args.get("include_active"), default=False)
-    if session_date and not _is_valid_date_yyyy_mm_dd(session_date):
-        return jsonify({"error": "date must be YYYY-MM-DD"}), 400
+    return _session_export_response(user_id, fmt="csv", detail="sessions")
 
-    items = list_user_sessions(
-        _auth_db_path(),
-        user_id=user_id,
-        session_date=session_date,
-        include_active=include_active,
-    )
 
-    out = io.StringIO()
-    writer = csv.writer(out)
-    writer.writerow(
-        [
-            "id",
-            "name",
-            "created_at",
-            "session_date",
-            "drink_count",
-            "is_auto",
-            "is_active",
-            "started_at",
-            "last_event_at",
-            "ended_at",
-        ]
-    )
-    for item in items:
-        writer.writerow(
-            [
-                item.get("id"),
-                item.get("name", ""),
-                item.get("created_at", ""),
-                item.get("session_date", ""),
-                item.get("drink_count", 0),
-                str(bool(item.get("is_auto", False))).lower(),
-                str(bool(item.get("is_active", False))).lower(),
-                item.get("started_at", "") or "",
-                item.get("last_event_at", "") or "",
-                item.get("ended_at", "") or "",
-            ]
+@app.route("/api/session/import", methods=["POST"])
+def api_session_import():
+    user_id = _require_user_id()
+    if user_id is None:
+        return _auth_required_error()
+    if (request.content_length or 0) > SESSION_IMPORT_MAX_BYTES:
+        return jsonify({"error": "Import file is too large"}), 413
+
+    upload = request.files.get("file")
+    if upload is not None:
+        text = upload.read(SESSION_IMPORT_MAX_BYTES + 1).decode("utf-8-sig", errors="replace")
+        default_fmt = "jsonl" if (upload.filename or "").lower().endswith((".jsonl", ".ndjson")) else "csv"
+        options = request.form
+    else:
+        data = request.get_json(silent=True) or {}
+        text = str(data.get("data", ""))
+        default_fmt = "csv"
+        options = data
+    if not text.strip():
+        return jsonify({"error": "No import data provided"}), 400
+    if len(text) > SESSION_IMPORT_MAX_BYTES:
+        return jsonify({"error": "Import file is too large"}), 413
+
+    fmt = str(options.get("format") or default_fmt).strip().lower()
+    gap_hours = _clamp_float(options.get("gap_hours"), IMPORT_SESSION_GAP_HOURS, 0.5, 12.0)
+    _ensure_auth_db()
+    user = get_user_by_id(_auth_db_path(), user_id) or {}
+    weight_lb = _clamp_float(user.get("default_weight_lb"), 160.0, MIN_WEIGHT_LB, MAX_WEIGHT_LB)
+    try:
+        result = import_sessions(
+            _auth_db_path(),
+            user_id=user_id,
+            text=text,
+            fmt=fmt,
+            weight_lb=weight_lb,
+            is_male=bool(user.get("is_male", True)),
+            gap_hours=gap_hours,
         )
-
-    filename_date = datetime.now(timezone.utc).strftime("%Y-%m-%d")
-    headers = {"Content-Disposition": f'attachment; filename="bac-sessions-{filename_date}.csv"'}
-    return Response(out.getvalue(), headers=headers, mimetype="text/csv")
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    return jsonify({"ok": True, **result.to_dict()})
 
 
 @app.route("/api/session/load", methods=["POST"])
@@ -2124,6 +2520,126 @@ def api_feedback_recent():
     return jsonify({"items": list_recent(_feedback_db_path(), limit=limit)})
 
 
+@app.route("/api/admin/maintenance")
+def api_admin_maintenance():
+    token = request.args.get("token", "")
+    if not _admin_token() or token != _admin_token():
+        return jsonify({"error": "forbidden"}), 403
+
+    scheduler = MAINTENANCE_SCHEDULER
+    ran = None
+    run_requested = _parse_bool(request.args.get("run"), default=False)
+    if run_requested:
+        if scheduler is None:
+            _ensure_auth_db()
+            _ensure_feedback_db()
+            scheduler = MaintenanceScheduler(
+                _auth_db_path(),
+                feedback_db_path=_feedback_db_path(),
+                inactive_hours=INACTIVITY_EXPIRE_HOURS,
+                max_active_hours=MAX_ACTIVE_SESSION_HOURS,
+            )
+        ran = scheduler.run_once()
+    return jsonify(
+        {
+            "ok": True,
+            "scheduler_running": MAINTENANCE_SCHEDULER is not None,
+            "ran": ran,
+            "lock_busy": run_requested and ran is None,
+            "jobs": scheduler.stats if scheduler is not None else {},
+        }
+    )
+
+
+@app.route("/metrics")
+def metrics_endpoint():
+    token = request.args.get("token", "")
+    auth = request.headers.get("Authorization", "")
+    if auth.startswith("Bearer "):
+        token = auth[len("Bearer ") :].strip()
+    if not _admin_token() or not secrets.compare_digest(token, _admin_token()):
+        return jsonify({"error": "forbidden"}), 403
+
+    metrics.maybe_flush(force=True)
+    merged = metrics.collect()
+    if request.args.get("format") == "json":
+        return jsonify({"routes": metrics.latency_summary(merged), "multiprocess": metrics.metrics_dir() is not None})
+    return Response(metrics.render(merged), mimetype="text/plain; version=0.0.4")
+
+
+@app.route("/api/admin/profile")
+def api_admin_profile():
+    token = request.args.get("token", "")
+    if not _admin_token() or token != _admin_token():
+        return jsonify({"error": "forbidden"}), 403
+    if not _profiling_enabled():
+        return jsonify({"error": "Profiling is disabled (set PROFILING_ENABLED=1)"}), 404
+
+    if STACK_SAMPLER.running:
+        return jsonify({"error": "A profile is already running", **STACK_SAMPLER.status()}), 409
+    if not _check_rate_limit(
+        "admin_profile",
+        "admin",
+        window_sec=PROFILE_RATE_LIMIT_WINDOW_SEC,
+        max_requests=PROFILE_RATE_LIMIT_MAX_REQUESTS,
+    ):
+        return jsonify({"error": "Too many profiles. Please wait and try again."}), 429
+    seconds = request.args.get("seconds", type=float) or 10.0
+    interval_ms = request.args.get("interval_ms", type=float) or 5.0
+    STACK_SAMPLER.start(seconds, interval_sec=interval_ms / 1000.0)
+    return jsonify({"ok": True, **STACK_SAMPLER.status()}), 202
+
+
+@app.route("/api/admin/profile/result")
+def api_admin_profile_result():
+    token = request.args.get("token", "")
+    if not _admin_token() or token != _admin_token():
+        return jsonify({"error": "forbidden"}), 403
+    if STACK_SAMPLER.started_at is None:
+        return jsonify({"error": "No profile has been run"}), 404
+    if STACK_SAMPLER.running:
+        return jsonify(STACK_SAMPLER.status()), 202
+    return Response(STACK_SAMPLER.collapsed(), mimetype="text/plain")
+
+
+@app.route("/api/admin/memory")
+def api_admin_memory():
+    token = request.args.get("token", "")
+    if not _admin_token() or token != _admin_token():
+        return jsonify({"error": "forbidden"}), 403
+
+    action = str(request.args.get("action", "")).strip().lower()
+    limit = request.args.get("limit", type=int) or memtrack.DEFAULT_TOP_SITES
+    group_by = "traceback" if request.args.get("group_by") == "traceback" else "lineno"
+    if action == "start":
+        memtrack.start(request.args.get("frames", type=int) or memtrack.DEFAULT_TRACE_FRAMES)
+    elif action == "stop":
+        memtrack.stop()
+    elif action == "snapshot":
+        if not memtrack.is_tracing():
+            return jsonify({"error": "Tracing is off; use action=start first"}), 409
+        memtrack.take_baseline()
+    elif action not in {"", "top", "diff"}:
+        return jsonify({"error": "action must be start, stop, snapshot, top or diff"}), 400
+
+    payload: dict[str, Any] = {
+        "tracing": memtrack.is_tracing(),
+        "has_baseline": memtrack.has_baseline(),
+        "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource is not None else None,
+        "structures": {
+            "login_attempt_keys": len(LOGIN_ATTEMPTS),
+            "rate_limit_keys": sum(len(bucket) for bucket in RATE_LIMIT_BUCKETS.values()),
+        },
+    }
+    if memtrack.is_tracing():
+        payload["traced"] = memtrack.traced_memory()
+        if action == "diff":
+            payload["diff"] = memtrack.diff_from_baseline(limit, group_by=group_by)
+        else:
+            payload["top"] = memtrack.top_sites(limit, group_by=group_by)
+    return jsonify(payload)
+
+
 @app.route("/api/admin/db-check")
 def api_admin_db_check():
     token = request.args.get("token", "")
@@ -2,16 +2,25 @@
 
 from __future__ import annotations
 
+import atexit
 import json
+import logging
 import re
 import secrets
 import sqlite3
+import threading
+import time
 from datetime import datetime, timedelta, timezone
 from contextlib import contextmanager
 from typing import Any
 
 from werkzeug.security import check_password_hash, generate_password_hash
 
+from bac_app import calculations
+from bac_app import metrics, querytrace
+from bac_app.drive import LEGAL_LIMIT_BAC
+from bac_app.presence import PRESENCE_DISPLAY_EPSILON, PRESENCE_FLUSH_INTERVAL_SEC, PresenceBuffer, project_bac_many
+
 try:
     import psycopg
     from psycopg.rows import dict_row, tuple_row
@@ -22,6 +31,76 @@ except Exception:  # pragma: no cover
 
 
 AUTH_SCHEMA_VERSION = 1
+# UPSERT ... RETURNING needs SQLite 3.35; older builds re-read the id instead.
+_SQLITE_HAS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+# Removed drinks are matched to log rows by grams and time within this window.
+SESSION_EVENT_MATCH_TOLERANCE_SEC = 120
+GROUP_ALERT_PAGE_SIZE = 40
+# Incremental presence cursors older than this force a full resync.
+PRESENCE_CURSOR_MAX_AGE_HOURS = 12
+PRESENCE_CURSOR_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Lookup indexes shared by both backends, created after every table exists.
+# tests/test_query_plans.py fails on any new query that needs one and lacks it.
+_LOOKUP_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_users_email_lower ON users(lower(email))",
+    "CREATE INDEX IF NOT EXISTS idx_users_username_lower ON users(lower(username))",
+    "CREATE INDEX IF NOT EXISTS idx_session_events_created_at ON session_events(created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_friendships_friend_user_id ON friendships(friend_user_id)",
+    "CREATE INDEX IF NOT EXISTS idx_friend_requests_to_status ON friend_requests(to_user_id, status)",
+    "CREATE INDEX IF NOT EXISTS idx_social_groups_owner ON social_groups(owner_user_id)",
+    "CREATE INDEX IF NOT EXISTS idx_group_members_user_id ON group_members(user_id, group_id)",
+    "CREATE INDEX IF NOT EXISTS idx_group_buddy_pairs_user_id ON group_buddy_pairs(user_id)",
+    "CREATE INDEX IF NOT EXISTS idx_group_buddy_pairs_buddy ON group_buddy_pairs(buddy_user_id)",
+    "CREATE INDEX IF NOT EXISTS idx_group_alerts_created_at ON group_alerts(created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_group_alerts_from_user ON group_alerts(from_user_id)",
+    "CREATE INDEX IF NOT EXISTS idx_group_alerts_target_user ON group_alerts(target_user_id)",
+    "CREATE INDEX IF NOT EXISTS idx_guardian_links_group_id ON guardian_links(group_id)",
+    "CREATE INDEX IF NOT EXISTS idx_emergency_contacts_user_id ON emergency_contacts(user_id)",
+    "CREATE INDEX IF NOT EXISTS idx_password_resets_user_id ON password_resets(user_id)",
+    "CREATE INDEX IF NOT EXISTS idx_password_resets_expires_at ON password_resets(expires_at)",
+    "CREATE INDEX IF NOT EXISTS idx_email_verifications_user_id ON email_verifications(user_id)",
+    "CREATE INDEX IF NOT EXISTS idx_email_verifications_expires_at ON email_verifications(expires_at)",
+)
+# Group snapshots are shared by every viewer of a group and invalidated on
+# writes; the TTL only bounds staleness from writes made by other workers.
+GROUP_SNAPSHOT_TTL_SEC = 10.0
+GROUP_SNAPSHOT_CACHE_MAX_ENTRIES = 512
+
+_GROUP_SNAPSHOT_CACHE: dict[tuple[str, Any], tuple[float, dict[str, Any]]] = {}
+_GUARDIAN_LINK_CACHE: dict[tuple[str, Any], tuple[float, dict[str, Any]]] = {}
+_SNAPSHOT_CACHE_LOCK = threading.Lock()
+
+# Parsed payloads of finished sessions, keyed by (db_path, session_id).
+SESSION_PAYLOAD_CACHE_MAX_ENTRIES = 2048
+_SESSION_PAYLOAD_CACHE: dict[tuple[str, int], dict[str, Any] | None] = {}
+
+# Latest presence per DB, written behind by a background flusher.
+PRESENCE_UPSERT_BATCH_SIZE = 200
+_PRESENCE_BUFFERS: dict[str, PresenceBuffer] = {}
+_PRESENCE_LOCK = threading.Lock()
+_presence_flusher: threading.Thread | None = None
+
+# Deleted accounts are purged in the background, one chunk per transaction.
+ACCOUNT_PURGE_BATCH_SIZE = 500
+_PURGE_PENDING: set[str] = set()
+_PURGE_WAKE = threading.Event()
+_PURGE_LOCK = threading.Lock()
+_account_purger: threading.Thread | None = None
+
+# Threshold alert cooldowns per DB: (group_id, user_id, alert_type) -> last sent
+# (epoch seconds), plus a per-user "nothing to send until" shortcut. The shortcut
+# cannot see groups joined through another worker, so it is re-checked against
+# the DB at least every ALERT_QUIET_RECHECK_SEC.
+THRESHOLD_ALERT_COOLDOWN_SEC = 30 * 60
+ALERT_QUIET_RECHECK_SEC = 120
+ALERT_REGISTRY_SWEEP_SEC = 60
+_ALERT_COOLDOWNS: dict[str, dict[tuple[int, int, str], float]] = {}
+_ALERT_QUIET_UNTIL: dict[tuple[str, int], float] = {}
+_ALERT_COOLDOWN_LOCK = threading.Lock()
+_alert_last_sweep = 0.0
+
+logger = logging.getLogger(__name__)
 
 
 def _is_postgres_db(db_path: str) -> bool:
@@ -55,6 +134,7 @@ class _ConnWrapper:
             self._conn = psycopg.connect(self.db_path)
         else:
             self._conn = sqlite3.connect(self.db_path)
+        querytrace.record_connection()
 
     @property
     def row_factory(self):
@@ -70,12 +150,22 @@ class _ConnWrapper:
             self._conn.row_factory = value
 
     def execute(self, query: str, params: tuple[Any, ...] | list[Any] = ()):
-        if self.is_postgres:
-            rf = dict_row if self._row_factory is sqlite3.Row else tuple_row
-            cur = self._conn.cursor(row_factory=rf)
-            cur.execute(_adapt_sql_for_postgres(query), params)
-            return cur
-        return self._conn.execute(query, params)
+        started = time.perf_counter()
+        try:
+            if self.is_postgres:
+                rf = dict_row if self._row_factory is sqlite3.Row else tuple_row
+                cur = self._conn.cursor(row_factory=rf)
+                cur.execute(_adapt_sql_for_postgres(query), params)
+            else:
+                cur = self._conn.execute(query, params)
+        finally:
+            elapsed = time.perf_counter() - started
+            metrics.observe_db_query(
+                backend="postgres" if self.is_postgres else "sqlite",
+                statement=query,
+                seconds=elapsed,
+            )
+        return querytrace.track(cur, query, elapsed)
 
     def commit(self) -> None:
         self._conn.commit()
@@ -144,6 +234,30 @@ def _unique_invite_code(conn: sqlite3.Connection) -> str:
             return code
 
 
+def _ensure_single_active_auto_session(conn: _ConnWrapper) -> None:
+    """Enforce at most one active auto session per user.
+
+    Duplicates left by concurrent autosaves are closed, keeping the newest, so
+    the unique index can be built.
+    """
+    conn.execute(
+        """
+        UPDATE saved_sessions
+        SET is_active = 0, ended_at = COALESCE(ended_at, last_event_at, updated_at)
+        WHERE is_auto = 1 AND is_active = 1 AND id < (
+            SELECT MAX(s2.id) FROM saved_sessions s2
+            WHERE s2.user_id = saved_sessions.user_id AND s2.is_auto = 1 AND s2.is_active = 1
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_saved_sessions_one_active_auto
+        ON saved_sessions(user_id) WHERE is_auto = 1 AND is_active = 1
+        """
+    )
+
+
 def init_db(db_path: str) -> None:
     if _is_postgres_db(db_path):
         with _connect(db_path) as conn:
@@ -163,6 +277,8 @@ def init_db(db_path: str) -> None:
                 )
                 """
             )
+            conn.execute("ALTER TABLE users ADD COLUMN IF NOT EXISTS deleted_at TIMESTAMPTZ")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_users_deleted_at ON users(deleted_at) WHERE deleted_at IS NOT NULL")
             conn.execute(
                 """
                 CREATE TABLE IF NOT EXISTS saved_sessions (
@@ -180,8 +296,38 @@ def init_db(db_path: str) -> None:
                 )
                 """
             )
+            conn.execute("ALTER TABLE saved_sessions ADD COLUMN IF NOT EXISTS drink_count INTEGER")
+            conn.execute("ALTER TABLE saved_sessions ADD COLUMN IF NOT EXISTS total_grams DOUBLE PRECISION")
+            conn.execute("ALTER TABLE saved_sessions ADD COLUMN IF NOT EXISTS total_calories INTEGER")
+            conn.execute("ALTER TABLE saved_sessions ADD COLUMN IF NOT EXISTS peak_bac DOUBLE PRECISION")
+            conn.execute("ALTER TABLE saved_sessions ADD COLUMN IF NOT EXISTS minutes_over_limit INTEGER")
+            conn.execute("ALTER TABLE saved_sessions ADD COLUMN IF NOT EXISTS duration_minutes INTEGER")
+            conn.execute("ALTER TABLE saved_sessions ADD COLUMN IF NOT EXISTS session_date TEXT")
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_saved_sessions_user_date ON saved_sessions(user_id, session_date, id)"
+            )
             conn.execute("CREATE INDEX IF NOT EXISTS idx_saved_sessions_user_active ON saved_sessions(user_id, is_active)")
             conn.execute("CREATE INDEX IF NOT EXISTS idx_saved_sessions_user_id ON saved_sessions(user_id)")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS session_events (
+                    id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+                    session_id BIGINT NOT NULL REFERENCES saved_sessions(id),
+                    user_id BIGINT NOT NULL REFERENCES users(id),
+                    kind TEXT NOT NULL DEFAULT 'drink',
+                    ref_event_id BIGINT,
+                    event_at_epoch BIGINT NOT NULL DEFAULT 0,
+                    grams DOUBLE PRECISION NOT NULL DEFAULT 0.0,
+                    calories INTEGER NOT NULL DEFAULT 0,
+                    carbs_g DOUBLE PRECISION NOT NULL DEFAULT 0.0,
+                    sugar_g DOUBLE PRECISION NOT NULL DEFAULT 0.0,
+                    logged_at TIMESTAMPTZ,
+                    created_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_session_events_session_id ON session_events(session_id, id)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_session_events_user_id ON session_events(user_id)")
             conn.execute(
                 """
                 CREATE TABLE IF NOT EXISTS user_favorites (
@@ -233,10 +379,12 @@ def init_db(db_path: str) -> None:
                     bac_now DOUBLE PRECISION NOT NULL DEFAULT 0.0,
                     drink_count INTEGER NOT NULL DEFAULT 0,
                     location_note TEXT,
+                    bac_model_json TEXT,
                     updated_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
                 )
                 """
             )
+            conn.execute("ALTER TABLE user_presence ADD COLUMN IF NOT EXISTS bac_model_json TEXT")
             conn.execute(
                 """
                 CREATE TABLE IF NOT EXISTS social_groups (
@@ -284,6 +432,14 @@ def init_db(db_path: str) -> None:
                 )
                 """
             )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_group_alerts_group_id_id ON group_alerts(group_id, id)")
+            conn.execute(
+                """
+                CREATE INDEX IF NOT EXISTS idx_group_alerts_cooldown
+                ON group_alerts(group_id, from_user_id, alert_type, created_at)
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_user_presence_updated_at ON user_presence(updated_at)")
             conn.execute(
                 """
                 CREATE TABLE IF NOT EXISTS guardian_links (
@@ -334,7 +490,7 @@ def init_db(db_path: str) -> None:
             # Backfill username/invite_code for older rows.
             conn.row_factory = sqlite3.Row
             existing = conn.execute(
-                "SELECT id, display_name, email, username, invite_code FROM users WHERE username IS NULL OR invite_code IS NULL"
+                "SELECT id, display_name, email, username, invite_code FROM users WHERE (username IS NULL OR invite_code IS NULL) AND deleted_at IS NULL"
             ).fetchall()
             for row in existing:
                 user_id = row["id"]
@@ -356,6 +512,18 @@ def init_db(db_path: str) -> None:
                 )
                 """
             )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS maintenance_locks (
+                    name TEXT PRIMARY KEY,
+                    owner TEXT NOT NULL,
+                    expires_at_epoch DOUBLE PRECISION NOT NULL DEFAULT 0
+                )
+                """
+            )
+            _ensure_single_active_auto_session(conn)
+            for statement in _LOOKUP_INDEXES:
+                conn.execute(statement)
             conn.execute("DELETE FROM app_metadata WHERE key = ?", ("schema_version",))
             conn.execute(
                 "INSERT INTO app_metadata (key, value) VALUES (?, ?)",
@@ -392,11 +560,14 @@ def init_db(db_path: str) -> None:
             conn.execute("ALTER TABLE users ADD COLUMN username TEXT")
         if "invite_code" not in cols:
             conn.execute("ALTER TABLE users ADD COLUMN invite_code TEXT")
+        if "deleted_at" not in cols:
+            conn.execute("ALTER TABLE users ADD COLUMN deleted_at TEXT")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_users_deleted_at ON users(deleted_at) WHERE deleted_at IS NOT NULL")
         conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_users_username_unique ON users(username)")
         conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_users_invite_code_unique ON users(invite_code)")
         # Backfill username/invite_code for existing rows if missing.
         existing = conn.execute(
-            "SELECT id, display_name, email, username, invite_code FROM users WHERE username IS NULL OR invite_code IS NULL"
+            "SELECT id, display_name, email, username, invite_code FROM users WHERE (username IS NULL OR invite_code IS NULL) AND deleted_at IS NULL"
         ).fetchall()
         for row in existing:
             user_id, display_name, email, username, invite_code = row
@@ -414,6 +585,15 @@ def init_db(db_path: str) -> None:
             )
             """
         )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS maintenance_locks (
+                name TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                expires_at_epoch REAL NOT NULL DEFAULT 0
+            )
+            """
+        )
         conn.execute("DELETE FROM app_metadata WHERE key = ?", ("schema_version",))
         conn.execute(
             "INSERT INTO app_metadata (key, value) VALUES (?, ?)",
@@ -444,8 +624,42 @@ def init_db(db_path: str) -> None:
             conn.execute("ALTER TABLE saved_sessions ADD COLUMN updated_at TEXT")
         if "ended_at" not in saved_cols:
             conn.execute("ALTER TABLE saved_sessions ADD COLUMN ended_at TEXT")
+        for col, col_type in (
+            ("drink_count", "INTEGER"),
+            ("total_grams", "REAL"),
+            ("total_calories", "INTEGER"),
+            ("peak_bac", "REAL"),
+            ("minutes_over_limit", "INTEGER"),
+            ("duration_minutes", "INTEGER"),
+            ("session_date", "TEXT"),
+        ):
+            if col not in saved_cols:
+                conn.execute(f"ALTER TABLE saved_sessions ADD COLUMN {col} {col_type}")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_saved_sessions_user_date ON saved_sessions(user_id, session_date, id)")
         conn.execute("CREATE INDEX IF NOT EXISTS idx_saved_sessions_user_active ON saved_sessions(user_id, is_active)")
         conn.execute("CREATE INDEX IF NOT EXISTS idx_saved_sessions_user_id ON saved_sessions(user_id)")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS session_events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id INTEGER NOT NULL,
+                user_id INTEGER NOT NULL,
+                kind TEXT NOT NULL DEFAULT 'drink',
+                ref_event_id INTEGER,
+                event_at_epoch INTEGER NOT NULL DEFAULT 0,
+                grams REAL NOT NULL DEFAULT 0.0,
+                calories INTEGER NOT NULL DEFAULT 0,
+                carbs_g REAL NOT NULL DEFAULT 0.0,
+                sugar_g REAL NOT NULL DEFAULT 0.0,
+                logged_at TEXT,
+                created_at TEXT NOT NULL DEFAULT (datetime('now')),
+                FOREIGN KEY(session_id) REFERENCES saved_sessions(id),
+                FOREIGN KEY(user_id) REFERENCES users(id)
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_session_events_session_id ON session_events(session_id, id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_session_events_user_id ON session_events(user_id)")
         conn.execute(
             """
             CREATE TABLE IF NOT EXISTS user_favorites (
@@ -505,6 +719,7 @@ def init_db(db_path: str) -> None:
                 bac_now REAL NOT NULL DEFAULT 0.0,
                 drink_count INTEGER NOT NULL DEFAULT 0,
                 location_note TEXT,
+                bac_model_json TEXT,
                 updated_at TEXT NOT NULL DEFAULT (datetime('now')),
                 FOREIGN KEY(user_id) REFERENCES users(id)
             )
@@ -513,6 +728,8 @@ def init_db(db_path: str) -> None:
         presence_cols = {row[1] for row in conn.execute("PRAGMA table_info(user_presence)").fetchall()}
         if "location_note" not in presence_cols:
             conn.execute("ALTER TABLE user_presence ADD COLUMN location_note TEXT")
+        if "bac_model_json" not in presence_cols:
+            conn.execute("ALTER TABLE user_presence ADD COLUMN bac_model_json TEXT")
         conn.execute(
             """
             CREATE TABLE IF NOT EXISTS social_groups (
@@ -569,6 +786,14 @@ def init_db(db_path: str) -> None:
             )
             """
         )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_group_alerts_group_id_id ON group_alerts(group_id, id)")
+        conn.execute(
+            """
+            CREATE INDEX IF NOT EXISTS idx_group_alerts_cooldown
+            ON group_alerts(group_id, from_user_id, alert_type, created_at)
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_user_presence_updated_at ON user_presence(updated_at)")
         conn.execute(
             """
             CREATE TABLE IF NOT EXISTS guardian_links (
@@ -619,6 +844,9 @@ def init_db(db_path: str) -> None:
             )
             """
         )
+        _ensure_single_active_auto_session(conn)
+        for statement in _LOOKUP_INDEXES:
+            conn.execute(statement)
         conn.commit()
 
 
@@ -710,7 +938,11 @@ def get_user_by_id(db_path: str, user_id: int) -> dict[str, Any] | None:
     with _connect(db_path) as conn:
         conn.row_factory = sqlite3.Row
         row = conn.execute(
-            "SELECT id, email, display_name, username, invite_code, email_verified, is_male, default_weight_lb FROM users WHERE id = ?",
+            """
+            SELECT id, email, display_name, username, invite_code, email_verified, is_male, default_weight_lb
+            FROM users
+            WHERE id = ? AND deleted_at IS NULL
+            """,
             (user_id,),
         ).fetchone()
     if row is None:
@@ -756,6 +988,7 @@ def update_user_profile(
                 ),
             )
             conn.commit()
+        _invalidate_user_group_snapshots(db_path, user_id=user_id)
         return True, "Profile updated."
     except Exception as exc:
         msg = str(exc).lower()
@@ -776,35 +1009,156 @@ def verify_user_password(db_path: str, *, user_id: int, password: str) -> bool:
         return False
 
 
-def delete_user_account(db_path: str, *, user_id: int) -> bool:
+def delete_user_account(db_path: str, *, user_id: int, purge: bool = True) -> bool:
+    """Mark an account deleted and detach it from sharing; data is purged later.
+
+    The account stops being able to log in and disappears from friends and
+    groups right away, in one short transaction. Sessions, alerts and owned
+    groups are removed in chunks by `purge_deleted_users`, which runs in the
+    background unless `purge` is False.
+    """
+    buffer = _presence_buffer(db_path, create=False)
+    if buffer is not None:
+        buffer.discard(user_id)
     with _connect(db_path) as conn:
-        conn.row_factory = sqlite3.Row
-        owned_groups = conn.execute(
-            "SELECT id FROM social_groups WHERE owner_user_id = ?",
-            (int(user_id),),
-        ).fetchall()
-        owned_group_ids = [int(r["id"]) for r in owned_groups]
-
-        for gid in owned_group_ids:
-            conn.execute("DELETE FROM guardian_links WHERE group_id = ?", (gid,))
-            conn.execute("DELETE FROM group_alerts WHERE group_id = ?", (gid,))
-            conn.execute("DELETE FROM group_members WHERE group_id = ?", (gid,))
-        conn.execute("DELETE FROM social_groups WHERE owner_user_id = ?", (int(user_id),))
-
-        conn.execute("DELETE FROM group_alerts WHERE from_user_id = ? OR target_user_id = ?", (int(user_id), int(user_id)))
-        conn.execute("DELETE FROM group_members WHERE user_id = ?", (int(user_id),))
-        conn.execute("DELETE FROM user_presence WHERE user_id = ?", (int(user_id),))
-        conn.execute("DELETE FROM user_social_settings WHERE user_id = ?", (int(user_id),))
-        conn.execute("DELETE FROM user_favorites WHERE user_id = ?", (int(user_id),))
-        conn.execute("DELETE FROM friend_requests WHERE from_user_id = ? OR to_user_id = ?", (int(user_id), int(user_id)))
-        conn.execute("DELETE FROM friendships WHERE user_id = ? OR friend_user_id = ?", (int(user_id), int(user_id)))
-        conn.execute("DELETE FROM saved_sessions WHERE user_id = ?", (int(user_id),))
-        conn.execute("DELETE FROM emergency_contacts WHERE user_id = ?", (int(user_id),))
-        conn.execute("DELETE FROM password_resets WHERE user_id = ?", (int(user_id),))
-        conn.execute("DELETE FROM email_verifications WHERE user_id = ?", (int(user_id),))
-        cur = conn.execute("DELETE FROM users WHERE id = ?", (int(user_id),))
+        cur = conn.execute(
+            """
+            UPDATE users
+            SET deleted_at = datetime('now'), email = ?, password_hash = '!', username = NULL, invite_code = NULL
+            WHERE id = ? AND deleted_at IS NULL
+            """,
+            (f"deleted-{int(user_id)}@deleted.invalid", int(user_id)),
+        )
+        deleted = cur.rowcount > 0
+        if deleted:
+            conn.execute("DELETE FROM user_presence WHERE user_id = ?", (int(user_id),))
+            conn.execute("DELETE FROM group_members WHERE user_id = ?", (int(user_id),))
+            conn.execute("DELETE FROM friendships WHERE user_id = ? OR friend_user_id = ?", (int(user_id), int(user_id)))
+            conn.execute(
+                "DELETE FROM friend_requests WHERE (from_user_id = ? OR to_user_id = ?) AND status = 'pending'",
+                (int(user_id), int(user_id)),
+            )
+            conn.execute(
+                "UPDATE guardian_links SET is_active = 0 WHERE group_id IN (SELECT id FROM social_groups WHERE owner_user_id = ?)",
+                (int(user_id),),
+            )
         conn.commit()
-        return cur.rowcount > 0
+    clear_snapshot_cache(db_path)
+    clear_alert_cooldowns(db_path)
+    if deleted and purge:
+        schedule_account_purge(db_path)
+    return deleted
+
+
+def _delete_in_chunks(
+    db_path: str,
+    table: str,
+    predicate: str,
+    params: tuple[Any, ...],
+    *,
+    batch_size: int,
+    key: str = "id",
+    max_rows: int | None = None,
+) -> int:
+    """Delete matching rows `batch_size` at a time, committing each chunk; return rows removed."""
+    query = (
+        "DELETE FROM " + table + " WHERE " + key + " IN (SELECT " + key + " FROM " + table
+        + " WHERE " + predicate + " LIMIT ?)"
+    )
+    batch_size = max(1, int(batch_size))
+    removed = 0
+    while max_rows is None or removed < max_rows:
+        limit = batch_size if max_rows is None else min(batch_size, max_rows - removed)
+        with _connect(db_path) as conn:
+            cur = conn.execute(query, (*params, limit))
+            conn.commit()
+        removed += max(0, cur.rowcount)
+        if cur.rowcount < limit:
+            break
+    return removed
+
+
+_OWNED_GROUPS = "SELECT id FROM social_groups WHERE owner_user_id = ?"
+
+# (table, predicate, user id params). Tables with an id are deleted in chunks;
+# the rest are bounded by the user's friends/groups and go in one statement.
+_PURGE_CHUNKED_STEPS: list[tuple[str, str, int]] = [
+    ("session_events", "user_id = ?", 1),
+    ("saved_sessions", "user_id = ?", 1),
+    ("group_alerts", "group_id IN (" + _OWNED_GROUPS + ")", 1),
+    ("group_alerts", "from_user_id = ? OR target_user_id = ?", 2),
+    ("guardian_links", "group_id IN (" + _OWNED_GROUPS + ")", 1),
+    ("friend_requests", "from_user_id = ? OR to_user_id = ?", 2),
+    ("emergency_contacts", "user_id = ?", 1),
+    ("password_resets", "user_id = ?", 1),
+    ("email_verifications", "user_id = ?", 1),
+]
+_PURGE_SET_STEPS: list[tuple[str, str, int]] = [
+    ("group_buddy_pairs", "user_id = ? OR buddy_user_id = ? OR group_id IN (" + _OWNED_GROUPS + ")", 3),
+    ("group_members", "user_id = ? OR group_id IN (" + _OWNED_GROUPS + ")", 2),
+    ("social_groups", "owner_user_id = ?", 1),
+    ("friendships", "user_id = ? OR friend_user_id = ?", 2),
+    ("user_presence", "user_id = ?", 1),
+    ("user_social_settings", "user_id = ?", 1),
+    ("user_favorites", "user_id = ?", 1),
+]
+
+
+def _purge_user(db_path: str, user_id: int, *, batch_size: int) -> int:
+    removed = 0
+    for table, predicate, user_params in _PURGE_CHUNKED_STEPS:
+        removed += _delete_in_chunks(db_path, table, predicate, tuple([user_id] * user_params), batch_size=batch_size)
+    with _connect(db_path) as conn:
+        for table, predicate, user_params in _PURGE_SET_STEPS:
+            cur = conn.execute("DELETE FROM " + table + " WHERE " + predicate, tuple([user_id] * user_params))
+            removed += max(0, cur.rowcount)
+        conn.execute("DELETE FROM users WHERE id = ? AND deleted_at IS NOT NULL", (user_id,))
+        conn.commit()
+    return removed + 1
+
+
+def purge_deleted_users(db_path: str, *, batch_size: int = ACCOUNT_PURGE_BATCH_SIZE, max_users: int = 50) -> int:
+    """Remove all data of accounts marked deleted; return how many rows were removed.
+
+    Every chunk commits on its own, so concurrent writers only ever wait on a
+    single small delete.
+    """
+    with _connect(db_path) as conn:
+        rows = conn.execute(
+            "SELECT id FROM users WHERE deleted_at IS NOT NULL ORDER BY deleted_at, id LIMIT ?",
+            (max(1, int(max_users)),),
+        ).fetchall()
+    removed = 0
+    for row in rows:
+        removed += _purge_user(db_path, int(row[0]), batch_size=max(1, int(batch_size)))
+    if rows:
+        clear_snapshot_cache(db_path)
+    return removed
+
+
+def _account_purge_loop() -> None:
+    while True:
+        _PURGE_WAKE.wait()
+        with _PURGE_LOCK:
+            paths = list(_PURGE_PENDING)
+            _PURGE_PENDING.clear()
+            _PURGE_WAKE.clear()
+        for path in paths:
+            try:
+                purge_deleted_users(path)
+            except Exception:
+                logger.exception("account purge failed")
+
+
+def schedule_account_purge(db_path: str) -> None:
+    """Ask the background purger to process deleted accounts in `db_path`."""
+    global _account_purger
+    with _PURGE_LOCK:
+        _PURGE_PENDING.add(str(db_path).strip())
+        _PURGE_WAKE.set()
+        if _account_purger is None:
+            _account_purger = threading.Thread(target=_account_purge_loop, name="account-purge", daemon=True)
+            _account_purger.start()
 
 
 def get_schema_version(db_path: str) -> int | None:
@@ -821,6 +1175,124 @@ def get_schema_version(db_path: str) -> int | None:
         return cur.rowcount > 0
 
 
+def local_session_date(value: Any = None, *, naive_is_utc: bool = False) -> str:
+    """Return the server-local YYYY-MM-DD a session belongs to.
+
+    `value` may be a datetime or ISO string; app timestamps are naive local time,
+    while SQLite `datetime('now')` defaults are naive UTC (`naive_is_utc`).
+    """
+    if value is None:
+        return datetime.now().date().isoformat()
+    dt = value
+    if isinstance(value, str):
+        try:
+            dt = datetime.fromisoformat(value.strip().replace(" ", "T"))
+        except ValueError:
+            return value.strip()[:10]
+    if not isinstance(dt, datetime):
+        return datetime.now().date().isoformat()
+    if dt.tzinfo is None and naive_is_utc:
+        dt = dt.replace(tzinfo=timezone.utc)
+    if dt.tzinfo is not None:
+        dt = dt.astimezone()
+    return dt.date().isoformat()
+
+
+SESSION_SUMMARY_COLUMNS = (
+    "drink_count",
+    "total_grams",
+    "total_calories",
+    "peak_bac",
+    "minutes_over_limit",
+    "duration_minutes",
+)
+
+
+def session_summary(payload: dict[str, Any]) -> dict[str, Any]:
+    """Compute the denormalised summary stored with a session payload.
+
+    Duration runs from the first drink until BAC is back to ~0, and minutes over
+    the limit are counted on the same 15-minute grid as the session debrief.
+    """
+    try:
+        weight_lb = max(1.0, float(payload.get("weight_lb") or 160.0))
+    except (TypeError, ValueError):
+        weight_lb = 160.0
+    is_male = bool(payload.get("is_male", True))
+    events = []
+    for event in payload.get("events") or []:
+        if not isinstance(event, (list, tuple)) or len(event) != 5:
+            continue
+        try:
+            events.append((float(event[0]), max(0.0, float(event[1])), int(event[2])))
+        except (TypeError, ValueError):
+            continue
+
+    summary = {
+        "drink_count": len(events),
+        "total_grams": round(sum(g for _, g, _ in events), 2),
+        "total_calories": sum(cal for _, _, cal in events),
+        "peak_bac": 0.0,
+        "minutes_over_limit": 0,
+        "duration_minutes": 0,
+    }
+    events_bac = [(t, g) for t, g, _ in events]
+    if events_bac:
+        start = min(t for t, _ in events_bac)
+        curve = calculations.bac_curve(events_bac, weight_lb, is_male, step_hours=0.25, start_hours=start)
+        summary["peak_bac"] = round(max((b for _, b in curve), default=0.0), 4)
+        summary["minutes_over_limit"] = 15 * sum(1 for _, b in curve if b >= LEGAL_LIMIT_BAC)
+        summary["duration_minutes"] = int(round(calculations.time_to_sober(events_bac, weight_lb, is_male) * 60))
+    return summary
+
+
+def _summary_params(payload: dict[str, Any]) -> tuple[Any, ...]:
+    summary = session_summary(payload)
+    return tuple(summary[col] for col in SESSION_SUMMARY_COLUMNS)
+
+
+def backfill_session_summaries(db_path: str, *, batch_size: int = 200) -> int:
+    """Fill summary and session_date columns for rows saved before they existed.
+
+    Returns the number of rows updated.
+    """
+    batch_size = max(1, min(int(batch_size), 1000))
+    assignments = ", ".join(f"{col} = COALESCE({col}, ?)" for col in SESSION_SUMMARY_COLUMNS)
+    updated = 0
+    last_id = 0
+    while True:
+        with _connect(db_path) as conn:
+            conn.row_factory = sqlite3.Row
+            rows = conn.execute(
+                """
+                SELECT id, payload_json, started_at, created_at
+                FROM saved_sessions
+                WHERE (drink_count IS NULL OR session_date IS NULL) AND id > ?
+                ORDER BY id ASC
+                LIMIT ?
+                """,
+                (last_id, batch_size),
+            ).fetchall()
+            for row in rows:
+                try:
+                    payload = json.loads(row["payload_json"] or "{}")
+                except json.JSONDecodeError:
+                    payload = {}
+                if row["started_at"]:
+                    session_date = local_session_date(row["started_at"])
+                else:
+                    session_date = local_session_date(row["created_at"], naive_is_utc=True)
+                conn.execute(
+                    "UPDATE saved_sessions SET " + assignments + ", session_date = COALESCE(session_date, ?) WHERE id = ?",
+                    (*_summary_params(payload if isinstance(payload, dict) else {}), session_date, int(row["id"])),
+                )
+            conn.commit()
+        updated += len(rows)
+        if len(rows) < batch_size:
+            return updated
+        last_id = int(rows[-1]["id"])
+
+
 def save_user_session(db_path: str, *, user_id: int, name: str, payload: dict[str, Any]) -> int:
     payload_json = json.dumps(payload, separators=(",", ":"), ensure_ascii=True)
     with _connect(db_path) as conn:
@@ -828,36 +1300,111 @@ def save_user_session(db_path: str, *, user_id: int, name: str, payload: dict[st
             conn,
             """
             INSERT INTO saved_sessions (
-                user_id, name, payload_json, is_auto, is_active, started_at, last_event_at, updated_at, ended_at
+                user_id, name, payload_json, is_auto, is_active, started_at, last_event_at, updated_at, ended_at,
+                drink_count, total_grams, total_calories, peak_bac, minutes_over_limit, duration_minutes, session_date
             )
-            VALUES (?, ?, ?, 0, 0, datetime('now'), datetime('now'), datetime('now'), datetime('now'))
+            VALUES (?, ?, ?, 0, 0, datetime('now'), datetime('now'), datetime('now'), datetime('now'), ?, ?, ?, ?, ?, ?, ?)
             """,
-            (user_id, name.strip(), payload_json),
+            (user_id, name.strip(), payload_json, *_summary_params(payload), local_session_date()),
         )
         conn.commit()
         return session_id
 
 
+_IMPORT_SESSION_COLUMNS = (
+    "user_id",
+    "name",
+    "payload_json",
+    "is_auto",
+    "is_active",
+    "started_at",
+    "last_event_at",
+    "updated_at",
+    "ended_at",
+    "created_at",
+    *SESSION_SUMMARY_COLUMNS,
+    "session_date",
+)
+
+
+def save_user_sessions_many(
+    db_path: str,
+    *,
+    user_id: int,
+    sessions: list[dict[str, Any]],
+    batch_size: int = 500,
+) -> int:
+    """Insert closed sessions in bulk; each item has name, payload, started_at, ended_at, created_at, session_date.
+
+    SQLite uses executemany per batch and Postgres streams rows through COPY,
+    so thousands of imported sessions cost a handful of round trips.
+    """
+    rows = []
+    for item in sessions:
+        payload = item["payload"]
+        rows.append(
+            (
+                user_id,
+                str(item["name"]).strip(),
+                json.dumps(payload, separators=(",", ":"), ensure_ascii=True),
+                0,
+                0,
+                item["started_at"],
+                item["ended_at"],
+                item["ended_at"],
+                item["ended_at"],
+                item["created_at"],
+                *_summary_params(payload),
+                item["session_date"],
+            )
+        )
+    if not rows:
+        return 0
+    batch_size = max(1, int(batch_size))
+    with _connect(db_path) as conn:
+        if conn.is_postgres:
+            with conn.cursor() as cur:
+                with cur.copy("COPY saved_sessions (" + ", ".join(_IMPORT_SESSION_COLUMNS) + ") FROM STDIN") as copy:
+                    for row in rows:
+                        copy.write_row(row)
+        else:
+            query = (
+                "INSERT INTO saved_sessions ("
+                + ", ".join(_IMPORT_SESSION_COLUMNS)
+                + ") VALUES ("
+                + ", ".join("?" for _ in _IMPORT_SESSION_COLUMNS)
+                + ")"
+            )
+            for start in range(0, len(rows), batch_size):
+                conn.executemany(query, rows[start : start + batch_size])
+        conn.commit()
+    return len(rows)
+
+
 def get_active_auto_session(db_path: str, *, user_id: int) -> dict[str, Any] | None:
     with _connect(db_path) as conn:
         conn.row_factory = sqlite3.Row
         row = conn.execute(
             """
-            SELECT id, name, started_at, last_event_at, updated_at, payload_json
-            FROM saved_sessions
-            WHERE user_id = ? AND is_auto = 1 AND is_active = 1
-            ORDER BY id DESC
-            LIMIT 1
+            SELECT s.id, s.name, s.started_at, s.last_event_at, s.updated_at, s.payload_json,
+                   (
+                     SELECT MAX(e.logged_at) FROM session_events e
+                     WHERE e.session_id = s.id AND e.kind = 'drink'
+                   ) AS last_logged_at
+            FROM saved_sessions s
+            WHERE s.user_id = ? AND s.is_auto = 1 AND s.is_active = 1
             """,
             (user_id,),
         ).fetchone()
     if row is None:
         return None
+    # Drinks are appended to the event log without touching the session row.
+    last_event_at = max((v for v in (row["last_event_at"], row["last_logged_at"]) if v is not None), default=None)
     return {
         "id": row["id"],
         "name": row["name"],
         "started_at": row["started_at"],
-        "last_event_at": row["last_event_at"],
+        "last_event_at": last_event_at,
         "updated_at": row["updated_at"],
         "payload_json": row["payload_json"],
     }
@@ -872,80 +1419,223 @@ def upsert_auto_session(
     event_time_iso: str,
     touch_last_event: bool,
 ) -> int:
+    """Create or update the user's active auto session in one statement; return its id.
+
+    The partial unique index on active auto sessions is the conflict target, so
+    concurrent autosaves from several tabs converge on the same row.
+    """
     payload_json = json.dumps(payload, separators=(",", ":"), ensure_ascii=True)
+    summary = _summary_params(payload)
+    touch_sql = ""
+    if touch_last_event:
+        touch_sql = "last_event_at = excluded.last_event_at, name = COALESCE(NULLIF(saved_sessions.name, ''), excluded.name),"
+    query = (
+        """
+        INSERT INTO saved_sessions (
+            user_id, name, payload_json, is_auto, is_active, started_at, last_event_at, updated_at, ended_at,
+            drink_count, total_grams, total_calories, peak_bac, minutes_over_limit, duration_minutes, session_date
+        )
+        VALUES (?, ?, ?, 1, 1, ?, ?, ?, NULL, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (user_id) WHERE is_auto = 1 AND is_active = 1 DO UPDATE SET
+            """
+        + touch_sql
+        + """
+            payload_json = excluded.payload_json, updated_at = excluded.updated_at,
+            drink_count = excluded.drink_count, total_grams = excluded.total_grams,
+            total_calories = excluded.total_calories, peak_bac = excluded.peak_bac,
+            minutes_over_limit = excluded.minutes_over_limit, duration_minutes = excluded.duration_minutes
+        """
+    )
+    params = (
+        user_id,
+        name.strip(),
+        payload_json,
+        event_time_iso,
+        event_time_iso,
+        event_time_iso,
+        *summary,
+        local_session_date(event_time_iso),
+    )
     with _connect(db_path) as conn:
-        conn.row_factory = sqlite3.Row
-        active = conn.execute(
-            """
-            SELECT id
-            FROM saved_sessions
-            WHERE user_id = ? AND is_auto = 1 AND is_active = 1
-            ORDER BY id DESC
-            LIMIT 1
-            """,
-            (user_id,),
-        ).fetchone()
-        if active is None:
-            session_id = _insert_and_get_id(
-                conn,
-                """
-                INSERT INTO saved_sessions (
-                    user_id, name, payload_json, is_auto, is_active, started_at, last_event_at, updated_at, ended_at
-                )
-                VALUES (?, ?, ?, 1, 1, ?, ?, ?, NULL)
-                """,
-                (user_id, name.strip(), payload_json, event_time_iso, event_time_iso, event_time_iso),
-            )
-            conn.commit()
-            return session_id
-
-        if touch_last_event:
-            conn.execute(
-                """
-                UPDATE saved_sessions
-                SET payload_json = ?, updated_at = ?, last_event_at = ?, name = COALESCE(NULLIF(name, ''), ?)
-                WHERE id = ?
-                """,
-                (payload_json, event_time_iso, event_time_iso, name.strip(), int(active["id"])),
-            )
+        if conn.is_postgres or _SQLITE_HAS_RETURNING:
+            session_id = int(conn.execute(query + " RETURNING id", params).fetchone()[0])
         else:
-            conn.execute(
-                """
-                UPDATE saved_sessions
-                SET payload_json = ?, updated_at = ?
-                WHERE id = ?
-                """,
-                (payload_json, event_time_iso, int(active["id"])),
+            # lastrowid is not set when the conflict path updates instead.
+            conn.execute(query, params)
+            session_id = int(
+                conn.execute(
+                    "SELECT id FROM saved_sessions WHERE user_id = ? AND is_auto = 1 AND is_active = 1",
+                    (user_id,),
+                ).fetchone()[0]
             )
         conn.commit()
-        return int(active["id"])
+    return session_id
 
 
-def finalize_active_auto_session(db_path: str, *, user_id: int, ended_at_iso: str | None = None) -> bool:
-    ended = ended_at_iso or "datetime('now')"
+def finalize_active_auto_session(
+    db_path: str,
+    *,
+    user_id: int,
+    ended_at_iso: str | None = None,
+    payload: dict[str, Any] | None = None,
+) -> bool:
+    """End the active auto session, optionally compacting `payload` into it."""
+    payload_sql = ""
+    params: list[Any] = []
+    if payload is not None:
+        payload_sql = (
+            "payload_json = ?, drink_count = ?, total_grams = ?, total_calories = ?, peak_bac = ?,"
+            " minutes_over_limit = ?, duration_minutes = ?,"
+        )
+        params.extend([json.dumps(payload, separators=(",", ":"), ensure_ascii=True), *_summary_params(payload)])
     with _connect(db_path) as conn:
         if ended_at_iso:
             cur = conn.execute(
                 """
                 UPDATE saved_sessions
-                SET is_active = 0, ended_at = ?, updated_at = ?
+                SET """
+                + payload_sql
+                + """ is_active = 0, ended_at = ?, updated_at = ?
                 WHERE user_id = ? AND is_auto = 1 AND is_active = 1
                 """,
-                (ended_at_iso, ended_at_iso, user_id),
+                (*params, ended_at_iso, ended_at_iso, user_id),
             )
         else:
             cur = conn.execute(
                 """
                 UPDATE saved_sessions
-                SET is_active = 0, ended_at = datetime('now'), updated_at = datetime('now')
+                SET """
+                + payload_sql
+                + """ is_active = 0, ended_at = datetime('now'), updated_at = datetime('now')
                 WHERE user_id = ? AND is_auto = 1 AND is_active = 1
                 """,
-                (user_id,),
+                (*params, user_id),
             )
         conn.commit()
         return cur.rowcount > 0
 
 
+def _live_session_events(conn: _ConnWrapper, *, user_id: int, session_id: int) -> list[Any]:
+    rows = conn.execute(
+        """
+        SELECT id, kind, ref_event_id, event_at_epoch, grams, calories, carbs_g, sugar_g, logged_at
+        FROM session_events
+        WHERE session_id = ? AND user_id = ?
+        ORDER BY id ASC
+        """,
+        (session_id, user_id),
+    ).fetchall()
+    removed = {int(r["ref_event_id"]) for r in rows if r["kind"] == "tombstone" and r["ref_event_id"] is not None}
+    return [r for r in rows if r["kind"] == "drink" and int(r["id"]) not in removed]
+
+
+def _match_session_event(live: list[Any], event: tuple[int, float, int, float, float]) -> Any | None:
+    event_at, grams = int(event[0]), float(event[1])
+    candidates = [
+        r
+        for r in live
+        if abs(float(r["grams"]) - grams) < 0.01
+        and abs(int(r["event_at_epoch"]) - event_at) <= SESSION_EVENT_MATCH_TOLERANCE_SEC
+    ]
+    return min(candidates, key=lambda r: abs(int(r["event_at_epoch"]) - event_at), default=None)
+
+
+def apply_session_event_changes(
+    db_path: str,
+    *,
+    user_id: int,
+    session_id: int,
+    removed: list[tuple[int, float, int, float, float]],
+    added: list[tuple[int, float, int, float, float]],
+    logged_at_iso: str,
+) -> bool:
+    """Append drinks and tombstones to an active session's event log.
+
+    Events are (event_at_epoch, grams, calories, carbs_g, sugar_g). Removed
+    events are matched to live log rows by time and grams. Returns False without
+    writing if the session is no longer active or a removed event has no match,
+    so the caller can fall back to a full snapshot.
+    """
+    with _connect(db_path) as conn:
+        conn.row_factory = sqlite3.Row
+        active = conn.execute(
+            "SELECT 1 FROM saved_sessions WHERE id = ? AND user_id = ? AND is_active = 1",
+            (session_id, user_id),
+        ).fetchone()
+        if active is None:
+            return False
+        tombstone_ids: list[int] = []
+        if removed:
+            live = _live_session_events(conn, user_id=user_id, session_id=session_id)
+            for event in removed:
+                match = _match_session_event(live, event)
+                if match is None:
+                    return False
+                live.remove(match)
+                tombstone_ids.append(int(match["id"]))
+        for ref_id in tombstone_ids:
+            conn.execute(
+                """
+                INSERT INTO session_events (session_id, user_id, kind, ref_event_id, logged_at)
+                VALUES (?, ?, 'tombstone', ?, ?)
+                """,
+                (session_id, user_id, ref_id, logged_at_iso),
+            )
+        for event_at, grams, calories, carbs, sugar in added:
+            conn.execute(
+                """
+                INSERT INTO session_events (
+                    session_id, user_id, kind, event_at_epoch, grams, calories, carbs_g, sugar_g, logged_at
+                )
+                VALUES (?, ?, 'drink', ?, ?, ?, ?, ?, ?)
+                """,
+                (session_id, user_id, int(event_at), float(grams), int(calories), float(carbs), float(sugar), logged_at_iso),
+            )
+        conn.commit()
+    return True
+
+
+def reset_session_events(
+    db_path: str,
+    *,
+    user_id: int,
+    session_id: int,
+    events: list[tuple[int, float, int, float, float]],
+    logged_at_iso: str,
+) -> None:
+    """Make the event log match `events` by tombstoning everything live and re-appending."""
+    with _connect(db_path) as conn:
+        conn.row_factory = sqlite3.Row
+        live = _live_session_events(conn, user_id=user_id, session_id=session_id)
+    apply_session_event_changes(
+        db_path,
+        user_id=user_id,
+        session_id=session_id,
+        removed=[(int(r["event_at_epoch"]), float(r["grams"]), 0, 0.0, 0.0) for r in live],
+        added=events,
+        logged_at_iso=logged_at_iso,
+    )
+
+
+def list_session_events(db_path: str, *, user_id: int, session_id: int) -> list[dict[str, Any]]:
+    """Live drink events for one session, oldest first."""
+    with _connect(db_path) as conn:
+        conn.row_factory = sqlite3.Row
+        live = _live_session_events(conn, user_id=user_id, session_id=session_id)
+    return [
+        {
+            "id": r["id"],
+            "event_at_epoch": int(r["event_at_epoch"]),
+            "grams": float(r["grams"]),
+            "calories": int(r["calories"]),
+            "carbs_g": float(r["carbs_g"]),
+            "sugar_g": float(r["sugar_g"]),
+            "logged_at": r["logged_at"],
+        }
+        for r in sorted(live, key=lambda r: (int(r["event_at_epoch"]), int(r["id"])))
+    ]
+
+
 def list_user_sessions(
     db_path: str,
     *,
@@ -953,81 +1643,104 @@ def list_user_sessions(
     limit: int = 200,
     session_date: str | None = None,
     include_active: bool = False,
+    before_id: int | None = None,
 ) -> list[dict[str, Any]]:
+    """Sessions newest first; pass the last returned id as `before_id` for the next page."""
+    filters = ["user_id = ?"]
+    params: list[Any] = [user_id]
+    if session_date:
+        filters.append("session_date = ?")
+        params.append(session_date)
+    if before_id is not None:
+        filters.append("id < ?")
+        params.append(int(before_id))
+    if not include_active:
+        filters.append("COALESCE(is_active, 0) = 0")
+    params.append(max(1, min(limit, 200)))
     with _connect(db_path) as conn:
         conn.row_factory = sqlite3.Row
-        active_sql = "" if include_active else "AND COALESCE(is_active, 0) = 0"
-        if session_date:
-            rows = conn.execute(
-                """
-                SELECT id, name, created_at, payload_json, date(created_at) AS session_date,
-                       COALESCE(is_auto, 0) AS is_auto, COALESCE(is_active, 0) AS is_active,
-                       started_at, last_event_at, ended_at
-                FROM saved_sessions
-                WHERE user_id = ? AND date(created_at) = ?
-                """
-                + active_sql
-                + """
-                ORDER BY rowid DESC
-                LIMIT ?
-                """,
-                (user_id, session_date, max(1, min(limit, 200))),
-            ).fetchall()
-        else:
-            rows = conn.execute(
-                """
-                SELECT id, name, created_at, payload_json, date(created_at) AS session_date,
-                       COALESCE(is_auto, 0) AS is_auto, COALESCE(is_active, 0) AS is_active,
-                       started_at, last_event_at, ended_at
-                FROM saved_sessions
-                WHERE user_id = ?
-                """
-                + active_sql
-                + """
-                ORDER BY rowid DESC
-                LIMIT ?
-                """,
-                (user_id, max(1, min(limit, 200))),
-            ).fetchall()
+        rows = conn.execute(
+            """
+            SELECT id, name, created_at, COALESCE(session_date, CAST(date(created_at) AS TEXT)) AS session_date,
+                   COALESCE(is_auto, 0) AS is_auto, COALESCE(is_active, 0) AS is_active,
+                   started_at, last_event_at, ended_at,
+                   drink_count, total_grams, total_calories, peak_bac, minutes_over_limit, duration_minutes,
+                   CASE WHEN drink_count IS NULL THEN payload_json END AS payload_json
+            FROM saved_sessions
+            WHERE """
+            + " AND ".join(filters)
+            + """
+            ORDER BY id DESC
+            LIMIT ?
+            """,
+            params,
+        ).fetchall()
 
-    out = []
-    for row in rows:
-        try:
-            payload = json.loads(row["payload_json"] or "{}")
-        except json.JSONDecodeError:
-            payload = {}
-        events = payload.get("events", [])
-        out.append(
-            {
-                "id": row["id"],
-                "name": row["name"],
-                "created_at": row["created_at"],
-                "session_date": row["session_date"],
-                "drink_count": len(events) if isinstance(events, list) else 0,
-                "is_auto": bool(row["is_auto"]),
-                "is_active": bool(row["is_active"]),
-                "started_at": row["started_at"],
-                "last_event_at": row["last_event_at"],
-                "ended_at": row["ended_at"],
-            }
-        )
+        out = []
+        for row in rows:
+            if row["drink_count"] is None:
+                # Not backfilled yet: summarise from the payload.
+                try:
+                    payload = json.loads(row["payload_json"] or "{}")
+                except json.JSONDecodeError:
+                    payload = {}
+                summary = session_summary(payload if isinstance(payload, dict) else {})
+            else:
+                summary = {col: row[col] for col in SESSION_SUMMARY_COLUMNS}
+            if row["is_active"]:
+                # Drinks since the last compaction only exist in the event log.
+                live = _live_session_events(conn, user_id=user_id, session_id=int(row["id"]))
+                if live:
+                    summary["drink_count"] = len(live)
+            out.append(
+                {
+                    "id": row["id"],
+                    "name": row["name"],
+                    "created_at": row["created_at"],
+                    "session_date": row["session_date"],
+                    "drink_count": int(summary["drink_count"] or 0),
+                    "total_grams": float(summary["total_grams"] or 0.0),
+                    "total_calories": int(summary["total_calories"] or 0),
+                    "peak_bac": float(summary["peak_bac"] or 0.0),
+                    "minutes_over_limit": int(summary["minutes_over_limit"] or 0),
+                    "duration_minutes": int(summary["duration_minutes"] or 0),
+                    "is_auto": bool(row["is_auto"]),
+                    "is_active": bool(row["is_active"]),
+                    "started_at": row["started_at"],
+                    "last_event_at": row["last_event_at"],
+                    "ended_at": row["ended_at"],
+                }
+            )
     return out
 
 
-def list_session_dates(db_path: str, *, user_id: int, limit: int = 120) -> list[dict[str, Any]]:
+def list_session_dates(
+    db_path: str,
+    *,
+    user_id: int,
+    limit: int = 120,
+    before_date: str | None = None,
+) -> list[dict[str, Any]]:
+    """Days with finished sessions, newest first; page with the last `session_date` as `before_date`."""
+    before_sql = "AND session_date < ?" if before_date else ""
+    params: tuple[Any, ...] = (user_id, before_date) if before_date else (user_id,)
     with _connect(db_path) as conn:
         conn.row_factory = sqlite3.Row
         rows = conn.execute(
             """
-            SELECT date(created_at) AS session_date, COUNT(*) AS session_count
+            SELECT session_date, COUNT(*) AS session_count
             FROM saved_sessions
             WHERE user_id = ?
+              AND session_date IS NOT NULL
               AND COALESCE(is_active, 0) = 0
-            GROUP BY date(created_at)
+            """
+            + before_sql
+            + """
+            GROUP BY session_date
             ORDER BY session_date DESC
             LIMIT ?
             """,
-            (user_id, max(1, min(limit, 366))),
+            (*params, max(1, min(limit, 366))),
         ).fetchall()
     return [{"session_date": row["session_date"], "session_count": row["session_count"]} for row in rows]
 
@@ -1052,30 +1765,86 @@ def get_user_session_payload(db_path: str, *, user_id: int, session_id: int) ->
         return None
 
 
-def list_recent_session_payloads(db_path: str, *, user_id: int, limit: int = 5) -> list[dict[str, Any]]:
+def get_session_payloads(db_path: str, *, user_id: int, session_ids: list[int]) -> dict[int, dict[str, Any]]:
+    """Parsed payloads for several of a user's sessions, keyed by session id.
+
+    Drinks logged into an active session live in `session_events` until it is
+    finalized, so active payloads are rebuilt from the live log.
+    """
+    if not session_ids:
+        return {}
+    out: dict[int, dict[str, Any]] = {}
     with _connect(db_path) as conn:
         conn.row_factory = sqlite3.Row
         rows = conn.execute(
-            """
-            SELECT payload_json
-            FROM saved_sessions
-            WHERE user_id = ? AND COALESCE(is_active, 0) = 0
-            ORDER BY id DESC
-            LIMIT ?
-            """,
-            (user_id, max(1, min(limit, 20))),
+            "SELECT id, payload_json, is_active FROM saved_sessions WHERE user_id = ? AND id IN ("
+            + ", ".join("?" for _ in session_ids)
+            + ")",
+            (user_id, *[int(sid) for sid in session_ids]),
         ).fetchall()
-    out: list[dict[str, Any]] = []
-    for row in rows:
-        try:
-            payload = json.loads(row["payload_json"] or "{}")
-        except json.JSONDecodeError:
-            payload = {}
-        if isinstance(payload, dict):
-            out.append(payload)
+        for row in rows:
+            try:
+                payload = json.loads(row["payload_json"] or "{}")
+            except json.JSONDecodeError:
+                continue
+            if not isinstance(payload, dict):
+                continue
+            if int(row["is_active"] or 0):
+                live = _live_session_events(conn, user_id=user_id, session_id=int(row["id"]))
+                if live:
+                    payload = _payload_from_log(payload, live)
+            out[int(row["id"])] = payload
     return out
 
 
+def list_recent_session_payloads(db_path: str, *, user_id: int, limit: int = 5) -> list[dict[str, Any]]:
+    """Payloads of the most recent finished sessions, newest first.
+
+    Finished sessions never change, so parsed payloads are cached by id and a
+    poll only costs one index-backed id lookup.
+    """
+    path = str(db_path).strip()
+    with _connect(db_path) as conn:
+        conn.row_factory = sqlite3.Row
+        ids = [
+            int(r["id"])
+            for r in conn.execute(
+                """
+                SELECT id
+                FROM saved_sessions
+                WHERE user_id = ? AND COALESCE(is_active, 0) = 0
+                ORDER BY id DESC
+                LIMIT ?
+                """,
+                (user_id, max(1, min(limit, 20))),
+            ).fetchall()
+        ]
+        with _SNAPSHOT_CACHE_LOCK:
+            cached = {sid: _SESSION_PAYLOAD_CACHE[(path, sid)] for sid in ids if (path, sid) in _SESSION_PAYLOAD_CACHE}
+        missing = [sid for sid in ids if sid not in cached]
+        metrics.record_cache("session_payload", hit=True, count=len(cached))
+        metrics.record_cache("session_payload", hit=False, count=len(missing))
+        if missing:
+            rows = conn.execute(
+                "SELECT id, payload_json FROM saved_sessions WHERE user_id = ? AND id IN ("
+                + ", ".join("?" for _ in missing)
+                + ")",
+                (user_id, *missing),
+            ).fetchall()
+            for row in rows:
+                try:
+                    payload = json.loads(row["payload_json"] or "{}")
+                except json.JSONDecodeError:
+                    payload = {}
+                cached[int(row["id"])] = payload if isinstance(payload, dict) else None
+            with _SNAPSHOT_CACHE_LOCK:
+                for sid in missing:
+                    _SESSION_PAYLOAD_CACHE[(path, sid)] = cached.get(sid)
+                while len(_SESSION_PAYLOAD_CACHE) > SESSION_PAYLOAD_CACHE_MAX_ENTRIES:
+                    _SESSION_PAYLOAD_CACHE.pop(next(iter(_SESSION_PAYLOAD_CACHE)))
+    return [dict(cached[sid]) for sid in ids if cached.get(sid) is not None]
+
+
 def track_favorite_drink(db_path: str, *, user_id: int, catalog_id: str, increment: int = 1) -> None:
     safe_increment = max(1, min(int(increment), 20))
     with _connect(db_path) as conn:
@@ -1144,7 +1913,7 @@ def find_user_by_username(db_path: str, *, username: str) -> dict[str, Any] | No
     with _connect(db_path) as conn:
         conn.row_factory = sqlite3.Row
         row = conn.execute(
-            "SELECT id, email, display_name, username, invite_code FROM users WHERE username = ?",
+            "SELECT id, email, display_name, username, invite_code FROM users WHERE username = ? AND deleted_at IS NULL",
             (cleaned,),
         ).fetchone()
     if row is None:
@@ -1165,7 +1934,7 @@ def find_user_by_invite_code(db_path: str, *, invite_code: str) -> dict[str, Any
     with _connect(db_path) as conn:
         conn.row_factory = sqlite3.Row
         row = conn.execute(
-            "SELECT id, email, display_name, username, invite_code FROM users WHERE invite_code = ?",
+            "SELECT id, email, display_name, username, invite_code FROM users WHERE invite_code = ? AND deleted_at IS NULL",
             (code,),
         ).fetchone()
     if row is None:
@@ -1212,24 +1981,170 @@ def upsert_presence(
     bac_now: float,
     drink_count: int,
     location_note: str | None = None,
+    bac_model: str | None = None,
 ) -> None:
     with _connect(db_path) as conn:
         conn.execute(
             """
-            INSERT INTO user_presence (user_id, bac_now, drink_count, location_note, updated_at)
-            VALUES (?, ?, ?, ?, datetime('now'))
+            INSERT INTO user_presence (user_id, bac_now, drink_count, location_note, bac_model_json, updated_at)
+            VALUES (?, ?, ?, ?, ?, datetime('now'))
             ON CONFLICT(user_id) DO UPDATE SET
               bac_now=excluded.bac_now,
               drink_count=excluded.drink_count,
               location_note=COALESCE(excluded.location_note, user_presence.location_note),
+              bac_model_json=excluded.bac_model_json,
               updated_at=datetime('now')
             """,
-            (user_id, float(bac_now), int(drink_count), (location_note or None)),
+            (user_id, float(bac_now), int(drink_count), (location_note or None), bac_model),
         )
         conn.commit()
+    _invalidate_user_group_snapshots(db_path, user_id=user_id)
 
 
-def list_friends(db_path: str, *, user_id: int) -> list[dict[str, Any]]:
+def upsert_presence_many(db_path: str, rows: list[dict[str, Any]]) -> None:
+    """Write several presence rows with multi-row upserts."""
+    with _connect(db_path) as conn:
+        for start in range(0, len(rows), PRESENCE_UPSERT_BATCH_SIZE):
+            batch = rows[start : start + PRESENCE_UPSERT_BATCH_SIZE]
+            params: list[Any] = []
+            for row in batch:
+                params.extend(
+                    (
+                        int(row["user_id"]),
+                        float(row["bac_now"]),
+                        int(row["drink_count"]),
+                        row.get("location_note") or None,
+                        row.get("bac_model"),
+                    )
+                )
+            conn.execute(
+                """
+                INSERT INTO user_presence (user_id, bac_now, drink_count, location_note, bac_model_json, updated_at)
+                VALUES """
+                + ", ".join(["(?, ?, ?, ?, ?, datetime('now'))"] * len(batch))
+                + """
+                ON CONFLICT(user_id) DO UPDATE SET
+                  bac_now=excluded.bac_now,
+                  drink_count=excluded.drink_count,
+                  location_note=COALESCE(excluded.location_note, user_presence.location_note),
+                  bac_model_json=excluded.bac_model_json,
+                  updated_at=datetime('now')
+                """,
+                params,
+            )
+        conn.commit()
+
+
+def _presence_buffer(db_path: str, *, create: bool = True) -> PresenceBuffer | None:
+    path = str(db_path).strip()
+    with _PRESENCE_LOCK:
+        buffer = _PRESENCE_BUFFERS.get(path)
+        if buffer is None and create:
+            buffer = _PRESENCE_BUFFERS[path] = PresenceBuffer()
+        return buffer
+
+
+def _presence_flush_loop() -> None:
+    while True:
+        time.sleep(PRESENCE_FLUSH_INTERVAL_SEC)
+        flush_presence()
+
+
+def _start_presence_flusher() -> None:
+    global _presence_flusher
+    with _PRESENCE_LOCK:
+        if _presence_flusher is not None:
+            return
+        _presence_flusher = threading.Thread(target=_presence_flush_loop, name="presence-flush", daemon=True)
+        _presence_flusher.start()
+    atexit.register(flush_presence)
+
+
+def record_presence(
+    db_path: str,
+    *,
+    user_id: int,
+    bac_now: float,
+    drink_count: int,
+    location_note: str | None = None,
+    bac_model: str | None = None,
+) -> bool:
+    """Keep presence in memory; return True if a DB write was queued.
+
+    Unchanged heartbeats only refresh the in-memory timestamp. Model, drink
+    count or location changes (or BAC moves above the epsilon when no model is
+    given), and stale rows are written by the background flusher.
+    """
+    queued = _presence_buffer(db_path).record(
+        int(user_id),
+        bac_now=bac_now,
+        drink_count=drink_count,
+        location_note=location_note,
+        updated_at=presence_cursor_now(),
+        bac_model=bac_model,
+    )
+    _start_presence_flusher()
+    return queued
+
+
+def flush_presence(db_path: str | None = None) -> int:
+    """Write pending presence rows now; return how many were written."""
+    with _PRESENCE_LOCK:
+        targets = [(path, buf) for path, buf in _PRESENCE_BUFFERS.items() if db_path is None or path == str(db_path).strip()]
+    written = 0
+    for path, buffer in targets:
+        rows = buffer.take_pending()
+        if not rows:
+            continue
+        try:
+            upsert_presence_many(path, rows)
+        except Exception:
+            buffer.requeue(rows)
+            logger.exception("presence flush failed rows=%s", len(rows))
+            continue
+        written += len(rows)
+    return written
+
+
+def _overlay_presence(db_path: str, user_id: int, row: dict[str, Any]) -> dict[str, Any]:
+    """Return `row` with in-memory presence applied when it is fresher than the DB."""
+    buffer = _presence_buffer(db_path, create=False)
+    live = buffer.get(user_id) if buffer is not None else None
+    if live is None:
+        return row
+    stored_at = _as_utc_datetime(row.get("updated_at"))
+    live_at = _as_utc_datetime(live["updated_at"])
+    if stored_at is not None and (live_at is None or stored_at > live_at):
+        return row
+    out = {
+        **row,
+        "bac_now": live["bac_now"],
+        "drink_count": live["drink_count"],
+        "updated_at": live["updated_at"],
+        "bac_model": live["bac_model"],
+    }
+    if "location_note" in row:
+        out["location_note"] = live["location_note"] or row["location_note"]
+    return out
+
+
+def _project_presence(rows: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Replace stored `bac_now` with the BAC projected now from each row's model.
+
+    All rows are projected in one batch at the same instant. The model itself is
+    never returned to callers.
+    """
+    projected = project_bac_many([r.get("bac_model") for r in rows])
+    out = []
+    for row, bac in zip(rows, projected):
+        item = {k: v for k, v in row.items() if k != "bac_model"}
+        if bac is not None and item.get("bac_now") is not None:
+            item["bac_now"] = bac
+        out.append(item)
+    return out
+
+
+def list_friends(db_path: str, *, user_id: int) -> list[dict[str, Any]]:
     with _connect(db_path) as conn:
         conn.row_factory = sqlite3.Row
         rows = conn.execute(
@@ -1366,25 +2281,114 @@ def respond_friend_request(db_path: str, *, user_id: int, request_id: int, accep
         return True, "Friend request rejected."
 
 
-def list_friend_feed(db_path: str, *, user_id: int) -> list[dict[str, Any]]:
+def presence_cursor_now() -> str:
+    """Return an `updated_since` cursor for the current moment (UTC, DB timestamp format)."""
+    return datetime.now(timezone.utc).strftime(PRESENCE_CURSOR_FORMAT)
+
+
+def normalize_presence_cursor(value: Any) -> str | None:
+    """Return a usable `updated_since` cursor, or None when the client must fully resync."""
+    if not isinstance(value, str) or not value.strip():
+        return None
+    try:
+        parsed = datetime.strptime(value.strip(), PRESENCE_CURSOR_FORMAT).replace(tzinfo=timezone.utc)
+    except ValueError:
+        return None
+    now = datetime.now(timezone.utc)
+    if parsed > now + timedelta(minutes=5):
+        return None
+    if now - parsed > timedelta(hours=PRESENCE_CURSOR_MAX_AGE_HOURS):
+        return None
+    return parsed.strftime(PRESENCE_CURSOR_FORMAT)
+
+
+def _filter_alerts_since(alerts: list[dict[str, Any]], since_alert_id: int | None) -> tuple[list[dict[str, Any]], bool]:
+    """Return (alerts newer than the cursor, resync) from a newest-first page.
+
+    If every alert in a full page is newer than the cursor, alerts may have been
+    missed between pages, so the whole page is returned with resync=True.
+    """
+    if since_alert_id is None:
+        return list(alerts), False
+    newer = [a for a in alerts if int(a["id"]) > int(since_alert_id)]
+    if len(alerts) >= GROUP_ALERT_PAGE_SIZE and len(newer) == len(alerts):
+        return list(alerts), True
+    return newer, False
+
+
+def _as_utc_datetime(value: Any) -> datetime | None:
+    if isinstance(value, datetime):
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    if isinstance(value, str) and value:
+        try:
+            return datetime.strptime(value[:19], PRESENCE_CURSOR_FORMAT).replace(tzinfo=timezone.utc)
+        except ValueError:
+            return None
+    return None
+
+
+def _presence_changed_since(updated_at: Any, updated_since: str | None) -> bool:
+    if not updated_since:
+        return True
+    changed = _as_utc_datetime(updated_at)
+    cursor = _as_utc_datetime(updated_since)
+    return changed is not None and cursor is not None and changed >= cursor
+
+
+def _presence_since(rows: list[dict[str, Any]], updated_since: str | None) -> list[dict[str, Any]]:
+    """Rows a client polling with `updated_since` has not seen yet.
+
+    A row counts when it was written after the cursor, or when its projected BAC
+    has visibly moved since then: a drinker's BAC keeps falling between writes.
+    """
+    if not updated_since:
+        return rows
+    cursor = _as_utc_datetime(updated_since)
+    if cursor is None:
+        return []
+    models = [r.get("bac_model") for r in rows]
+    then = project_bac_many(models, at_epoch=cursor.timestamp())
+    now = project_bac_many(models)
+    return [
+        row
+        for row, before, after in zip(rows, then, now)
+        if _presence_changed_since(row["updated_at"], updated_since)
+        or (before is not None and after is not None and abs(after - before) >= PRESENCE_DISPLAY_EPSILON)
+    ]
+
+
+def _snapshot_cursor(
+    alerts: list[dict[str, Any]],
+    *,
+    since_alert_id: int | None,
+    issued_at: str,
+) -> dict[str, Any]:
+    last_alert_id = max((int(a["id"]) for a in alerts), default=int(since_alert_id or 0))
+    return {"since_alert_id": last_alert_id, "updated_since": issued_at}
+
+
+def list_friend_feed(db_path: str, *, user_id: int, updated_since: str | None = None) -> list[dict[str, Any]]:
+    # The cursor is applied after overlaying buffered presence, since a friend's
+    # latest heartbeat may only exist in memory.
     with _connect(db_path) as conn:
         conn.row_factory = sqlite3.Row
         rows = conn.execute(
             """
-            SELECT u.id, u.display_name, u.email, p.bac_now, p.drink_count, p.updated_at
+            SELECT u.id, u.display_name, u.email, p.bac_now, p.drink_count, p.bac_model_json, p.updated_at
             FROM friendships f
             JOIN users u ON u.id = f.friend_user_id
             LEFT JOIN user_social_settings s ON s.user_id = u.id
             LEFT JOIN user_presence p ON p.user_id = u.id
             WHERE f.user_id = ?
               AND COALESCE(s.share_with_friends, 0) = 1
-            ORDER BY p.updated_at DESC, u.display_name COLLATE NOCASE ASC
+            ORDER BY u.display_name COLLATE NOCASE ASC
             """,
             (user_id,),
         ).fetchall()
-    out = []
-    for r in rows:
-        out.append(
+    out = [
+        _overlay_presence(
+            db_path,
+            int(r["id"]),
             {
                 "user_id": r["id"],
                 "display_name": r["display_name"],
@@ -1392,8 +2396,14 @@ def list_friend_feed(db_path: str, *, user_id: int) -> list[dict[str, Any]]:
                 "bac_now": float(r["bac_now"]) if r["bac_now"] is not None else None,
                 "drink_count": int(r["drink_count"]) if r["drink_count"] is not None else None,
                 "updated_at": r["updated_at"],
-            }
+                "bac_model": r["bac_model_json"],
+            },
         )
+        for r in rows
+    ]
+    out = _project_presence(_presence_since(out, updated_since))
+    # Most recently updated first; stable sort keeps name order for ties.
+    out.sort(key=lambda item: _as_utc_datetime(item["updated_at"]) or datetime.min.replace(tzinfo=timezone.utc), reverse=True)
     return out
 
 
@@ -1410,6 +2420,7 @@ def create_group(db_path: str, *, owner_user_id: int, name: str) -> dict[str, An
             (group_id, owner_user_id),
         )
         conn.commit()
+    _clear_alert_quiet(db_path, user_id=owner_user_id)
     return {"id": group_id, "name": name.strip(), "invite_code": invite_code}
 
 
@@ -1458,6 +2469,8 @@ def join_group_by_code(db_path: str, *, user_id: int, invite_code: str) -> tuple
             (grp["id"], user_id),
         )
         conn.commit()
+    invalidate_group_snapshot(db_path, group_id=grp["id"])
+    _clear_alert_quiet(db_path, user_id=user_id)
     return True, "Joined group."
 
 
@@ -1477,6 +2490,7 @@ def set_group_share_enabled(db_path: str, *, group_id: int, user_id: int, enable
             (1 if enabled else 0, group_id, user_id),
         )
         conn.commit()
+    invalidate_group_snapshot(db_path, group_id=group_id)
 
 
 def get_group_role(db_path: str, *, group_id: int, user_id: int) -> str | None:
@@ -1495,6 +2509,7 @@ def set_group_member_role(db_path: str, *, group_id: int, target_user_id: int, r
             (role, group_id, target_user_id),
         )
         conn.commit()
+    invalidate_group_snapshot(db_path, group_id=group_id)
 
 
 def set_group_buddy_pair(db_path: str, *, group_id: int, user_a: int, user_b: int) -> None:
@@ -1517,6 +2532,7 @@ def set_group_buddy_pair(db_path: str, *, group_id: int, user_a: int, user_b: in
             (group_id, user_b, user_a),
         )
         conn.commit()
+    invalidate_group_snapshot(db_path, group_id=group_id)
 
 
 def clear_group_buddy_pair(db_path: str, *, group_id: int, user_id: int) -> None:
@@ -1531,6 +2547,7 @@ def clear_group_buddy_pair(db_path: str, *, group_id: int, user_id: int) -> None
         if buddy_id is not None:
             conn.execute("DELETE FROM group_buddy_pairs WHERE group_id = ? AND user_id = ?", (group_id, buddy_id))
         conn.commit()
+    invalidate_group_snapshot(db_path, group_id=group_id)
 
 
 def create_group_alert(
@@ -1551,114 +2568,310 @@ def create_group_alert(
             (group_id, from_user_id, target_user_id, alert_type, message),
         )
         conn.commit()
+    invalidate_group_snapshot(db_path, group_id=group_id)
+
+
+def _load_alert_cooldowns(conn: _ConnWrapper) -> dict[tuple[int, int, str], float]:
+    """Read alerts still inside the cooldown window, to seed the registry."""
+    conn.row_factory = sqlite3.Row
+    # Only a window's worth of rows qualifies, so the latest per key is kept here
+    # rather than with GROUP BY, which would walk the whole cooldown index.
+    rows = conn.execute(
+        """
+        SELECT group_id, from_user_id, alert_type, created_at
+        FROM group_alerts
+        WHERE created_at >= datetime('now', '-30 minutes') AND from_user_id IS NOT NULL
+        """
+    ).fetchall()
+    out: dict[tuple[int, int, str], float] = {}
+    for r in rows:
+        last_at = _as_utc_datetime(r["created_at"])
+        if last_at is None:
+            continue
+        key = (int(r["group_id"]), int(r["from_user_id"]), r["alert_type"])
+        out[key] = max(out.get(key, 0.0), last_at.timestamp())
+    return out
+
+
+def _clear_alert_quiet(db_path: str, *, user_id: int) -> None:
+    with _ALERT_COOLDOWN_LOCK:
+        _ALERT_QUIET_UNTIL.pop((str(db_path).strip(), int(user_id)), None)
+
+
+def clear_alert_cooldowns(db_path: str | None = None) -> None:
+    """Forget cached alert cooldowns (for one DB, or all)."""
+    with _ALERT_COOLDOWN_LOCK:
+        if db_path is None:
+            _ALERT_COOLDOWNS.clear()
+            _ALERT_QUIET_UNTIL.clear()
+            return
+        path = str(db_path).strip()
+        _ALERT_COOLDOWNS.pop(path, None)
+        for key in [k for k in _ALERT_QUIET_UNTIL if k[0] == path]:
+            _ALERT_QUIET_UNTIL.pop(key, None)
+
+
+def _sweep_alert_registry(now: float) -> None:
+    """Drop expired cooldowns and quiet periods; caller holds `_ALERT_COOLDOWN_LOCK`."""
+    global _alert_last_sweep
+    if now - _alert_last_sweep < ALERT_REGISTRY_SWEEP_SEC:
+        return
+    _alert_last_sweep = now
+    for key in [k for k, until in _ALERT_QUIET_UNTIL.items() if until <= now]:
+        del _ALERT_QUIET_UNTIL[key]
+    for cooldowns in _ALERT_COOLDOWNS.values():
+        for key in [k for k, last in cooldowns.items() if now - last >= THRESHOLD_ALERT_COOLDOWN_SEC]:
+            del cooldowns[key]
 
 
 def maybe_create_threshold_alert(db_path: str, *, user_id: int, bac_now: float) -> None:
     if bac_now < 0.08:
         return
+    path = str(db_path).strip()
+    now = time.time()
+    with _ALERT_COOLDOWN_LOCK:
+        _sweep_alert_registry(now)
+        # Common case while BAC stays high: every group was alerted recently.
+        if _ALERT_QUIET_UNTIL.get((path, int(user_id)), 0.0) > now:
+            return
+        cooldowns = _ALERT_COOLDOWNS.get(path)
+
+    alerted_group_ids: list[int] = []
+    sent_at: dict[int, float] = {}
     with _connect(db_path) as conn:
+        if cooldowns is None:
+            loaded = _load_alert_cooldowns(conn)
+            with _ALERT_COOLDOWN_LOCK:
+                cooldowns = _ALERT_COOLDOWNS.setdefault(path, loaded)
         conn.row_factory = sqlite3.Row
         groups = conn.execute(
             "SELECT group_id FROM group_members WHERE user_id = ?",
             (user_id,),
         ).fetchall()
         for g in groups:
+            group_id = int(g["group_id"])
+            with _ALERT_COOLDOWN_LOCK:
+                last = cooldowns.get((group_id, int(user_id), "threshold"))
+            if last is not None and now - last < THRESHOLD_ALERT_COOLDOWN_SEC:
+                sent_at[group_id] = last
+                continue
+            # Registry miss: another worker may have alerted since this one warmed up.
             recent = conn.execute(
                 """
-                SELECT 1 FROM group_alerts
+                SELECT MAX(created_at) FROM group_alerts
                 WHERE group_id = ? AND from_user_id = ? AND alert_type = 'threshold'
                   AND created_at >= datetime('now', '-30 minutes')
                 """,
-                (g["group_id"], user_id),
+                (group_id, user_id),
             ).fetchone()
-            if recent is None:
-                conn.execute(
-                    """
-                    INSERT INTO group_alerts (group_id, from_user_id, alert_type, message)
-                    VALUES (?, ?, 'threshold', ?)
-                    """,
-                    (g["group_id"], user_id, "High BAC alert: friend may need water/ride support."),
-                )
+            recent_at = _as_utc_datetime(recent[0]) if recent is not None else None
+            if recent_at is not None:
+                sent_at[group_id] = recent_at.timestamp()
+                continue
+            conn.execute(
+                """
+                INSERT INTO group_alerts (group_id, from_user_id, alert_type, message)
+                VALUES (?, ?, 'threshold', ?)
+                """,
+                (group_id, user_id, "High BAC alert: friend may need water/ride support."),
+            )
+            sent_at[group_id] = now
+            alerted_group_ids.append(group_id)
         conn.commit()
 
+    with _ALERT_COOLDOWN_LOCK:
+        for group_id, last in sent_at.items():
+            cooldowns[(group_id, int(user_id), "threshold")] = last
+        # Every group is now in cooldown. A user with no groups gets no quiet period:
+        # the join that would end it may be served by another worker.
+        if sent_at:
+            quiet_until = min(sent_at.values()) + THRESHOLD_ALERT_COOLDOWN_SEC
+            _ALERT_QUIET_UNTIL[(path, int(user_id))] = min(quiet_until, now + ALERT_QUIET_RECHECK_SEC)
+    for group_id in alerted_group_ids:
+        invalidate_group_snapshot(db_path, group_id=group_id)
 
-def get_group_snapshot(db_path: str, *, group_id: int, user_id: int) -> dict[str, Any] | None:
-    if not is_group_member(db_path, group_id=group_id, user_id=user_id):
-        return None
-    with _connect(db_path) as conn:
-        conn.row_factory = sqlite3.Row
-        group = conn.execute(
-            "SELECT id, name, invite_code FROM social_groups WHERE id = ?",
-            (group_id,),
-        ).fetchone()
-        if group is None:
+
+def _cache_key(db_path: str, key: Any) -> tuple[str, Any]:
+    return (str(db_path).strip(), key)
+
+
+def _cache_get(cache: dict[tuple[str, Any], tuple[float, Any]], key: tuple[str, Any]) -> Any | None:
+    with _SNAPSHOT_CACHE_LOCK:
+        entry = cache.get(key)
+        if entry is None:
             return None
-        members = conn.execute(
-            """
-            SELECT u.id, u.display_name, u.email, gm.role, gm.share_enabled,
-                   p.bac_now, p.drink_count, p.location_note, p.updated_at
-            FROM group_members gm
-            JOIN users u ON u.id = gm.user_id
-            LEFT JOIN user_presence p ON p.user_id = gm.user_id
-            WHERE gm.group_id = ?
-            ORDER BY gm.role DESC, u.display_name COLLATE NOCASE ASC
-            """,
-            (group_id,),
-        ).fetchall()
-        alerts = conn.execute(
-            """
-            SELECT id, alert_type, message, created_at, from_user_id, target_user_id
-            FROM group_alerts
-            WHERE group_id = ?
-            ORDER BY id DESC
-            LIMIT 40
-            """,
-            (group_id,),
-        ).fetchall()
-        buddies = conn.execute(
-            """
-            SELECT user_id, buddy_user_id
-            FROM group_buddy_pairs
-            WHERE group_id = ?
-            """,
-            (group_id,),
-        ).fetchall()
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            cache.pop(key, None)
+            return None
+        return value
+
+
+def _cache_put(cache: dict[tuple[str, Any], tuple[float, Any]], key: tuple[str, Any], value: Any) -> None:
+    with _SNAPSHOT_CACHE_LOCK:
+        cache.pop(key, None)
+        cache[key] = (time.monotonic() + GROUP_SNAPSHOT_TTL_SEC, value)
+        while len(cache) > GROUP_SNAPSHOT_CACHE_MAX_ENTRIES:
+            cache.pop(next(iter(cache)))
+
+
+def invalidate_group_snapshot(db_path: str, *, group_id: int) -> None:
+    """Drop cached snapshot and guardian link state for one group."""
+    path = str(db_path).strip()
+    with _SNAPSHOT_CACHE_LOCK:
+        _GROUP_SNAPSHOT_CACHE.pop((path, int(group_id)), None)
+        for key in [k for k, (_, link) in _GUARDIAN_LINK_CACHE.items() if k[0] == path and link["group_id"] == int(group_id)]:
+            _GUARDIAN_LINK_CACHE.pop(key, None)
+
+
+def _invalidate_user_group_snapshots(db_path: str, *, user_id: int) -> None:
+    path = str(db_path).strip()
+    with _SNAPSHOT_CACHE_LOCK:
+        stale = [k[1] for k, (_, base) in _GROUP_SNAPSHOT_CACHE.items() if k[0] == path and int(user_id) in base["member_ids"]]
+    for group_id in stale:
+        invalidate_group_snapshot(db_path, group_id=group_id)
+
+
+def clear_snapshot_cache(db_path: str | None = None) -> None:
+    """Drop cached group snapshots, guardian links and session payloads (for one DB, or all)."""
+    with _SNAPSHOT_CACHE_LOCK:
+        for cache in (_GROUP_SNAPSHOT_CACHE, _GUARDIAN_LINK_CACHE, _SESSION_PAYLOAD_CACHE):
+            if db_path is None:
+                cache.clear()
+                continue
+            path = str(db_path).strip()
+            for key in [k for k in cache if k[0] == path]:
+                cache.pop(key, None)
+
+
+def _load_group_base(conn: _ConnWrapper, group_id: int) -> dict[str, Any] | None:
+    """Read the viewer-independent part of a group snapshot."""
+    conn.row_factory = sqlite3.Row
+    group = conn.execute(
+        "SELECT id, name, invite_code FROM social_groups WHERE id = ?",
+        (group_id,),
+    ).fetchone()
+    if group is None:
+        return None
+    members = conn.execute(
+        """
+        SELECT u.id, u.display_name, u.email, gm.role, gm.share_enabled,
+               p.bac_now, p.drink_count, p.location_note, p.bac_model_json, p.updated_at
+        FROM group_members gm
+        JOIN users u ON u.id = gm.user_id
+        LEFT JOIN user_presence p ON p.user_id = gm.user_id
+        WHERE gm.group_id = ?
+        ORDER BY gm.role DESC, u.display_name COLLATE NOCASE ASC
+        """,
+        (group_id,),
+    ).fetchall()
+    alerts = conn.execute(
+        """
+        SELECT id, alert_type, message, created_at, from_user_id, target_user_id
+        FROM group_alerts
+        WHERE group_id = ?
+        ORDER BY id DESC
+        LIMIT ?
+        """,
+        (group_id, GROUP_ALERT_PAGE_SIZE),
+    ).fetchall()
+    buddies = conn.execute(
+        """
+        SELECT user_id, buddy_user_id
+        FROM group_buddy_pairs
+        WHERE group_id = ?
+        """,
+        (group_id,),
+    ).fetchall()
 
-    member_out = []
     buddy_map = {int(b["user_id"]): int(b["buddy_user_id"]) for b in buddies}
-    for m in members:
-        share_enabled = bool(m["share_enabled"])
-        can_view = share_enabled or m["id"] == user_id
-        member_out.append(
+    return {
+        "group": {"id": group["id"], "name": group["name"], "invite_code": group["invite_code"]},
+        "member_ids": {int(m["id"]) for m in members},
+        "members": [
             {
                 "user_id": m["id"],
                 "display_name": m["display_name"],
                 "email": m["email"],
                 "role": m["role"],
-                "share_enabled": share_enabled,
-                "bac_now": float(m["bac_now"]) if can_view and m["bac_now"] is not None else None,
-                "drink_count": int(m["drink_count"]) if can_view and m["drink_count"] is not None else None,
+                "share_enabled": bool(m["share_enabled"]),
+                "bac_now": float(m["bac_now"]) if m["bac_now"] is not None else None,
+                "drink_count": int(m["drink_count"]) if m["drink_count"] is not None else None,
+                "location_note": m["location_note"],
+                "updated_at": m["updated_at"],
+                "bac_model": m["bac_model_json"],
+                "buddy_user_id": buddy_map.get(int(m["id"])),
+            }
+            for m in members
+        ],
+        "alerts": [
+            {
+                "id": a["id"],
+                "alert_type": a["alert_type"],
+                "message": a["message"],
+                "created_at": a["created_at"],
+                "from_user_id": a["from_user_id"],
+                "target_user_id": a["target_user_id"],
+            }
+            for a in alerts
+        ],
+    }
+
+
+def _get_group_base(db_path: str, group_id: int, *, conn: _ConnWrapper | None = None) -> dict[str, Any] | None:
+    key = _cache_key(db_path, int(group_id))
+    base = _cache_get(_GROUP_SNAPSHOT_CACHE, key)
+    metrics.record_cache("group_snapshot", hit=base is not None)
+    if base is not None:
+        return base
+    if conn is not None:
+        base = _load_group_base(conn, int(group_id))
+    else:
+        with _connect(db_path) as own_conn:
+            base = _load_group_base(own_conn, int(group_id))
+    if base is not None:
+        _cache_put(_GROUP_SNAPSHOT_CACHE, key, base)
+    return base
+
+
+def get_group_snapshot(
+    db_path: str,
+    *,
+    group_id: int,
+    user_id: int,
+    since_alert_id: int | None = None,
+    updated_since: str | None = None,
+) -> dict[str, Any] | None:
+    issued_at = presence_cursor_now()
+    base = _get_group_base(db_path, group_id)
+    if base is None or int(user_id) not in base["member_ids"]:
+        return None
+
+    # Members the caller cannot see are always listed with their fields blanked;
+    # dropping them from deltas until they heartbeat would leak when they were active.
+    members = [_overlay_presence(db_path, m["user_id"], m) for m in base["members"]]
+    visible = {int(m["user_id"]) for m in members if m["share_enabled"] or m["user_id"] == user_id}
+    changed = {int(m["user_id"]) for m in _presence_since([m for m in members if int(m["user_id"]) in visible], updated_since)}
+    member_out = []
+    for m in _project_presence([m for m in members if int(m["user_id"]) in changed or int(m["user_id"]) not in visible]):
+        can_view = int(m["user_id"]) in visible
+        member_out.append(
+            {
+                **m,
+                "bac_now": m["bac_now"] if can_view else None,
+                "drink_count": m["drink_count"] if can_view else None,
                 "location_note": m["location_note"] if can_view else None,
                 "updated_at": m["updated_at"] if can_view else None,
-                "buddy_user_id": buddy_map.get(int(m["id"])),
             }
         )
-
-    alert_out = [
-        {
-            "id": a["id"],
-            "alert_type": a["alert_type"],
-            "message": a["message"],
-            "created_at": a["created_at"],
-            "from_user_id": a["from_user_id"],
-            "target_user_id": a["target_user_id"],
-        }
-        for a in alerts
-    ]
+    alert_out, resync = _filter_alerts_since(base["alerts"], since_alert_id)
     return {
-        "group": {"id": group["id"], "name": group["name"], "invite_code": group["invite_code"]},
+        "group": dict(base["group"]),
         "members": member_out,
         "alerts": alert_out,
+        "incremental": since_alert_id is not None or bool(updated_since),
+        "resync": resync,
+        "cursor": _snapshot_cursor(alert_out, since_alert_id=since_alert_id, issued_at=issued_at),
     }
 
 
@@ -1722,7 +2935,8 @@ def revoke_guardian_link(db_path: str, *, group_id: int, link_id: int) -> bool:
             (link_id, group_id),
         )
         conn.commit()
-        return cur.rowcount > 0
+    invalidate_group_snapshot(db_path, group_id=group_id)
+    return cur.rowcount > 0
 
 
 def set_guardian_link_alerts(db_path: str, *, group_id: int, link_id: int, enabled: bool) -> bool:
@@ -1732,70 +2946,84 @@ def set_guardian_link_alerts(db_path: str, *, group_id: int, link_id: int, enabl
             (1 if enabled else 0, link_id, group_id),
         )
         conn.commit()
-        return cur.rowcount > 0
+    invalidate_group_snapshot(db_path, group_id=group_id)
+    return cur.rowcount > 0
 
 
-def get_group_snapshot_by_guardian_token(db_path: str, *, token: str) -> dict[str, Any] | None:
+def _get_guardian_link(db_path: str, token: str) -> dict[str, Any] | None:
+    key = _cache_key(db_path, token)
+    link = _cache_get(_GUARDIAN_LINK_CACHE, key)
+    metrics.record_cache("guardian_link", hit=link is not None)
+    if link is not None:
+        return link
     with _connect(db_path) as conn:
         conn.row_factory = sqlite3.Row
-        link = conn.execute(
+        row = conn.execute(
             """
-            SELECT gl.id, gl.group_id, gl.label, gl.receive_alerts, gl.is_active,
-                   g.name, g.invite_code
-            FROM guardian_links gl
-            JOIN social_groups g ON g.id = gl.group_id
-            WHERE gl.token = ?
+            SELECT id, group_id, label, receive_alerts, is_active
+            FROM guardian_links
+            WHERE token = ?
             """,
             (token,),
         ).fetchone()
-        if link is None or not bool(link["is_active"]):
+        # Unknown tokens are not cached so probing cannot grow the cache.
+        if row is None or not bool(row["is_active"]):
             return None
+        link = {
+            "id": row["id"],
+            "group_id": int(row["group_id"]),
+            "label": row["label"],
+            "receive_alerts": bool(row["receive_alerts"]),
+        }
+        _cache_put(_GUARDIAN_LINK_CACHE, key, link)
+        _get_group_base(db_path, link["group_id"], conn=conn)
+    return link
 
-        members = conn.execute(
-            """
-            SELECT u.display_name, gm.role, p.bac_now, p.drink_count, p.location_note, p.updated_at
-            FROM group_members gm
-            JOIN users u ON u.id = gm.user_id
-            LEFT JOIN user_presence p ON p.user_id = gm.user_id
-            WHERE gm.group_id = ? AND gm.share_enabled = 1
-            ORDER BY gm.role DESC, u.display_name COLLATE NOCASE ASC
-            """,
-            (link["group_id"],),
-        ).fetchall()
 
-        alerts = conn.execute(
-            """
-            SELECT id, alert_type, message, created_at
-            FROM group_alerts
-            WHERE group_id = ?
-            ORDER BY id DESC
-            LIMIT 40
-            """,
-            (link["group_id"],),
-        ).fetchall()
+def get_group_snapshot_by_guardian_token(
+    db_path: str,
+    *,
+    token: str,
+    since_alert_id: int | None = None,
+    updated_since: str | None = None,
+) -> dict[str, Any] | None:
+    issued_at = presence_cursor_now()
+    link = _get_guardian_link(db_path, token)
+    if link is None:
+        return None
+    base = _get_group_base(db_path, link["group_id"])
+    if base is None:
+        return None
 
+    shared = [_overlay_presence(db_path, m["user_id"], m) for m in base["members"] if m["share_enabled"]]
+    shared = _project_presence(_presence_since(shared, updated_since))
+    alert_out, resync = _filter_alerts_since(base["alerts"], since_alert_id)
+    alert_out = [
+        {"id": a["id"], "alert_type": a["alert_type"], "message": a["message"], "created_at": a["created_at"]}
+        for a in alert_out
+    ]
     return {
         "guardian_link": {
             "id": link["id"],
             "label": link["label"],
-            "receive_alerts": bool(link["receive_alerts"]),
+            "receive_alerts": link["receive_alerts"],
         },
-        "group": {"id": link["group_id"], "name": link["name"], "invite_code": link["invite_code"]},
+        "group": dict(base["group"]),
         "members": [
             {
                 "display_name": m["display_name"],
                 "role": m["role"],
-                "bac_now": float(m["bac_now"]) if m["bac_now"] is not None else None,
-                "drink_count": int(m["drink_count"]) if m["drink_count"] is not None else None,
+                "bac_now": m["bac_now"],
+                "drink_count": m["drink_count"],
                 "location_note": m["location_note"],
                 "updated_at": m["updated_at"],
             }
-            for m in members
-        ],
-        "alerts": [
-            {"id": a["id"], "alert_type": a["alert_type"], "message": a["message"], "created_at": a["created_at"]}
-            for a in alerts
+            for m in shared
         ],
+        "alerts": alert_out,
+        "incremental": since_alert_id is not None or bool(updated_since),
+        "resync": resync,
+        "cursor": _snapshot_cursor(alert_out, since_alert_id=since_alert_id, issued_at=issued_at),
     }
 
 
@@ -1822,6 +3050,7 @@ def revoke_all_sharing_for_user(db_path: str, *, user_id: int) -> None:
             (user_id,),
         )
         conn.commit()
+    _invalidate_user_group_snapshots(db_path, user_id=user_id)
 
 
 def get_privacy_summary(db_path: str, *, user_id: int) -> dict[str, Any]:
@@ -1853,6 +3082,168 @@ def get_privacy_summary(db_path: str, *, user_id: int) -> dict[str, Any]:
     }
 
 
+# dataset -> (query, number of user_id params, keyset column, initial cursor).
+# Every query takes the user id params, then the cursor and a page size.
+ACCOUNT_EXPORT_QUERIES: dict[str, tuple[str, int, str, Any]] = {
+    "profile": (
+        """
+        SELECT id, email, username, display_name, email_verified, is_male, default_weight_lb, invite_code, created_at
+        FROM users
+        WHERE id = ? AND id > ?
+        ORDER BY id
+        LIMIT ?
+        """,
+        1,
+        "id",
+        0,
+    ),
+    "sessions": (
+        """
+        SELECT id, name, is_auto, is_active, started_at, last_event_at, ended_at, created_at, session_date,
+               drink_count, total_grams, total_calories, peak_bac, minutes_over_limit, duration_minutes, payload_json
+        FROM saved_sessions
+        WHERE user_id = ? AND id > ?
+        ORDER BY id
+        LIMIT ?
+        """,
+        1,
+        "id",
+        0,
+    ),
+    "session_events": (
+        """
+        SELECT id, session_id, kind, ref_event_id, event_at_epoch, grams, calories, carbs_g, sugar_g, logged_at, created_at
+        FROM session_events
+        WHERE user_id = ? AND id > ?
+        ORDER BY id
+        LIMIT ?
+        """,
+        1,
+        "id",
+        0,
+    ),
+    "favorites": (
+        """
+        SELECT catalog_id, use_count, updated_at
+        FROM user_favorites
+        WHERE user_id = ? AND catalog_id > ?
+        ORDER BY catalog_id
+        LIMIT ?
+        """,
+        1,
+        "catalog_id",
+        "",
+    ),
+    "friendships": (
+        """
+        SELECT f.friend_user_id, u.username, u.display_name, f.created_at
+        FROM friendships f
+        JOIN users u ON u.id = f.friend_user_id
+        WHERE f.user_id = ? AND f.friend_user_id > ?
+        ORDER BY f.friend_user_id
+        LIMIT ?
+        """,
+        1,
+        "friend_user_id",
+        0,
+    ),
+    "friend_requests": (
+        """
+        SELECT id, from_user_id, to_user_id, status, created_at, responded_at
+        FROM friend_requests
+        WHERE (from_user_id = ? OR to_user_id = ?) AND id > ?
+        ORDER BY id
+        LIMIT ?
+        """,
+        2,
+        "id",
+        0,
+    ),
+    "groups": (
+        """
+        SELECT gm.group_id, g.name, g.owner_user_id, gm.role, gm.share_enabled, gm.joined_at
+        FROM group_members gm
+        JOIN social_groups g ON g.id = gm.group_id
+        WHERE gm.user_id = ? AND gm.group_id > ?
+        ORDER BY gm.group_id
+        LIMIT ?
+        """,
+        1,
+        "group_id",
+        0,
+    ),
+    "alerts": (
+        """
+        SELECT id, group_id, from_user_id, target_user_id, alert_type, message, created_at
+        FROM group_alerts
+        WHERE (from_user_id = ? OR target_user_id = ?) AND id > ?
+        ORDER BY id
+        LIMIT ?
+        """,
+        2,
+        "id",
+        0,
+    ),
+    "guardian_links": (
+        """
+        SELECT gl.id, gl.group_id, gl.label, gl.receive_alerts, gl.is_active, gl.created_at
+        FROM guardian_links gl
+        WHERE gl.group_id IN (
+            SELECT group_id FROM group_members
+            WHERE user_id = ? AND role IN ('owner', 'mod')
+        )
+          AND gl.id > ?
+        ORDER BY gl.id
+        LIMIT ?
+        """,
+        1,
+        "id",
+        0,
+    ),
+    "emergency_contacts": (
+        """
+        SELECT id, name, phone, created_at
+        FROM emergency_contacts
+        WHERE user_id = ? AND id > ?
+        ORDER BY id
+        LIMIT ?
+        """,
+        1,
+        "id",
+        0,
+    ),
+}
+
+
+def list_account_rows(
+    db_path: str,
+    *,
+    user_id: int,
+    dataset: str,
+    after: Any = None,
+    limit: int = 500,
+) -> tuple[list[dict[str, Any]], Any]:
+    """One keyset page of a user's rows for `dataset`, plus the cursor for the next page.
+
+    Each page uses its own short-lived connection, so paging through a large
+    history never holds a transaction open between pages. The returned cursor
+    is None once the dataset is exhausted.
+    """
+    if dataset not in ACCOUNT_EXPORT_QUERIES:
+        raise ValueError(f"Unknown export dataset: {dataset}")
+    query, user_params, key, initial = ACCOUNT_EXPORT_QUERIES[dataset]
+    limit = max(1, int(limit))
+    with _connect(db_path) as conn:
+        conn.row_factory = sqlite3.Row
+        rows = conn.execute(
+            query,
+            (*([user_id] * user_params), initial if after is None else after, limit),
+        ).fetchall()
+    items = [dict(row) for row in rows]
+    next_cursor = items[-1][key] if len(items) == limit else None
+    return items, next_cursor
+
+
 def list_emergency_contacts(db_path: str, *, user_id: int) -> list[dict[str, Any]]:
     with _connect(db_path) as conn:
         conn.row_factory = sqlite3.Row
@@ -1960,3 +3351,252 @@ def verify_email_token(db_path: str, *, token: str) -> bool:
         conn.execute("UPDATE email_verifications SET used_at = datetime('now') WHERE id = ?", (int(row["id"]),))
         conn.commit()
         return True
+
+
+def acquire_maintenance_lock(db_path: str, *, name: str, owner: str, ttl_sec: float) -> bool:
+    """Take or renew a named lock row; True if `owner` holds it until now + ttl.
+
+    The row is only claimed when free, expired or already ours, so exactly one
+    process across workers and hosts wins until it stops renewing.
+    """
+    now = time.time()
+    with _connect(db_path) as conn:
+        conn.execute(
+            "INSERT OR IGNORE INTO maintenance_locks (name, owner, expires_at_epoch) VALUES (?, ?, 0)",
+            (name, owner),
+        )
+        cur = conn.execute(
+            """
+            UPDATE maintenance_locks
+            SET owner = ?, expires_at_epoch = ?
+            WHERE name = ? AND (owner = ? OR expires_at_epoch < ?)
+            """,
+            (owner, now + float(ttl_sec), name, owner, now),
+        )
+        conn.commit()
+        return cur.rowcount > 0
+
+
+def release_maintenance_lock(db_path: str, *, name: str, owner: str) -> None:
+    with _connect(db_path) as conn:
+        conn.execute(
+            "UPDATE maintenance_locks SET expires_at_epoch = 0 WHERE name = ? AND owner = ?",
+            (name, owner),
+        )
+        conn.commit()
+
+
+def _utc_cutoff(**delta: float) -> str:
+    return (datetime.now(timezone.utc) - timedelta(**delta)).strftime(PRESENCE_CURSOR_FORMAT)
+
+
+def _as_local_naive(value: Any) -> datetime | None:
+    if isinstance(value, datetime):
+        return value.astimezone().replace(tzinfo=None) if value.tzinfo else value
+    if isinstance(value, str) and value.strip():
+        try:
+            parsed = datetime.fromisoformat(value.strip().replace(" ", "T"))
+        except ValueError:
+            return None
+        return parsed.astimezone().replace(tzinfo=None) if parsed.tzinfo else parsed
+    return None
+
+
+def _payload_from_log(base: dict[str, Any], live: list[Any]) -> dict[str, Any]:
+    """Rebuild a session payload from live event-log rows, keeping the profile fields."""
+    drinks = sorted(live, key=lambda r: (int(r["event_at_epoch"]), int(r["id"])))
+    saved_at = int(drinks[-1]["event_at_epoch"])
+    return {
+        "weight_lb": base.get("weight_lb", 160.0),
+        "is_male": base.get("is_male", True),
+        "events": [
+            [
+                round((int(r["event_at_epoch"]) - saved_at) / 3600.0, 4),
+                float(r["grams"]),
+                int(r["calories"]),
+                float(r["carbs_g"]),
+                float(r["sugar_g"]),
+            ]
+            for r in drinks
+        ],
+        "saved_at_epoch": saved_at,
+    }
+
+
+def finalize_abandoned_auto_sessions(
+    db_path: str,
+    *,
+    inactive_hours: float,
+    max_active_hours: float,
+    limit: int = 200,
+) -> int:
+    """Close active auto sessions whose owner stopped logging; return how many were closed.
+
+    This is the server-side counterpart of the lazy expiry done on the user's
+    next request. The event log is compacted into the payload, and a session
+    that gained a drink while it was being checked is left alone.
+
+    Active sessions are paged by owner (one active auto session per user), so
+    `limit` caps how many are closed rather than how many are looked at, and
+    live sessions at the front of the index cannot starve expired ones.
+    """
+    now = datetime.now()
+    page_size = max(1, int(limit))
+    closed = 0
+    after_user_id = 0
+    while closed < page_size:
+        with _connect(db_path) as conn:
+            conn.row_factory = sqlite3.Row
+            rows = conn.execute(
+                """
+                SELECT s.id, s.user_id, s.started_at, s.last_event_at, s.payload_json,
+                       (
+                         SELECT MAX(e.logged_at) FROM session_events e
+                         WHERE e.session_id = s.id AND e.kind = 'drink'
+                       ) AS last_logged_at
+                FROM saved_sessions s
+                WHERE s.is_auto = 1 AND s.is_active = 1 AND s.user_id > ?
+                ORDER BY s.user_id
+                LIMIT ?
+                """,
+                (after_user_id, page_size),
+            ).fetchall()
+        if not rows:
+            break
+        after_user_id = int(rows[-1]["user_id"])
+        closed += _close_expired_auto_sessions(
+            db_path, rows, now=now, inactive_hours=inactive_hours, max_active_hours=max_active_hours, limit=page_size - closed
+        )
+        if len(rows) < page_size:
+            break
+    return closed
+
+
+def _close_expired_auto_sessions(
+    db_path: str,
+    rows: list[Any],
+    *,
+    now: datetime,
+    inactive_hours: float,
+    max_active_hours: float,
+    limit: int,
+) -> int:
+    closed = 0
+    for row in rows:
+        if closed >= limit:
+            break
+        started = _as_local_naive(row["started_at"])
+        last = max(
+            (dt for dt in (_as_local_naive(row["last_event_at"]), _as_local_naive(row["last_logged_at"])) if dt),
+            default=None,
+        )
+        expired = (last is not None and (now - last).total_seconds() >= inactive_hours * 3600.0) or (
+            started is not None and (now - started).total_seconds() >= max_active_hours * 3600.0
+        )
+        if not expired:
+            continue
+        with _connect(db_path) as conn:
+            conn.row_factory = sqlite3.Row
+            live = _live_session_events(conn, user_id=int(row["user_id"]), session_id=int(row["id"]))
+            max_event_id = conn.execute(
+                "SELECT COALESCE(MAX(id), 0) FROM session_events WHERE session_id = ?",
+                (int(row["id"]),),
+            ).fetchone()[0]
+            try:
+                base = json.loads(row["payload_json"] or "{}")
+            except json.JSONDecodeError:
+                base = {}
+            payload = _payload_from_log(base, live) if live else base
+            ended_at = now.replace(microsecond=0).isoformat()
+            cur = conn.execute(
+                """
+                UPDATE saved_sessions
+                SET payload_json = ?, drink_count = ?, total_grams = ?, total_calories = ?, peak_bac = ?,
+                    minutes_over_limit = ?, duration_minutes = ?, is_active = 0, ended_at = ?, updated_at = ?
+                WHERE id = ? AND is_active = 1
+                  AND NOT EXISTS (SELECT 1 FROM session_events WHERE session_id = ? AND id > ?)
+                """,
+                (
+                    json.dumps(payload, separators=(",", ":"), ensure_ascii=True),
+                    *_summary_params(payload),
+                    ended_at,
+                    ended_at,
+                    int(row["id"]),
+                    int(row["id"]),
+                    int(max_event_id),
+                ),
+            )
+            conn.commit()
+        closed += max(0, cur.rowcount)
+    return closed
+
+
+def prune_group_alerts(db_path: str, *, older_than_days: float, batch_size: int = 500, max_rows: int | None = None) -> int:
+    removed = _delete_in_chunks(
+        db_path,
+        "group_alerts",
+        "created_at < ?",
+        (_utc_cutoff(days=older_than_days),),
+        batch_size=batch_size,
+        max_rows=max_rows,
+    )
+    if removed:
+        clear_snapshot_cache(db_path)
+    return removed
+
+
+def delete_expired_tokens(db_path: str, *, batch_size: int = 500, max_rows: int | None = None) -> int:
+    """Remove expired password reset and email verification tokens.
+
+    Used tokens are left until they expire too, so the delete stays on the
+    `expires_at` index; a used token can never be consumed again anyway.
+    """
+    removed = 0
+    for table in ("password_resets", "email_verifications"):
+        removed += _delete_in_chunks(
+            db_path,
+            table,
+            "expires_at < datetime('now')",
+            (),
+            batch_size=batch_size,
+            max_rows=None if max_rows is None else max(0, max_rows - removed),
+        )
+    return removed
+
+
+def prune_stale_presence(db_path: str, *, older_than_hours: float, batch_size: int = 500, max_rows: int | None = None) -> int:
+    cutoff = _utc_cutoff(hours=older_than_hours)
+    # Buffered copies would otherwise keep showing (and re-write) the pruned rows.
+    buffer = _presence_buffer(db_path, create=False)
+    if buffer is not None:
+        buffer.discard_older_than(cutoff)
+    return _delete_in_chunks(
+        db_path,
+        "user_presence",
+        "updated_at < ?",
+        (cutoff,),
+        batch_size=batch_size,
+        key="user_id",
+        max_rows=max_rows,
+    )
+
+
+def compact_closed_session_events(
+    db_path: str,
+    *,
+    older_than_days: float,
+    batch_size: int = 500,
+    max_rows: int | None = None,
+) -> int:
+    """Drop event-log rows of closed sessions; their payloads already hold the drinks."""
+    return _delete_in_chunks(
+        db_path,
+        "session_events",
+        "created_at < ? AND EXISTS ("
+        "SELECT 1 FROM saved_sessions s WHERE s.id = session_events.session_id AND s.is_active = 0"
+        ")",
+        (_utc_cutoff(days=older_than_days),),
+        batch_size=batch_size,
+        max_rows=max_rows,
+    )
+
@@ -48,6 +48,20 @@ def bac_at_time(
     return round(bac, 4)
 
 
+def bac_from_breakpoints(time_hours: float, breakpoints: List[Tuple[float, float]]) -> float:
+    """BAC (%) at a given time from precomputed (time_hours, rise_percent) breakpoints.
+
+    Equivalent to `bac_at_time` once each drink's rise has been computed, so a
+    stored snapshot can be projected without the drinker's weight or sex.
+    """
+    bac = 0.0
+    for t_drink, rise in breakpoints:
+        if time_hours < t_drink:
+            continue
+        bac += max(0.0, rise - ELIMINATION_PER_HOUR * (time_hours - t_drink))
+    return round(bac, 4)
+
+
 def _curve_end_time(
     events: List[Tuple[float, float]],
     weight_lb: float,
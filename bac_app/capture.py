@@ -0,0 +1,171 @@
+"""Sampled traffic capture for replaying real request mixes.
+
+Off unless `TRAFFIC_CAPTURE_DIR` is set. A sampled request is appended to
+`<dir>/traffic.jsonl` (rotated by size) as one JSON line holding the method,
+route template, status, duration, an actor pseudonym, pseudonymised numeric
+path arguments, query parameter names and the shape of the JSON body.
+
+No value a client sent is ever written: bodies are reduced to their keys and
+value types, string path arguments (guardian and reset tokens) are dropped,
+and user and group ids are replaced by keyed hashes. Sampling is per actor, so
+a sampled user's whole visit is captured and replays as a coherent session.
+`scripts/replay_traffic.py` re-drives a capture against a local instance.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import hmac
+import json
+import logging
+import os
+import random
+import re
+import secrets
+import threading
+from logging.handlers import RotatingFileHandler
+from typing import Any
+
+CAPTURE_FILE = "traffic.jsonl"
+DEFAULT_SAMPLE_RATE = 0.05
+DEFAULT_MAX_BYTES = 10 * 1024 * 1024
+DEFAULT_BACKUP_COUNT = 5
+MAX_SHAPE_DEPTH = 4
+MAX_SHAPE_KEYS = 50
+SKIPPED_PREFIXES = ("/static/", "/metrics", "/api/admin/", "/healthz", "/readyz")
+
+_SAFE_KEY_RE = re.compile(r"^[a-z_][a-z0-9_]{0,40}$")
+_PROCESS_KEY = secrets.token_bytes(32)
+_lock = threading.Lock()
+_logger: logging.Logger | None = None
+_logger_path: str | None = None
+
+
+def capture_dir() -> str | None:
+    raw = str(os.environ.get("TRAFFIC_CAPTURE_DIR", "")).strip()
+    return raw or None
+
+
+def _env_number(name: str, default: float, low: float, high: float) -> float:
+    try:
+        value = float(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
+    return max(low, min(high, value))
+
+
+def sample_rate() -> float:
+    return _env_number("TRAFFIC_CAPTURE_SAMPLE_RATE", DEFAULT_SAMPLE_RATE, 0.0, 1.0)
+
+
+def _key() -> bytes:
+    # Stable across restarts and workers when a secret is configured, so ids hash the same way.
+    secret = os.environ.get("TRAFFIC_CAPTURE_KEY") or os.environ.get("APP_SECRET_KEY")
+    return hashlib.sha256(b"traffic-capture:" + secret.encode("utf-8")).digest() if secret else _PROCESS_KEY
+
+
+def pseudonym(kind: str, value: Any) -> str:
+    digest = hmac.new(_key(), f"{kind}:{value}".encode("utf-8"), hashlib.sha256).hexdigest()
+    return digest[:16]
+
+
+def should_capture(path: str, actor: str | None) -> bool:
+    """Sampling decision for one request: by actor when known, otherwise per request."""
+    if capture_dir() is None or path.startswith(SKIPPED_PREFIXES):
+        return False
+    rate = sample_rate()
+    if rate <= 0.0:
+        return False
+    if actor is not None:
+        return int(actor[:8], 16) / 0xFFFFFFFF < rate
+    return random.random() < rate
+
+
+def body_shape(value: Any, depth: int = 0) -> Any:
+    """Keys and value types of a JSON value, with every value itself discarded."""
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, int):
+        return "int"
+    if isinstance(value, float):
+        return "float"
+    if isinstance(value, str):
+        return "str"
+    if depth >= MAX_SHAPE_DEPTH:
+        return "object" if isinstance(value, dict) else "list"
+    if isinstance(value, list):
+        return {"list": len(value), "item": body_shape(value[0], depth + 1) if value else None}
+    if isinstance(value, dict):
+        shape: dict[str, Any] = {}
+        for key in list(value)[:MAX_SHAPE_KEYS]:
+            name = key if isinstance(key, str) and _SAFE_KEY_RE.match(key) else "<key>"
+            shape[name] = body_shape(value[key], depth + 1)
+        return shape
+    return "other"
+
+
+def path_args(view_args: dict[str, Any] | None) -> dict[str, str]:
+    """Numeric path arguments as pseudonyms; anything else (tokens) is dropped."""
+    out: dict[str, str] = {}
+    for name, value in (view_args or {}).items():
+        out[name] = pseudonym(name, value) if isinstance(value, int) else "<redacted>"
+    return out
+
+
+def build_record(
+    *,
+    ts: float,
+    method: str,
+    route: str,
+    status: int,
+    duration_ms: float,
+    actor: str | None,
+    view_args: dict[str, Any] | None,
+    query_keys: list[str],
+    body: Any,
+) -> dict[str, Any]:
+    return {
+        "ts": round(ts, 3),
+        "method": method,
+        "route": route,
+        "status": status,
+        "duration_ms": round(duration_ms, 2),
+        "actor": actor,
+        "args": path_args(view_args),
+        "query": sorted(k for k in query_keys if _SAFE_KEY_RE.match(k)),
+        "body": body_shape(body) if body is not None else None,
+    }
+
+
+def _get_logger(directory: str) -> logging.Logger:
+    global _logger, _logger_path
+    path = os.path.join(directory, CAPTURE_FILE)
+    with _lock:
+        if _logger is not None and _logger_path == path:
+            return _logger
+        os.makedirs(directory, exist_ok=True)
+        logger = logging.getLogger("bac_app.capture")
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+            handler.close()
+        handler = RotatingFileHandler(
+            path,
+            maxBytes=int(_env_number("TRAFFIC_CAPTURE_MAX_BYTES", DEFAULT_MAX_BYTES, 64 * 1024, 1024**3)),
+            backupCount=int(_env_number("TRAFFIC_CAPTURE_BACKUPS", DEFAULT_BACKUP_COUNT, 1, 100)),
+            encoding="utf-8",
+        )
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        _logger, _logger_path = logger, path
+        return logger
+
+
+def write(record: dict[str, Any]) -> None:
+    directory = capture_dir()
+    if directory is None:
+        return
+    _get_logger(directory).info(json.dumps(record, separators=(",", ":"), sort_keys=True))
@@ -0,0 +1,254 @@
+"""Streaming exports of a user's data.
+
+Session history is exported as CSV or JSONL, and the full personal data export
+is a zip of one JSONL file per dataset. Rows are read page by page with keyset
+cursors and encoded as soon as they are read, so memory use does not grow with
+the length of a user's history.
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+import json
+import zipfile
+from datetime import datetime, timezone
+from typing import Any, Iterable, Iterator
+
+from bac_app.auth_store import (
+    ACCOUNT_EXPORT_QUERIES,
+    get_session_payloads,
+    list_account_rows,
+    list_user_sessions,
+)
+
+EXPORT_PAGE_SIZE = 200
+EXPORT_FORMATS = ("csv", "jsonl")
+EXPORT_DETAILS = ("sessions", "events")
+ACCOUNT_EXPORT_PAGE_SIZE = 500
+ACCOUNT_EXPORT_CHUNK_BYTES = 64 * 1024
+
+SESSION_FIELDS = [
+    "id",
+    "name",
+    "created_at",
+    "session_date",
+    "drink_count",
+    "is_auto",
+    "is_active",
+    "started_at",
+    "last_event_at",
+    "ended_at",
+    "total_grams",
+    "total_calories",
+    "peak_bac",
+    "minutes_over_limit",
+    "duration_minutes",
+]
+EVENT_FIELDS = [
+    "session_id",
+    "session_name",
+    "session_date",
+    "event_index",
+    "drank_at",
+    "grams_alcohol",
+    "standard_drinks",
+    "calories",
+    "carbs_g",
+    "sugar_g",
+]
+
+
+def iter_session_pages(
+    db_path: str,
+    *,
+    user_id: int,
+    session_date: str | None = None,
+    include_active: bool = False,
+    page_size: int = EXPORT_PAGE_SIZE,
+) -> Iterator[list[dict[str, Any]]]:
+    """Yield pages of sessions, newest first, until history is exhausted."""
+    before_id = None
+    while True:
+        page = list_user_sessions(
+            db_path,
+            user_id=user_id,
+            session_date=session_date,
+            include_active=include_active,
+            before_id=before_id,
+            limit=page_size,
+        )
+        if page:
+            yield page
+        if len(page) < page_size:
+            return
+        before_id = page[-1]["id"]
+
+
+def iter_sessions(db_path: str, *, user_id: int, **kwargs: Any) -> Iterator[dict[str, Any]]:
+    for page in iter_session_pages(db_path, user_id=user_id, **kwargs):
+        yield from page
+
+
+def _event_rows(session: dict[str, Any], payload: dict[str, Any]) -> Iterator[dict[str, Any]]:
+    saved_at = payload.get("saved_at_epoch")
+    events = payload.get("events") or []
+    valid = [e for e in events if isinstance(e, (list, tuple)) and len(e) == 5]
+    for idx, event in enumerate(sorted(valid, key=lambda e: float(e[0]))):
+        t, grams, calories, carbs, sugar = event
+        drank_at = None
+        if isinstance(saved_at, (int, float)):
+            drank_at = datetime.fromtimestamp(float(saved_at) + float(t) * 3600.0).replace(microsecond=0).isoformat()
+        yield {
+            "session_id": session["id"],
+            "session_name": session["name"],
+            "session_date": session["session_date"],
+            "event_index": idx,
+            "drank_at": drank_at,
+            "grams_alcohol": round(float(grams), 2),
+            "standard_drinks": round(float(grams) / 14.0, 2),
+            "calories": int(calories),
+            "carbs_g": round(float(carbs), 2),
+            "sugar_g": round(float(sugar), 2),
+        }
+
+
+def iter_session_events(db_path: str, *, user_id: int, **kwargs: Any) -> Iterator[dict[str, Any]]:
+    """Yield one row per drink, fetching payloads one page of sessions at a time."""
+    for page in iter_session_pages(db_path, user_id=user_id, **kwargs):
+        payloads = get_session_payloads(db_path, user_id=user_id, session_ids=[s["id"] for s in page])
+        for session in page:
+            yield from _event_rows(session, payloads.get(int(session["id"])) or {})
+
+
+def _csv_value(value: Any) -> Any:
+    if isinstance(value, bool):
+        return str(value).lower()
+    return "" if value is None else value
+
+
+def stream_csv(fields: list[str], rows: Iterable[dict[str, Any]]) -> Iterator[str]:
+    """Encode rows as CSV text, one chunk per row."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(fields)
+    yield buf.getvalue()
+    for row in rows:
+        buf.seek(0)
+        buf.truncate()
+        writer.writerow([_csv_value(row.get(field)) for field in fields])
+        yield buf.getvalue()
+
+
+def stream_jsonl(fields: list[str], rows: Iterable[dict[str, Any]]) -> Iterator[str]:
+    for row in rows:
+        yield json.dumps({field: row.get(field) for field in fields}, separators=(",", ":")) + "\n"
+
+
+def stream_session_export(
+    db_path: str,
+    *,
+    user_id: int,
+    fmt: str = "csv",
+    detail: str = "sessions",
+    session_date: str | None = None,
+    include_active: bool = False,
+) -> Iterator[str]:
+    """Return a text chunk iterator for a session export."""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"format must be one of {', '.join(EXPORT_FORMATS)}")
+    if detail not in EXPORT_DETAILS:
+        raise ValueError(f"detail must be one of {', '.join(EXPORT_DETAILS)}")
+    kwargs = {"session_date": session_date, "include_active": include_active}
+    if detail == "events":
+        fields, rows = EVENT_FIELDS, iter_session_events(db_path, user_id=user_id, **kwargs)
+    else:
+        fields, rows = SESSION_FIELDS, iter_sessions(db_path, user_id=user_id, **kwargs)
+    encode = stream_csv if fmt == "csv" else stream_jsonl
+    return encode(fields, rows)
+
+
+class _ChunkSink:
+    """Write-only, unseekable file object that collects bytes for a generator to drain.
+
+    zipfile detects the missing `tell`/`seek` and writes data descriptors
+    after each member instead of seeking back to patch local headers.
+    """
+
+    def __init__(self) -> None:
+        self._parts: list[bytes] = []
+        self.size = 0
+
+    def write(self, data: bytes) -> int:
+        if data:
+            self._parts.append(bytes(data))
+            self.size += len(data)
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        out = b"".join(self._parts)
+        self._parts.clear()
+        self.size = 0
+        return out
+
+
+def _account_record(dataset: str, row: dict[str, Any]) -> dict[str, Any]:
+    if dataset == "sessions":
+        raw = row.pop("payload_json", None)
+        try:
+            row["payload"] = json.loads(raw or "{}")
+        except json.JSONDecodeError:
+            row["payload"] = None
+    return row
+
+
+def iter_account_rows(
+    db_path: str,
+    *,
+    user_id: int,
+    dataset: str,
+    page_size: int = ACCOUNT_EXPORT_PAGE_SIZE,
+) -> Iterator[dict[str, Any]]:
+    after = None
+    while True:
+        rows, after = list_account_rows(db_path, user_id=user_id, dataset=dataset, after=after, limit=page_size)
+        for row in rows:
+            yield _account_record(dataset, row)
+        if after is None:
+            return
+
+
+def stream_account_archive(
+    db_path: str,
+    *,
+    user_id: int,
+    page_size: int = ACCOUNT_EXPORT_PAGE_SIZE,
+    chunk_bytes: int = ACCOUNT_EXPORT_CHUNK_BYTES,
+) -> Iterator[bytes]:
+    """Yield a zip archive with `<dataset>.jsonl` for every exported dataset.
+
+    A `manifest.json` with per-dataset row counts is written last.
+    """
+    sink = _ChunkSink()
+    counts: dict[str, int] = {}
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for dataset in ACCOUNT_EXPORT_QUERIES:
+            counts[dataset] = 0
+            with archive.open(f"{dataset}.jsonl", mode="w") as member:
+                for row in iter_account_rows(db_path, user_id=user_id, dataset=dataset, page_size=page_size):
+                    member.write((json.dumps(row, separators=(",", ":"), default=str) + "\n").encode("utf-8"))
+                    counts[dataset] += 1
+                    if sink.size >= chunk_bytes:
+                        yield sink.drain()
+            if sink.size:
+                yield sink.drain()
+        manifest = {
+            "user_id": user_id,
+            "generated_at": datetime.now(timezone.utc).replace(microsecond=0).isoformat(),
+            "counts": counts,
+        }
+        archive.writestr("manifest.json", json.dumps(manifest, indent=2))
+    yield sink.drain()
@@ -4,8 +4,12 @@ from __future__ import annotations
 
 import json
 import sqlite3
+import time
+from datetime import datetime, timedelta, timezone
 from typing import Any
 
+from bac_app import metrics, querytrace
+
 try:
     import psycopg
     from psycopg.rows import dict_row
@@ -19,13 +23,34 @@ def _is_postgres_db(db_path: str) -> bool:
     return path.startswith("postgres://") or path.startswith("postgresql://")
 
 
+def _pg_connect(db_path: str):
+    querytrace.record_connection()
+    return psycopg.connect(str(db_path).strip())
+
+
+def _sqlite_connect(db_path: str) -> sqlite3.Connection:
+    querytrace.record_connection()
+    return sqlite3.connect(db_path)
+
+
+def _execute(target: Any, query: str, params: tuple[Any, ...] = (), *, backend: str) -> Any:
+    started = time.perf_counter()
+    try:
+        result = target.execute(query, params)
+    finally:
+        elapsed = time.perf_counter() - started
+        metrics.observe_db_query(backend=backend, statement=query, seconds=elapsed)
+    return querytrace.track(result if result is not None else target, query, elapsed)
+
+
 def init_db(db_path: str) -> None:
     if _is_postgres_db(db_path):
         if psycopg is None:  # pragma: no cover
             raise RuntimeError("psycopg is required for Postgres feedback storage")
-        with psycopg.connect(str(db_path).strip()) as conn:
+        with _pg_connect(db_path) as conn:
             with conn.cursor() as cur:
-                cur.execute(
+                _execute(
+                    cur,
                     """
                     CREATE TABLE IF NOT EXISTS feedback (
                         id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
@@ -36,13 +61,15 @@ def init_db(db_path: str) -> None:
                         context_json TEXT,
                         user_agent TEXT
                     )
-                    """
+                    """,
+                    backend="postgres",
                 )
             conn.commit()
         return
 
-    with sqlite3.connect(db_path) as conn:
-        conn.execute(
+    with _sqlite_connect(db_path) as conn:
+        _execute(
+            conn,
             """
             CREATE TABLE IF NOT EXISTS feedback (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -53,7 +80,8 @@ def init_db(db_path: str) -> None:
                 context_json TEXT,
                 user_agent TEXT
             )
-            """
+            """,
+            backend="sqlite",
         )
         conn.commit()
 
@@ -71,27 +99,31 @@ def save_feedback(
     if _is_postgres_db(db_path):
         if psycopg is None:  # pragma: no cover
             raise RuntimeError("psycopg is required for Postgres feedback storage")
-        with psycopg.connect(str(db_path).strip()) as conn:
+        with _pg_connect(db_path) as conn:
             with conn.cursor() as cur:
-                cur.execute(
+                _execute(
+                    cur,
                     """
                     INSERT INTO feedback (message, rating, contact, context_json, user_agent)
                     VALUES (%s, %s, %s, %s, %s)
                     RETURNING id
                     """,
                     (message, rating, contact, context_json, user_agent[:512]),
+                    backend="postgres",
                 )
                 row = cur.fetchone()
             conn.commit()
             return int(row[0]) if row else 0
 
-    with sqlite3.connect(db_path) as conn:
-        cur = conn.execute(
+    with _sqlite_connect(db_path) as conn:
+        cur = _execute(
+            conn,
             """
             INSERT INTO feedback (message, rating, contact, context_json, user_agent)
             VALUES (?, ?, ?, ?, ?)
             """,
             (message, rating, contact, context_json, user_agent[:512]),
+            backend="sqlite",
         )
         conn.commit()
         return int(cur.lastrowid)
@@ -102,9 +134,10 @@ def list_recent(db_path: str, limit: int = 50) -> list[dict[str, Any]]:
     if _is_postgres_db(db_path):
         if psycopg is None:  # pragma: no cover
             raise RuntimeError("psycopg is required for Postgres feedback storage")
-        with psycopg.connect(str(db_path).strip()) as conn:
+        with _pg_connect(db_path) as conn:
             with conn.cursor(row_factory=dict_row) as cur:
-                cur.execute(
+                rows = _execute(
+                    cur,
                     """
                     SELECT id, created_at, message, rating, contact, context_json
                     FROM feedback
@@ -112,12 +145,13 @@ def list_recent(db_path: str, limit: int = 50) -> list[dict[str, Any]]:
                     LIMIT %s
                     """,
                     (safe_limit,),
-                )
-                rows = cur.fetchall()
+                    backend="postgres",
+                ).fetchall()
     else:
-        with sqlite3.connect(db_path) as conn:
+        with _sqlite_connect(db_path) as conn:
             conn.row_factory = sqlite3.Row
-            rows = conn.execute(
+            rows = _execute(
+                conn,
                 """
                 SELECT id, created_at, message, rating, contact, context_json
                 FROM feedback
@@ -125,6 +159,7 @@ def list_recent(db_path: str, limit: int = 50) -> list[dict[str, Any]]:
                 LIMIT ?
                 """,
                 (safe_limit,),
+                backend="sqlite",
             ).fetchall()
 
     out: list[dict[str, Any]] = []
@@ -149,3 +184,39 @@ def list_recent(db_path: str, limit: int = 50) -> list[dict[str, Any]]:
             }
         )
     return out
+
+
+def prune_feedback(db_path: str, *, older_than_days: float, batch_size: int = 500, max_rows: int | None = None) -> int:
+    """Delete feedback older than the retention window in batches; return rows removed."""
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=older_than_days)).strftime("%Y-%m-%d %H:%M:%S")
+    batch_size = max(1, int(batch_size))
+    removed = 0
+    while max_rows is None or removed < max_rows:
+        limit = batch_size if max_rows is None else min(batch_size, max_rows - removed)
+        if _is_postgres_db(db_path):
+            if psycopg is None:  # pragma: no cover
+                raise RuntimeError("psycopg is required for Postgres feedback storage")
+            with _pg_connect(db_path) as conn:
+                with conn.cursor() as cur:
+                    _execute(
+                        cur,
+                        "DELETE FROM feedback WHERE id IN (SELECT id FROM feedback WHERE created_at < %s LIMIT %s)",
+                        (cutoff, limit),
+                        backend="postgres",
+                    )
+                    count = cur.rowcount
+                conn.commit()
+        else:
+            with _sqlite_connect(db_path) as conn:
+                cur = _execute(
+                    conn,
+                    "DELETE FROM feedback WHERE id IN (SELECT id FROM feedback WHERE created_at < ? LIMIT ?)",
+                    (cutoff, limit),
+                    backend="sqlite",
+                )
+                count = cur.rowcount
+                conn.commit()
+        removed += max(0, count)
+        if count < limit:
+            break
+    return removed
@@ -0,0 +1,230 @@
+"""Bulk import of historical drinks from CSV or JSONL.
+
+Each input row is one drink with a timestamp. Drinks are sorted, grouped into
+sessions wherever the gap between consecutive drinks exceeds the inactivity
+window, and written as closed sessions in batches. The accepted columns match
+the per-drink export (`/api/session/export?detail=events`), so an export can be
+imported back as-is.
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+import json
+import math
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Iterable, Iterator
+
+from bac_app.auth_store import local_session_date, save_user_sessions_many
+from bac_app.catalog import STANDARD_DRINK_GRAMS, grams_and_nutrition
+from bac_app.drinks import grams_from_drink
+
+IMPORT_FORMATS = ("csv", "jsonl")
+IMPORT_SESSION_GAP_HOURS = 3.0
+# Saved payloads store drink times as hour offsets within [-24, 0] of the save,
+# matching the cookie clamps, so longer spans are split into separate sessions.
+IMPORT_MAX_SESSION_HOURS = 24.0
+IMPORT_MAX_ROWS = 50_000
+IMPORT_BATCH_SIZE = 500
+IMPORT_MAX_ERRORS = 20
+# Drinks before this (2000-01-01 UTC) are typos or unit mistakes, not history.
+IMPORT_MIN_EPOCH = 946_684_800.0
+MIN_COUNT = 0.25
+MAX_COUNT = 20.0
+
+
+class ImportRowError(ValueError):
+    pass
+
+
+@dataclass
+class ImportedDrink:
+    epoch: float
+    grams: float
+    calories: int
+    carbs_g: float
+    sugar_g: float
+    name: str | None = None
+
+
+@dataclass
+class ImportResult:
+    sessions: int = 0
+    drinks: int = 0
+    skipped: int = 0
+    errors: list[str] = field(default_factory=list)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {"sessions": self.sessions, "drinks": self.drinks, "skipped": self.skipped, "errors": self.errors}
+
+
+def _clamp(value: Any, default: float, lo: float, hi: float) -> float:
+    try:
+        parsed = float(value)
+    except (TypeError, ValueError):
+        return default
+    if parsed != parsed:
+        return default
+    return max(lo, min(hi, parsed))
+
+
+def _blank(value: Any) -> bool:
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def _parse_timestamp(value: Any) -> float:
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    text = str(value or "").strip()
+    if not text:
+        raise ImportRowError("drank_at is required")
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    try:
+        dt = datetime.fromisoformat(text.replace("Z", "+00:00").replace(" ", "T"))
+    except ValueError as exc:
+        raise ImportRowError(f"drank_at is not an ISO timestamp or epoch: {text[:40]}") from exc
+    try:
+        return dt.timestamp()
+    except (OverflowError, ValueError) as exc:
+        raise ImportRowError("drank_at is out of range") from exc
+
+
+def parse_drink_row(row: dict[str, Any]) -> ImportedDrink:
+    """Validate one input row, applying the same clamps as cookie sessions.
+
+    Alcohol comes from `grams_alcohol`, `standard_drinks`, `catalog_id` or
+    `drink_key` (with optional `count`), in that order.
+    """
+    epoch = _parse_timestamp(row.get("drank_at", row.get("timestamp")))
+    if not math.isfinite(epoch) or epoch < IMPORT_MIN_EPOCH:
+        raise ImportRowError("drank_at is out of range")
+    if epoch > time.time():
+        raise ImportRowError("drank_at is in the future")
+    count = _clamp(row.get("count"), 1.0, MIN_COUNT, MAX_COUNT)
+    calories, carbs, sugar = 0, 0.0, 0.0
+    if not _blank(row.get("grams_alcohol")):
+        grams = _clamp(row.get("grams_alcohol"), 0.0, 0.0, 1000.0)
+    elif not _blank(row.get("standard_drinks")):
+        grams = _clamp(row.get("standard_drinks"), 0.0, 0.0, 1000.0 / STANDARD_DRINK_GRAMS) * STANDARD_DRINK_GRAMS
+    elif not _blank(row.get("catalog_id")):
+        grams, calories, carbs, sugar = grams_and_nutrition(str(row["catalog_id"]).strip(), count)
+    elif not _blank(row.get("drink_key")):
+        grams = grams_from_drink(str(row["drink_key"]).strip(), count=count)
+    else:
+        raise ImportRowError("one of grams_alcohol, standard_drinks, catalog_id or drink_key is required")
+    if grams <= 0:
+        raise ImportRowError("drink has no alcohol")
+    name = row.get("session_name")
+    return ImportedDrink(
+        epoch=epoch,
+        grams=min(1000.0, grams),
+        calories=int(_clamp(row.get("calories"), calories, 0.0, 5000.0)),
+        carbs_g=_clamp(row.get("carbs_g"), carbs, 0.0, 1000.0),
+        sugar_g=_clamp(row.get("sugar_g"), sugar, 0.0, 1000.0),
+        name=str(name).strip()[:80] if not _blank(name) else None,
+    )
+
+
+def iter_input_rows(text: str, fmt: str) -> Iterator[dict[str, Any]]:
+    if fmt not in IMPORT_FORMATS:
+        raise ValueError(f"format must be one of {', '.join(IMPORT_FORMATS)}")
+    if fmt == "csv":
+        yield from csv.DictReader(io.StringIO(text))
+        return
+    for line_no, line in enumerate(text.splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            item = json.loads(line)
+        except json.JSONDecodeError:
+            item = None
+        if not isinstance(item, dict):
+            raise ImportRowError(f"line {line_no}: expected a JSON object")
+        yield item
+
+
+def group_sessions(
+    drinks: Iterable[ImportedDrink],
+    *,
+    gap_hours: float = IMPORT_SESSION_GAP_HOURS,
+) -> list[list[ImportedDrink]]:
+    """Split drinks into sessions on inactivity gaps, oldest first."""
+    gap_sec = gap_hours * 3600.0
+    max_span_sec = IMPORT_MAX_SESSION_HOURS * 3600.0
+    sessions: list[list[ImportedDrink]] = []
+    for drink in sorted(drinks, key=lambda d: d.epoch):
+        current = sessions[-1] if sessions else None
+        if (
+            current is None
+            or drink.epoch - current[-1].epoch > gap_sec
+            or drink.epoch - current[0].epoch > max_span_sec
+        ):
+            sessions.append([drink])
+        else:
+            current.append(drink)
+    return sessions
+
+
+def _iso_local(epoch: float) -> str:
+    return datetime.fromtimestamp(epoch).replace(microsecond=0).isoformat()
+
+
+def session_record(drinks: list[ImportedDrink], *, weight_lb: float, is_male: bool) -> dict[str, Any]:
+    """Build the saved-session payload and row metadata for one grouped session."""
+    saved_at = drinks[-1].epoch
+    payload = {
+        "weight_lb": weight_lb,
+        "is_male": is_male,
+        "events": [
+            [round((d.epoch - saved_at) / 3600.0, 4), round(d.grams, 2), d.calories, round(d.carbs_g, 2), round(d.sugar_g, 2)]
+            for d in drinks
+        ],
+        "saved_at_epoch": int(saved_at),
+    }
+    started = datetime.fromtimestamp(drinks[0].epoch)
+    name = next((d.name for d in drinks if d.name), None) or f"Imported {started.strftime('%b %d, %Y')}"
+    return {
+        "name": name,
+        "payload": payload,
+        "started_at": _iso_local(drinks[0].epoch),
+        "ended_at": _iso_local(saved_at),
+        "created_at": datetime.fromtimestamp(saved_at, tz=timezone.utc).strftime("%Y-%m-%d %H:%M:%S"),
+        "session_date": local_session_date(started),
+    }
+
+
+def import_sessions(
+    db_path: str,
+    *,
+    user_id: int,
+    text: str,
+    fmt: str,
+    weight_lb: float,
+    is_male: bool,
+    gap_hours: float = IMPORT_SESSION_GAP_HOURS,
+    batch_size: int = IMPORT_BATCH_SIZE,
+) -> ImportResult:
+    """Parse, group and store drinks; invalid rows are skipped and reported."""
+    result = ImportResult()
+    drinks: list[ImportedDrink] = []
+    for idx, row in enumerate(iter_input_rows(text, fmt), start=1):
+        if idx > IMPORT_MAX_ROWS:
+            raise ImportRowError(f"imports are limited to {IMPORT_MAX_ROWS} rows")
+        try:
+            drinks.append(parse_drink_row(row))
+        except ImportRowError as exc:
+            result.skipped += 1
+            if len(result.errors) < IMPORT_MAX_ERRORS:
+                result.errors.append(f"row {idx}: {exc}")
+
+    records = [session_record(group, weight_lb=weight_lb, is_male=is_male) for group in group_sessions(drinks, gap_hours=gap_hours)]
+    save_user_sessions_many(db_path, user_id=user_id, sessions=records, batch_size=batch_size)
+    result.sessions = len(records)
+    result.drinks = len(drinks)
+    return result
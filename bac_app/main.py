@@ -1,9 +1,12 @@
 """
 BAC tracker CLI demo. Run from project root: python -m bac_app.main
 Creates a sample session, prints current BAC and curve, and optionally saves a graph.
+
+Bulk import: python -m bac_app.main --import-file drinks.csv --user-email you@school.edu
 """
 
 import argparse
+import os
 import sys
 
 from bac_app.session import Session
@@ -17,8 +20,21 @@ def main():
     parser.add_argument("--female", action="store_true", help="Female")
     parser.add_argument("--graph", type=str, metavar="FILE", help="Save BAC graph to FILE (e.g. bac_graph.png)")
     parser.add_argument("--demo", action="store_true", help="Run with demo drinks (2 beers at 0h, 1 at 1h)")
+    parser.add_argument("--import-file", type=str, metavar="FILE", help="Import historical drinks from a CSV/JSONL file")
+    parser.add_argument("--user-email", type=str, help="Account to import into (with --import-file)")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="Import format (default: from file extension)")
+    parser.add_argument("--gap-hours", type=float, default=3.0, help="Start a new session after this many idle hours")
+    parser.add_argument(
+        "--db",
+        type=str,
+        default=os.environ.get("DATABASE_URL") or os.environ.get("APP_DB_PATH", os.path.join("instance", "app.db")),
+        help="Database path or Postgres URL (default: DATABASE_URL / APP_DB_PATH)",
+    )
     args = parser.parse_args()
 
+    if args.import_file:
+        return run_import(args)
+
     session = Session(
         weight_lb=args.weight,
         is_male=not args.female,
@@ -55,5 +71,36 @@ def main():
     return 0
 
 
+def run_import(args) -> int:
+    from bac_app.auth_store import find_user_by_email, get_user_by_id, init_db
+    from bac_app.importer import import_sessions
+
+    if not args.user_email:
+        print("--user-email is required with --import-file", file=sys.stderr)
+        return 2
+    init_db(args.db)
+    found = find_user_by_email(args.db, email=args.user_email.strip().lower())
+    user = get_user_by_id(args.db, int(found["id"])) if found else None
+    if user is None:
+        print(f"No account for {args.user_email}", file=sys.stderr)
+        return 1
+    fmt = args.format or ("jsonl" if args.import_file.lower().endswith((".jsonl", ".ndjson")) else "csv")
+    with open(args.import_file, encoding="utf-8-sig") as fh:
+        text = fh.read()
+    result = import_sessions(
+        args.db,
+        user_id=int(user["id"]),
+        text=text,
+        fmt=fmt,
+        weight_lb=float(user.get("default_weight_lb") or 160.0),
+        is_male=bool(user.get("is_male", True)),
+        gap_hours=max(0.5, args.gap_hours),
+    )
+    print(f"Imported {result.drinks} drinks into {result.sessions} sessions ({result.skipped} rows skipped)")
+    for error in result.errors:
+        print(f"  {error}", file=sys.stderr)
+    return 0
+
+
 if __name__ == "__main__":
     sys.exit(main() or 0)
@@ -0,0 +1,224 @@
+"""Periodic storage maintenance: expiry, retention and cleanup.
+
+Runs in-process (started by the web app) or as a worker:
+
+    python -m bac_app.maintenance --once
+
+Every process may run a scheduler; a lock row in `maintenance_locks` makes sure
+only one of them does the work at a time. Each job deletes in bounded batches
+and is capped per run, so a backlog drains over several ticks instead of one
+long transaction.
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import socket
+import sys
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, Callable
+
+from bac_app import auth_store
+from bac_app.feedback_store import init_db as init_feedback_db
+from bac_app.feedback_store import prune_feedback
+
+MAINTENANCE_INTERVAL_SEC = 300.0
+MAINTENANCE_LOCK_NAME = "maintenance"
+MAINTENANCE_BATCH_SIZE = 500
+MAINTENANCE_MAX_ROWS_PER_JOB = 5000
+INACTIVITY_EXPIRE_HOURS = 3.0
+MAX_ACTIVE_SESSION_HOURS = 12.0
+ALERT_RETENTION_DAYS = 30.0
+PRESENCE_RETENTION_HOURS = 7 * 24.0
+SESSION_EVENT_RETENTION_DAYS = 7.0
+FEEDBACK_RETENTION_DAYS = 365.0
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class MaintenanceJob:
+    name: str
+    run: Callable[["MaintenanceScheduler"], int]
+
+
+def default_jobs() -> list[MaintenanceJob]:
+    def limits(s: "MaintenanceScheduler") -> dict[str, Any]:
+        return {"batch_size": s.batch_size, "max_rows": s.max_rows_per_job}
+
+    return [
+        MaintenanceJob(
+            "finalize_abandoned_sessions",
+            lambda s: auth_store.finalize_abandoned_auto_sessions(
+                s.db_path,
+                inactive_hours=s.inactive_hours,
+                max_active_hours=s.max_active_hours,
+                limit=s.max_rows_per_job,
+            ),
+        ),
+        MaintenanceJob(
+            "prune_group_alerts",
+            lambda s: auth_store.prune_group_alerts(s.db_path, older_than_days=ALERT_RETENTION_DAYS, **limits(s)),
+        ),
+        MaintenanceJob("delete_expired_tokens", lambda s: auth_store.delete_expired_tokens(s.db_path, **limits(s))),
+        MaintenanceJob(
+            "prune_stale_presence",
+            lambda s: auth_store.prune_stale_presence(s.db_path, older_than_hours=PRESENCE_RETENTION_HOURS, **limits(s)),
+        ),
+        MaintenanceJob(
+            "compact_session_events",
+            lambda s: auth_store.compact_closed_session_events(
+                s.db_path, older_than_days=SESSION_EVENT_RETENTION_DAYS, **limits(s)
+            ),
+        ),
+        MaintenanceJob(
+            "purge_deleted_users",
+            lambda s: auth_store.purge_deleted_users(s.db_path, batch_size=s.batch_size),
+        ),
+        MaintenanceJob(
+            "prune_feedback",
+            lambda s: prune_feedback(s.feedback_db_path, older_than_days=FEEDBACK_RETENTION_DAYS, **limits(s))
+            if s.feedback_db_path
+            else 0,
+        ),
+    ]
+
+
+class MaintenanceScheduler:
+    """Runs maintenance jobs every `interval_sec` while holding the leader lock."""
+
+    def __init__(
+        self,
+        db_path: str,
+        *,
+        feedback_db_path: str | None = None,
+        interval_sec: float = MAINTENANCE_INTERVAL_SEC,
+        batch_size: int = MAINTENANCE_BATCH_SIZE,
+        max_rows_per_job: int = MAINTENANCE_MAX_ROWS_PER_JOB,
+        inactive_hours: float = INACTIVITY_EXPIRE_HOURS,
+        max_active_hours: float = MAX_ACTIVE_SESSION_HOURS,
+        owner: str | None = None,
+        jobs: list[MaintenanceJob] | None = None,
+    ):
+        self.db_path = db_path
+        self.feedback_db_path = feedback_db_path
+        self.interval_sec = max(1.0, float(interval_sec))
+        self.batch_size = max(1, int(batch_size))
+        self.max_rows_per_job = max(1, int(max_rows_per_job))
+        self.inactive_hours = float(inactive_hours)
+        self.max_active_hours = float(max_active_hours)
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.jobs = jobs if jobs is not None else default_jobs()
+        self.stats: dict[str, dict[str, Any]] = {
+            job.name: {"runs": 0, "errors": 0, "rows_total": 0, "last_rows": 0, "last_duration_ms": 0.0, "last_run_at": None}
+            for job in self.jobs
+        }
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def run_once(self) -> dict[str, int] | None:
+        """Run every job once; return rows touched per job, or None if another process leads."""
+        # The lock outlives a missed tick, so a crashed leader is replaced after two intervals.
+        if not auth_store.acquire_maintenance_lock(
+            self.db_path,
+            name=MAINTENANCE_LOCK_NAME,
+            owner=self.owner,
+            ttl_sec=self.interval_sec * 2,
+        ):
+            return None
+        results: dict[str, int] = {}
+        for job in self.jobs:
+            stat = self.stats[job.name]
+            started = time.perf_counter()
+            try:
+                rows = int(job.run(self) or 0)
+            except Exception:
+                stat["errors"] += 1
+                logger.exception("maintenance job failed job=%s", job.name)
+                continue
+            duration_ms = (time.perf_counter() - started) * 1000.0
+            stat.update(
+                runs=stat["runs"] + 1,
+                rows_total=stat["rows_total"] + rows,
+                last_rows=rows,
+                last_duration_ms=round(duration_ms, 2),
+                last_run_at=time.time(),
+            )
+            results[job.name] = rows
+            if rows:
+                logger.info("maintenance job=%s rows=%s in %.1fms", job.name, rows, duration_ms)
+        return results
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval_sec):
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("maintenance tick failed")
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._loop, name="maintenance", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        try:
+            auth_store.release_maintenance_lock(self.db_path, name=MAINTENANCE_LOCK_NAME, owner=self.owner)
+        except Exception:
+            logger.exception("maintenance lock release failed")
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Run BAC tracker storage maintenance")
+    parser.add_argument(
+        "--db",
+        default=os.environ.get("DATABASE_URL") or os.environ.get("APP_DB_PATH", os.path.join("instance", "app.db")),
+        help="Auth/session database path or Postgres URL",
+    )
+    parser.add_argument(
+        "--feedback-db",
+        default=os.environ.get("FEEDBACK_DB_PATH") or os.environ.get("DATABASE_URL") or os.path.join("instance", "feedback.db"),
+        help="Feedback database path or Postgres URL",
+    )
+    parser.add_argument("--interval", type=float, default=MAINTENANCE_INTERVAL_SEC, help="Seconds between runs")
+    parser.add_argument("--batch-size", type=int, default=MAINTENANCE_BATCH_SIZE)
+    parser.add_argument("--once", action="store_true", help="Run all jobs once and exit")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s %(message)s")
+    auth_store.init_db(args.db)
+    init_feedback_db(args.feedback_db)
+    scheduler = MaintenanceScheduler(
+        args.db,
+        feedback_db_path=args.feedback_db,
+        interval_sec=args.interval,
+        batch_size=args.batch_size,
+    )
+    if args.once:
+        results = scheduler.run_once()
+        if results is not None:
+            scheduler.stop()
+        if results is None:
+            print("Another process holds the maintenance lock", file=sys.stderr)
+            return 1
+        for name, rows in results.items():
+            print(f"{name}: {rows}")
+        return 0
+    try:
+        while True:
+            scheduler.run_once()
+            time.sleep(scheduler.interval_sec)
+    except KeyboardInterrupt:
+        scheduler.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+"""Allocation tracking with tracemalloc.
+
+Tracing is off by default because it slows every allocation down; it is turned
+on with `MEMORY_TRACKING=1` at startup or from the admin endpoint. While it is
+on, the largest allocation sites can be listed, a baseline snapshot can be
+taken and later diffed to spot growth, and each request's peak allocation is
+recorded. The peak counter is process-wide, so with threaded workers a
+request's peak may include allocations made concurrently by other requests.
+"""
+
+from __future__ import annotations
+
+import threading
+import tracemalloc
+from typing import Any
+
+DEFAULT_TRACE_FRAMES = 1
+MAX_TRACE_FRAMES = 25
+DEFAULT_TOP_SITES = 25
+MAX_TOP_SITES = 200
+
+_baseline: tracemalloc.Snapshot | None = None
+_lock = threading.Lock()
+_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+def is_tracing() -> bool:
+    return tracemalloc.is_tracing()
+
+
+def start(frames: int = DEFAULT_TRACE_FRAMES) -> None:
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(max(1, min(MAX_TRACE_FRAMES, int(frames))))
+
+
+def stop() -> None:
+    global _baseline
+    with _lock:
+        _baseline = None
+    tracemalloc.stop()
+
+
+def _snapshot() -> tracemalloc.Snapshot:
+    return tracemalloc.take_snapshot().filter_traces(_FILTERS)
+
+
+def _site(trace_frames: Any) -> str:
+    frame = trace_frames[0]
+    return f"{frame.filename}:{frame.lineno}"
+
+
+def top_sites(limit: int = DEFAULT_TOP_SITES, *, group_by: str = "lineno") -> list[dict[str, Any]]:
+    """Largest live allocation sites, biggest first."""
+    if not tracemalloc.is_tracing():
+        return []
+    stats = _snapshot().statistics(group_by)
+    return [
+        {"site": _site(stat.traceback), "size_bytes": stat.size, "count": stat.count}
+        for stat in stats[: max(1, min(MAX_TOP_SITES, int(limit)))]
+    ]
+
+
+def take_baseline() -> None:
+    global _baseline
+    snapshot = _snapshot()
+    with _lock:
+        _baseline = snapshot
+
+
+def has_baseline() -> bool:
+    return _baseline is not None
+
+
+def diff_from_baseline(limit: int = DEFAULT_TOP_SITES, *, group_by: str = "lineno") -> list[dict[str, Any]]:
+    """Sites whose live allocations changed most since the baseline."""
+    with _lock:
+        baseline = _baseline
+    if baseline is None or not tracemalloc.is_tracing():
+        return []
+    stats = _snapshot().compare_to(baseline, group_by)
+    return [
+        {
+            "site": _site(stat.traceback),
+            "size_diff_bytes": stat.size_diff,
+            "size_bytes": stat.size,
+            "count_diff": stat.count_diff,
+            "count": stat.count,
+        }
+        for stat in stats[: max(1, min(MAX_TOP_SITES, int(limit)))]
+    ]
+
+
+def traced_memory() -> dict[str, int]:
+    current, peak = tracemalloc.get_traced_memory()
+    return {"current_bytes": current, "peak_bytes": peak, "tracemalloc_overhead_bytes": tracemalloc.get_tracemalloc_memory()}
+
+
+def begin_request() -> int | None:
+    """Reset the peak counter and return the bytes traced when the request started."""
+    if not tracemalloc.is_tracing():
+        return None
+    tracemalloc.reset_peak()
+    return tracemalloc.get_traced_memory()[0]
+
+
+def request_peak(start_bytes: int | None) -> int | None:
+    """Peak bytes allocated above the starting level since `begin_request`."""
+    if start_bytes is None or not tracemalloc.is_tracing():
+        return None
+    return max(0, tracemalloc.get_traced_memory()[1] - start_bytes)
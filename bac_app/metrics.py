@@ -0,0 +1,325 @@
+"""Process metrics with Prometheus text exposition.
+
+Counters, gauges and histograms are kept in a per-process registry. Gunicorn
+workers are separate processes, so when `METRICS_DIR` is set each worker writes
+its snapshot to `<dir>/metrics-<pid>.json` (at most every couple of seconds,
+and always right before serving `/metrics`) and the scrape merges every file:
+counters and histograms are summed, gauges only over workers still alive.
+Files left by exited workers are folded into `metrics-archive.json` so counters
+stay monotonic across worker restarts.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX
+    fcntl = None
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.15, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 10.0)
+ALLOC_BUCKETS = tuple(float(2**n) for n in range(14, 28, 2))  # 16 KiB .. 64 MiB
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+METRICS_FLUSH_INTERVAL_SEC = 2.0
+ARCHIVE_FILE = "metrics-archive.json"
+
+FAMILIES: dict[str, tuple[str, str, tuple[float, ...] | None]] = {
+    "bac_http_requests_total": ("counter", "HTTP responses by route and status.", None),
+    "bac_http_request_duration_seconds": ("histogram", "HTTP request latency by route.", LATENCY_BUCKETS),
+    "bac_http_request_peak_alloc_bytes": (
+        "histogram",
+        "Peak traced allocation per request by route (only while tracemalloc is on).",
+        ALLOC_BUCKETS,
+    ),
+    "bac_http_requests_in_flight": ("gauge", "Requests currently being handled.", None),
+    "bac_db_queries_total": ("counter", "Database statements executed.", None),
+    "bac_db_query_duration_seconds": ("histogram", "Database statement latency.", DB_BUCKETS),
+    "bac_cache_requests_total": ("counter", "In-process cache lookups by result.", None),
+    "bac_rate_limit_rejections_total": ("counter", "Requests rejected by a rate limiter.", None),
+}
+
+LabelKey = tuple[tuple[str, str], ...]
+
+
+def _label_key(labels: dict[str, Any]) -> LabelKey:
+    return tuple(sorted((str(k), str(v)) for k, v in labels.items()))
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._values: dict[str, dict[LabelKey, Any]] = {name: {} for name in FAMILIES}
+
+    def inc(self, name: str, labels: dict[str, Any], value: float = 1.0) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            series = self._values[name]
+            series[key] = series.get(key, 0.0) + value
+
+    def add(self, name: str, labels: dict[str, Any], delta: float) -> None:
+        self.inc(name, labels, delta)
+
+    def observe(self, name: str, labels: dict[str, Any], value: float) -> None:
+        buckets = FAMILIES[name][2] or ()
+        key = _label_key(labels)
+        with self._lock:
+            hist = self._values[name].get(key)
+            if hist is None:
+                hist = self._values[name][key] = {"counts": [0] * (len(buckets) + 1), "sum": 0.0, "count": 0}
+            idx = next((i for i, bound in enumerate(buckets) if value <= bound), len(buckets))
+            hist["counts"][idx] += 1
+            hist["sum"] += value
+            hist["count"] += 1
+
+    def snapshot(self) -> dict[str, list[list[Any]]]:
+        """Return a JSON-serialisable copy: family -> [[label pairs, value], ...]."""
+        with self._lock:
+            return {
+                name: [
+                    [[list(pair) for pair in key], dict(value, counts=list(value["counts"])) if isinstance(value, dict) else value]
+                    for key, value in series.items()
+                ]
+                for name, series in self._values.items()
+                if series
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            for series in self._values.values():
+                series.clear()
+
+
+REGISTRY = MetricsRegistry()
+_last_flush = 0.0
+_flush_lock = threading.Lock()
+
+
+def metrics_dir() -> str | None:
+    raw = os.environ.get("METRICS_DIR", "").strip()
+    return raw or None
+
+
+def observe_request(*, method: str, route: str, status: int, seconds: float) -> None:
+    REGISTRY.inc("bac_http_requests_total", {"method": method, "route": route, "status": status})
+    REGISTRY.observe("bac_http_request_duration_seconds", {"method": method, "route": route}, seconds)
+
+
+def observe_request_alloc(*, method: str, route: str, peak_bytes: int) -> None:
+    REGISTRY.observe("bac_http_request_peak_alloc_bytes", {"method": method, "route": route}, float(peak_bytes))
+
+
+def track_in_flight(delta: int) -> None:
+    REGISTRY.add("bac_http_requests_in_flight", {}, delta)
+
+
+def observe_db_query(*, backend: str, statement: str, seconds: float) -> None:
+    op = statement.lstrip().split(None, 1)[0].lower() if statement.strip() else "other"
+    if op not in {"select", "insert", "update", "delete", "with"}:
+        op = "other"
+    labels = {"backend": backend, "op": op}
+    REGISTRY.inc("bac_db_queries_total", labels)
+    REGISTRY.observe("bac_db_query_duration_seconds", labels, seconds)
+
+
+def record_cache(cache: str, *, hit: bool, count: int = 1) -> None:
+    if count > 0:
+        REGISTRY.inc("bac_cache_requests_total", {"cache": cache, "result": "hit" if hit else "miss"}, count)
+
+
+def record_rate_limit_rejection(bucket: str) -> None:
+    REGISTRY.inc("bac_rate_limit_rejections_total", {"bucket": bucket})
+
+
+def _write_json(path: str, data: dict[str, Any]) -> None:
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(data, fh, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+def write_snapshot(directory: str, *, registry: MetricsRegistry = REGISTRY, pid: int | None = None) -> None:
+    pid = os.getpid() if pid is None else pid
+    os.makedirs(directory, exist_ok=True)
+    _write_json(os.path.join(directory, f"metrics-{pid}.json"), {"pid": pid, "families": registry.snapshot()})
+
+
+def maybe_flush(*, force: bool = False) -> None:
+    """Write this worker's snapshot if `METRICS_DIR` is set and the last write is stale."""
+    global _last_flush
+    directory = metrics_dir()
+    if directory is None:
+        return
+    now = time.monotonic()
+    if not force and now - _last_flush < METRICS_FLUSH_INTERVAL_SEC:
+        return
+    with _flush_lock:
+        if not force and now - _last_flush < METRICS_FLUSH_INTERVAL_SEC:
+            return
+        _last_flush = now
+        write_snapshot(directory)
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _merge_into(merged: dict[str, dict[LabelKey, Any]], families: dict[str, Any], *, include_gauges: bool) -> None:
+    for name, series in families.items():
+        if name not in FAMILIES:
+            continue
+        kind = FAMILIES[name][0]
+        if kind == "gauge" and not include_gauges:
+            continue
+        target = merged.setdefault(name, {})
+        for pairs, value in series:
+            key = tuple((str(k), str(v)) for k, v in pairs)
+            if kind == "histogram":
+                current = target.get(key)
+                if current is None or len(current["counts"]) != len(value["counts"]):
+                    target[key] = {"counts": list(value["counts"]), "sum": value["sum"], "count": value["count"]}
+                else:
+                    current["counts"] = [a + b for a, b in zip(current["counts"], value["counts"])]
+                    current["sum"] += value["sum"]
+                    current["count"] += value["count"]
+            else:
+                target[key] = target.get(key, 0.0) + float(value)
+
+
+def _read_json(path: str) -> dict[str, Any] | None:
+    try:
+        with open(path, encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+@contextmanager
+def _dir_lock(directory: str) -> Iterator[None]:
+    if fcntl is None:
+        yield
+        return
+    with open(os.path.join(directory, ".lock"), "a") as fh:
+        fcntl.flock(fh, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+def collect(directory: str | None = None) -> dict[str, dict[LabelKey, Any]]:
+    """Merged view of every worker's metrics, or just this process without a directory."""
+    directory = directory if directory is not None else metrics_dir()
+    merged: dict[str, dict[LabelKey, Any]] = {}
+    if directory is None:
+        _merge_into(merged, REGISTRY.snapshot(), include_gauges=True)
+        return merged
+    os.makedirs(directory, exist_ok=True)
+    with _dir_lock(directory):
+        archive_path = os.path.join(directory, ARCHIVE_FILE)
+        archive: dict[str, dict[LabelKey, Any]] = {}
+        _merge_into(archive, (_read_json(archive_path) or {}).get("families", {}), include_gauges=False)
+        archived = False
+        for entry in sorted(os.listdir(directory)):
+            if not (entry.startswith("metrics-") and entry.endswith(".json")) or entry == ARCHIVE_FILE:
+                continue
+            path = os.path.join(directory, entry)
+            data = _read_json(path)
+            if data is None:
+                continue
+            if _pid_alive(int(data.get("pid", 0))):
+                _merge_into(merged, data.get("families", {}), include_gauges=True)
+                continue
+            _merge_into(archive, data.get("families", {}), include_gauges=False)
+            os.remove(path)
+            archived = True
+        if archived:
+            _write_json(archive_path, {"pid": 0, "families": _families_json(archive)})
+        _merge_into(merged, _families_json(archive), include_gauges=False)
+    return merged
+
+
+def _families_json(merged: dict[str, dict[LabelKey, Any]]) -> dict[str, list[list[Any]]]:
+    return {name: [[[list(p) for p in key], value] for key, value in series.items()] for name, series in merged.items()}
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels_text(pairs: LabelKey | list[tuple[str, str]]) -> str:
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _number(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def render(merged: dict[str, dict[LabelKey, Any]]) -> str:
+    lines: list[str] = []
+    for name, (kind, help_text, buckets) in FAMILIES.items():
+        series = merged.get(name, {})
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        if kind == "gauge" and not series:
+            lines.append(f"{name} 0")
+        for key in sorted(series):
+            value = series[key]
+            if kind != "histogram":
+                lines.append(f"{name}{_labels_text(key)} {_number(value)}")
+                continue
+            running = 0
+            for bound, count in zip((*(buckets or ()), math.inf), value["counts"]):
+                running += count
+                lines.append(f"{name}_bucket{_labels_text([*key, ('le', _number(bound))])} {running}")
+            lines.append(f"{name}_sum{_labels_text(key)} {_number(value['sum'])}")
+            lines.append(f"{name}_count{_labels_text(key)} {value['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def histogram_quantile(q: float, buckets: tuple[float, ...], counts: list[int]) -> float | None:
+    """Estimate a quantile by linear interpolation inside the bucket, as PromQL does."""
+    total = sum(counts)
+    if total == 0:
+        return None
+    rank = q * total
+    running = 0
+    lower = 0.0
+    for bound, count in zip((*buckets, math.inf), counts):
+        if running + count >= rank and count:
+            if math.isinf(bound):
+                return lower
+            return lower + (bound - lower) * (rank - running) / count
+        running += count
+        lower = bound
+    return lower
+
+
+def latency_summary(merged: dict[str, dict[LabelKey, Any]]) -> list[dict[str, Any]]:
+    """Per-route request counts with p50/p95/p99 latency estimates in milliseconds."""
+    rows = []
+    for key, hist in merged.get("bac_http_request_duration_seconds", {}).items():
+        labels = dict(key)
+        item: dict[str, Any] = {"method": labels.get("method"), "route": labels.get("route"), "count": hist["count"]}
+        for q in (0.5, 0.95, 0.99):
+            est = histogram_quantile(q, LATENCY_BUCKETS, hist["counts"])
+            item[f"p{int(q * 100)}_ms"] = None if est is None else round(est * 1000.0, 2)
+        rows.append(item)
+    rows.sort(key=lambda r: r["count"], reverse=True)
+    return rows
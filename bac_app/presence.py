@@ -0,0 +1,242 @@
+"""In-memory presence buffer with write-behind persistence.
+
+Clients poll `/api/state` about once a minute, and most polls report the same
+BAC and drink count as the last one. The buffer keeps the latest presence per
+user in memory and only marks a row for writing when it meaningfully changed
+or when the stored row is getting stale. Pending rows are drained in batches
+by the storage layer.
+
+Presence also carries a compact BAC model: one (epoch_seconds, rise_percent)
+breakpoint per drink that is still being eliminated. Readers project the
+current BAC from it, so a backgrounded phone does not show a frozen value and
+BAC drift alone never needs a write.
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Iterable
+
+from bac_app import calculations
+
+PRESENCE_BAC_EPSILON = 0.005
+# Smallest projected BAC change a client can see (BAC is shown to 3 decimals).
+PRESENCE_DISPLAY_EPSILON = 0.0005
+PRESENCE_MAX_STALENESS_SEC = 300.0
+PRESENCE_FLUSH_INTERVAL_SEC = 5.0
+PRESENCE_MODEL_VERSION = 1
+# Drink times are re-derived from relative cookie offsets on every request, so
+# breakpoints within this many seconds are treated as the same drink.
+PRESENCE_MODEL_TOLERANCE_SEC = 90
+
+
+def presence_model(
+    events: Iterable[tuple[float, float]],
+    weight_lb: float,
+    is_male: bool,
+    *,
+    at_epoch: float | None = None,
+) -> str:
+    """Serialize (hours_from_now, grams) events as a compact BAC model.
+
+    Drinks already fully eliminated at `at_epoch` are dropped.
+    """
+    at_epoch = time.time() if at_epoch is None else float(at_epoch)
+    breakpoints = []
+    for t_hours, grams in events:
+        rise = calculations.bac_rise_from_grams(grams, weight_lb, is_male)
+        if rise - calculations.ELIMINATION_PER_HOUR * max(0.0, -t_hours) <= 0:
+            continue
+        breakpoints.append([int(round(at_epoch + t_hours * 3600.0)), round(rise, 5)])
+    breakpoints.sort()
+    return json.dumps({"v": PRESENCE_MODEL_VERSION, "b": breakpoints}, separators=(",", ":"))
+
+
+def _parse_model(raw: Any) -> list[tuple[float, float]] | None:
+    if not raw:
+        return None
+    try:
+        data = json.loads(raw) if isinstance(raw, str) else raw
+        if int(data.get("v", 0)) != PRESENCE_MODEL_VERSION:
+            return None
+        return [(float(epoch), float(rise)) for epoch, rise in data.get("b", [])]
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+
+def models_equivalent(a: Any, b: Any) -> bool:
+    """True if two stored models describe the same drinks."""
+    if a == b:
+        return True
+    left, right = _parse_model(a), _parse_model(b)
+    if left is None or right is None or len(left) != len(right):
+        return False
+    return all(
+        abs(e1 - e2) <= PRESENCE_MODEL_TOLERANCE_SEC and abs(r1 - r2) < 1e-4
+        for (e1, r1), (e2, r2) in zip(left, right)
+    )
+
+
+def project_bac_many(models: list[Any], *, at_epoch: float | None = None) -> list[float | None]:
+    """Project current BAC for a batch of stored models in one pass.
+
+    All models are evaluated at the same instant so members of a group are
+    comparable. Unreadable or missing models project to None.
+    """
+    at_epoch = time.time() if at_epoch is None else float(at_epoch)
+    out: list[float | None] = []
+    for raw in models:
+        breakpoints = _parse_model(raw)
+        if breakpoints is None:
+            out.append(None)
+            continue
+        hours = [((epoch - at_epoch) / 3600.0, rise) for epoch, rise in breakpoints]
+        out.append(calculations.bac_from_breakpoints(0.0, hours))
+    return out
+
+
+@dataclass
+class PresenceEntry:
+    bac_now: float
+    drink_count: int
+    location_note: str | None
+    updated_at: str
+    bac_model: str | None = None
+    persisted: tuple[float, int, str | None, str | None] | None = None
+    persisted_at: float = 0.0
+    dirty: bool = False
+    seen_at: float = 0.0
+
+
+class PresenceBuffer:
+    """Latest presence per user, plus the set of rows that still need writing.
+
+    Users who stop reporting are forgotten once their last row is written and
+    `max_staleness_sec` has passed; readers fall back to the stored row.
+    """
+
+    def __init__(
+        self,
+        *,
+        bac_epsilon: float = PRESENCE_BAC_EPSILON,
+        max_staleness_sec: float = PRESENCE_MAX_STALENESS_SEC,
+    ):
+        self.bac_epsilon = float(bac_epsilon)
+        self.max_staleness_sec = float(max_staleness_sec)
+        self._entries: dict[int, PresenceEntry] = {}
+        self._lock = threading.Lock()
+
+    def _needs_write(self, entry: PresenceEntry, now: float) -> bool:
+        if entry.persisted is None:
+            return True
+        bac, count, note, model = entry.persisted
+        if not models_equivalent(entry.bac_model, model):
+            return True
+        # With a model readers project BAC themselves, so drift is not a change.
+        if entry.bac_model is None and abs(entry.bac_now - bac) > self.bac_epsilon:
+            return True
+        if entry.drink_count != count or entry.location_note != note:
+            return True
+        return now - entry.persisted_at >= self.max_staleness_sec
+
+    def record(
+        self,
+        user_id: int,
+        *,
+        bac_now: float,
+        drink_count: int,
+        location_note: str | None,
+        updated_at: str,
+        bac_model: str | None = None,
+        now: float | None = None,
+    ) -> bool:
+        """Store the latest presence; return True if it was queued for writing.
+
+        A missing `location_note` keeps the previous note, matching the upsert.
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            entry = self._entries.get(int(user_id))
+            if entry is None:
+                entry = PresenceEntry(float(bac_now), int(drink_count), location_note or None, updated_at, bac_model)
+                self._entries[int(user_id)] = entry
+            else:
+                entry.bac_now = float(bac_now)
+                entry.drink_count = int(drink_count)
+                entry.location_note = location_note or entry.location_note
+                entry.updated_at = updated_at
+                entry.bac_model = bac_model
+            entry.seen_at = now
+            if not entry.dirty and self._needs_write(entry, now):
+                entry.dirty = True
+            return entry.dirty
+
+    def take_pending(self, *, now: float | None = None) -> list[dict[str, Any]]:
+        """Return dirty rows and mark them as persisted; forget idle, already written users."""
+        now = time.monotonic() if now is None else now
+        rows = []
+        with self._lock:
+            idle = [
+                user_id
+                for user_id, entry in self._entries.items()
+                if not entry.dirty and now - entry.seen_at >= self.max_staleness_sec
+            ]
+            for user_id in idle:
+                del self._entries[user_id]
+            for user_id, entry in self._entries.items():
+                if not entry.dirty:
+                    continue
+                rows.append(
+                    {
+                        "user_id": user_id,
+                        "bac_now": entry.bac_now,
+                        "drink_count": entry.drink_count,
+                        "location_note": entry.location_note,
+                        "bac_model": entry.bac_model,
+                    }
+                )
+                entry.dirty = False
+                entry.persisted = (entry.bac_now, entry.drink_count, entry.location_note, entry.bac_model)
+                entry.persisted_at = now
+        return rows
+
+    def requeue(self, rows: list[dict[str, Any]]) -> None:
+        """Mark rows from a failed flush as pending again."""
+        with self._lock:
+            for row in rows:
+                entry = self._entries.get(int(row["user_id"]))
+                if entry is not None:
+                    entry.dirty = True
+                    entry.persisted = None
+
+    def get(self, user_id: int) -> dict[str, Any] | None:
+        with self._lock:
+            entry = self._entries.get(int(user_id))
+            if entry is None:
+                return None
+            return {
+                "bac_now": entry.bac_now,
+                "drink_count": entry.drink_count,
+                "location_note": entry.location_note,
+                "updated_at": entry.updated_at,
+                "bac_model": entry.bac_model,
+            }
+
+    def discard(self, user_id: int) -> None:
+        with self._lock:
+            self._entries.pop(int(user_id), None)
+
+    def discard_older_than(self, updated_before: str) -> int:
+        """Forget users last reported before `updated_before` (same format as `updated_at`)."""
+        with self._lock:
+            stale = [user_id for user_id, entry in self._entries.items() if entry.updated_at < updated_before]
+            for user_id in stale:
+                del self._entries[user_id]
+        return len(stale)
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return sum(1 for entry in self._entries.values() if entry.dirty)
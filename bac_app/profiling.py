@@ -0,0 +1,115 @@
+"""On-demand profiling for a running process.
+
+`StackSampler` walks every thread's stack at a fixed interval from a background
+thread and aggregates them in collapsed-stack form (`frame;frame;frame count`),
+which flamegraph.pl, speedscope and similar tools read directly. It never
+touches the sampled threads, so its overhead is one stack walk per interval.
+
+`format_stats` renders a cProfile run, used to profile a single request.
+"""
+
+from __future__ import annotations
+
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any
+
+MAX_SAMPLE_SECONDS = 60.0
+MIN_SAMPLE_SECONDS = 0.5
+DEFAULT_SAMPLE_INTERVAL_SEC = 0.005
+MAX_STACK_DEPTH = 64
+MAX_DISTINCT_STACKS = 5000
+REQUEST_PROFILE_TOP_N = 60
+
+
+def _frame_label(frame: Any) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+def _collapse(frame: Any) -> str:
+    labels = []
+    while frame is not None and len(labels) < MAX_STACK_DEPTH:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+class StackSampler:
+    """Samples all thread stacks for a bounded duration; one run at a time."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._stacks: Counter[str] = Counter()
+        self.samples = 0
+        self.dropped = 0
+        self.started_at: float | None = None
+        self.duration_sec = 0.0
+        self.interval_sec = DEFAULT_SAMPLE_INTERVAL_SEC
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, duration_sec: float, *, interval_sec: float = DEFAULT_SAMPLE_INTERVAL_SEC) -> bool:
+        """Start sampling in the background; return False if a run is already in progress."""
+        with self._lock:
+            if self.running:
+                return False
+            self.duration_sec = max(MIN_SAMPLE_SECONDS, min(MAX_SAMPLE_SECONDS, float(duration_sec)))
+            self.interval_sec = max(0.001, min(0.1, float(interval_sec)))
+            self._stacks = Counter()
+            self.samples = 0
+            self.dropped = 0
+            self.started_at = time.time()
+            self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+            self._thread.start()
+            return True
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        deadline = time.perf_counter() + self.duration_sec
+        while time.perf_counter() < deadline:
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = _collapse(frame)
+                if stack in self._stacks or len(self._stacks) < MAX_DISTINCT_STACKS:
+                    self._stacks[stack] += 1
+                else:
+                    self.dropped += 1
+            self.samples += 1
+            time.sleep(self.interval_sec)
+
+    def wait(self, timeout: float | None = None) -> None:
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self._stacks.most_common())
+
+    def status(self) -> dict[str, Any]:
+        return {
+            "running": self.running,
+            "started_at": self.started_at,
+            "duration_sec": self.duration_sec,
+            "interval_ms": round(self.interval_sec * 1000.0, 2),
+            "samples": self.samples,
+            "distinct_stacks": len(self._stacks),
+            "dropped": self.dropped,
+        }
+
+
+def format_stats(profiler: cProfile.Profile, *, sort: str = "cumulative", limit: int = REQUEST_PROFILE_TOP_N) -> str:
+    out = io.StringIO()
+    stats = pstats.Stats(profiler, stream=out)
+    stats.strip_dirs().sort_stats(sort).print_stats(limit)
+    return out.getvalue()
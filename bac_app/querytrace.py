@@ -0,0 +1,185 @@
+"""Per-request database query tracing.
+
+A trace is bound to the current context (one request, or a `capture()` block)
+and collects every statement run through the storage layer: a normalised
+fingerprint, its duration, rows returned or changed, and how many connections
+were opened. Traces nest, so an outer capture also sees the statements of the
+request traces opened inside it.
+
+The same fingerprint showing up several times in one trace is the usual sign of
+an N+1 pattern (a lookup per item, or the same check on separate connections)
+and is reported by `repeated()`.
+"""
+
+from __future__ import annotations
+
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Iterator
+
+QUERY_REPEAT_THRESHOLD = 2
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST_RE = re.compile(r"\(\s*(?:\?|%s)(?:\s*,\s*(?:\?|%s))+\s*\)")
+_SPACE_RE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=1024)
+def fingerprint(sql: str) -> str:
+    """Normalise a statement so calls differing only in literals or IN-list length match."""
+    text = _STRING_RE.sub("?", sql)
+    text = _NUMBER_RE.sub("?", text)
+    text = _PLACEHOLDER_LIST_RE.sub("(...)", text)
+    return _SPACE_RE.sub(" ", text).strip()
+
+
+@dataclass
+class StatementStats:
+    fingerprint: str
+    count: int = 0
+    total_ms: float = 0.0
+    rows: int = 0
+
+
+@dataclass
+class QueryTrace:
+    label: str = ""
+    parent: QueryTrace | None = None
+    statements: dict[str, StatementStats] = field(default_factory=dict)
+    connections: int = 0
+    started: float = field(default_factory=time.perf_counter)
+
+    @property
+    def query_count(self) -> int:
+        return sum(s.count for s in self.statements.values())
+
+    @property
+    def total_ms(self) -> float:
+        return sum(s.total_ms for s in self.statements.values())
+
+    @property
+    def rows(self) -> int:
+        return sum(s.rows for s in self.statements.values())
+
+    def _stats(self, sql: str) -> StatementStats:
+        fp = fingerprint(sql)
+        stats = self.statements.get(fp)
+        if stats is None:
+            stats = self.statements[fp] = StatementStats(fp)
+        return stats
+
+    def repeated(self, threshold: int = QUERY_REPEAT_THRESHOLD) -> list[StatementStats]:
+        return sorted((s for s in self.statements.values() if s.count >= threshold), key=lambda s: -s.count)
+
+
+_CURRENT: ContextVar[QueryTrace | None] = ContextVar("bac_query_trace", default=None)
+
+
+def current() -> QueryTrace | None:
+    return _CURRENT.get()
+
+
+def start(label: str = "") -> QueryTrace:
+    trace = QueryTrace(label=label, parent=_CURRENT.get())
+    _CURRENT.set(trace)
+    return trace
+
+
+def finish(trace: QueryTrace) -> QueryTrace:
+    if _CURRENT.get() is trace:
+        _CURRENT.set(trace.parent)
+    return trace
+
+
+@contextmanager
+def capture(label: str = "") -> Iterator[QueryTrace]:
+    trace = start(label)
+    try:
+        yield trace
+    finally:
+        finish(trace)
+
+
+def _chain(trace: QueryTrace | None) -> Iterator[QueryTrace]:
+    while trace is not None:
+        yield trace
+        trace = trace.parent
+
+
+def record_connection() -> None:
+    for trace in _chain(_CURRENT.get()):
+        trace.connections += 1
+
+
+def record_statement(sql: str, seconds: float, rows: int | None = None) -> list[StatementStats]:
+    """Add one execution to every active trace; return the stats entries to credit fetched rows to."""
+    entries = []
+    for trace in _chain(_CURRENT.get()):
+        stats = trace._stats(sql)
+        stats.count += 1
+        stats.total_ms += seconds * 1000.0
+        if rows is not None and rows > 0:
+            stats.rows += rows
+        entries.append(stats)
+    return entries
+
+
+class CountingCursor:
+    """Cursor proxy that credits fetched rows to the statement's trace entries."""
+
+    def __init__(self, cursor: Any, entries: list[StatementStats]):
+        self._cursor = cursor
+        self._entries = entries
+
+    def _credit(self, n: int) -> None:
+        for stats in self._entries:
+            stats.rows += n
+
+    def fetchone(self) -> Any:
+        row = self._cursor.fetchone()
+        if row is not None:
+            self._credit(1)
+        return row
+
+    def fetchall(self) -> list[Any]:
+        rows = self._cursor.fetchall()
+        self._credit(len(rows))
+        return rows
+
+    def fetchmany(self, *args: Any) -> list[Any]:
+        rows = self._cursor.fetchmany(*args)
+        self._credit(len(rows))
+        return rows
+
+    def __iter__(self) -> Iterator[Any]:
+        for row in self._cursor:
+            self._credit(1)
+            yield row
+
+    def __getattr__(self, item: str) -> Any:
+        return getattr(self._cursor, item)
+
+
+def _is_read(sql: str) -> bool:
+    head = fingerprint(sql)[:6].upper()
+    return head.startswith("SELECT") or head.startswith("WITH")
+
+
+def track(cursor: Any, sql: str, seconds: float) -> Any:
+    """Record an executed statement in the active trace and return the cursor to use.
+
+    Reads are credited with the rows actually fetched; writes with `rowcount`.
+    Without an active trace the cursor is returned untouched.
+    """
+    if _CURRENT.get() is None:
+        return cursor
+    if _is_read(sql):
+        return CountingCursor(cursor, record_statement(sql, seconds))
+    rowcount = getattr(cursor, "rowcount", -1)
+    record_statement(sql, seconds, rowcount if isinstance(rowcount, int) else None)
+    return cursor
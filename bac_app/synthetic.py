@@ -0,0 +1,156 @@
+"""Seeded generator of plausible drinking sessions for load and throughput tests.
+
+Each session is a drinker (sex, body weight, preferred drink category) plus a
+drink log shaped by a pacing pattern: a steady night, a pregame followed by a
+slower bar, a short binge, a slow evening, or a late start. Drinks come from
+`bac_app.catalog` and carry a sip window (0, 15 or 30 minutes) that is turned
+into an event time the same way `/api/drink` does.
+
+Session `i` of seed `s` is derived from its own RNG, so any index range can be
+produced independently (one slice per worker process) and the stream for a
+seed is identical no matter how it is sliced. Nothing is materialised up
+front: `generate()` yields sessions lazily and can run for millions of them.
+"""
+
+from __future__ import annotations
+
+import random
+from dataclasses import dataclass
+from itertools import count as _count
+from typing import Iterator
+
+from bac_app.catalog import CATALOG, grams_and_nutrition
+from bac_app.session import Session
+
+# Mirror the bounds app.py enforces on profile weight and back-dated drinks.
+MIN_WEIGHT_LB = 80.0
+MAX_WEIGHT_LB = 400.0
+MAX_HOURS_AGO = 24.0
+SIP_MINUTES = (0, 15, 30)
+SIP_WEIGHTS = (0.6, 0.25, 0.15)
+
+# (mean, standard deviation) body weight in pounds.
+WEIGHT_LB = {True: (196.0, 38.0), False: (168.0, 40.0)}
+
+# Share of drinkers whose usual order is each category; they stray from it now and then.
+CATEGORY_WEIGHTS = {"beer": 0.34, "cocktail": 0.22, "seltzer": 0.16, "wine": 0.14, "liquor": 0.12, "other": 0.02}
+STRAY_PROBABILITY = 0.25
+
+# name -> (share of sessions, drink count range, session span range in hours)
+PACING = {
+    "steady": (0.40, (2, 7), (2.0, 5.0)),
+    "pregame": (0.20, (4, 10), (3.0, 6.0)),
+    "binge": (0.12, (4, 9), (0.75, 2.0)),
+    "slow": (0.18, (1, 3), (1.5, 4.0)),
+    "late_start": (0.10, (2, 6), (1.0, 3.0)),
+}
+
+_BY_CATEGORY: dict[str, list[str]] = {}
+for _entry in CATALOG:
+    _BY_CATEGORY.setdefault(_entry.category, []).append(_entry.id)
+_CATEGORIES = [c for c in CATEGORY_WEIGHTS if c in _BY_CATEGORY]
+_CATEGORY_SHARES = [CATEGORY_WEIGHTS[c] for c in _CATEGORIES]
+_ALL_IDS = [entry.id for entry in CATALOG]
+_PACING_NAMES = list(PACING)
+_PACING_SHARES = [PACING[name][0] for name in _PACING_NAMES]
+
+
+@dataclass
+class SyntheticDrink:
+    hours_ago: float  # when the drink was started, before any sip window
+    catalog_id: str
+    count: float
+    sip_minutes: int
+
+    @property
+    def effective_hours_ago(self) -> float:
+        """Event time after sip mode, as `/api/drink` places it: the middle of the sipping window."""
+        return min(MAX_HOURS_AGO, self.hours_ago + self.sip_minutes / 120.0)
+
+
+@dataclass
+class SyntheticSession:
+    index: int
+    weight_lb: float
+    is_male: bool
+    pacing: str
+    drinks: list[SyntheticDrink]
+    hours_until_target: float
+
+    def to_session(self) -> Session:
+        model = Session(weight_lb=self.weight_lb, is_male=self.is_male)
+        for drink in self.drinks:
+            model.add_drink_catalog(drink.effective_hours_ago, drink.catalog_id, drink.count)
+        return model
+
+    def events(self) -> list[tuple[float, float]]:
+        """(hours_from_now, grams) pairs, oldest first, without building a Session."""
+        pairs = [(-d.effective_hours_ago, grams_and_nutrition(d.catalog_id, d.count)[0]) for d in self.drinks]
+        return sorted(pairs, key=lambda x: x[0])
+
+
+def _rng(seed: int, index: int) -> random.Random:
+    return random.Random(seed * 2**32 + index)
+
+
+def _drink_times(rng: random.Random, pacing: str, drinks: int, span: float) -> list[float]:
+    """Start times in hours from the first drink, for `drinks` drinks over roughly `span` hours."""
+    if drinks == 1:
+        return [0.0]
+    if pacing == "pregame":
+        # A quick burst in the first half hour or so, then a slower tail at the bar.
+        quick = max(2, drinks // 2)
+        times = sorted(rng.uniform(0.0, 0.6) for _ in range(quick))
+        gap = (span - 0.6) / max(1, drinks - quick)
+        times += [0.6 + gap * (k + rng.uniform(0.3, 1.0)) for k in range(drinks - quick)]
+        return times
+    if pacing == "binge":
+        return sorted(rng.uniform(0.0, span) for _ in range(drinks))
+    # steady, slow and late_start: evenly spaced with jitter.
+    gap = span / (drinks - 1)
+    return [max(0.0, k * gap + rng.uniform(-0.25, 0.25) * gap) for k in range(drinks)]
+
+
+def session_at(index: int, *, seed: int = 0) -> SyntheticSession:
+    """The `index`-th session of the stream for `seed`."""
+    rng = _rng(seed, index)
+    is_male = rng.random() < 0.5
+    mean, sd = WEIGHT_LB[is_male]
+    weight = round(min(MAX_WEIGHT_LB, max(MIN_WEIGHT_LB, rng.gauss(mean, sd))), 1)
+
+    pacing = rng.choices(_PACING_NAMES, weights=_PACING_SHARES)[0]
+    _, (low, high), (span_low, span_high) = PACING[pacing]
+    drinks = rng.randint(low, high)
+    span = rng.uniform(span_low, span_high)
+    usual = _BY_CATEGORY[rng.choices(_CATEGORIES, weights=_CATEGORY_SHARES)[0]]
+
+    # Most sessions are viewed mid-night; late starts are still on their first drinks.
+    elapsed = span * (rng.uniform(0.4, 0.8) if pacing == "late_start" else rng.uniform(0.8, 1.3))
+    log: list[SyntheticDrink] = []
+    for started in _drink_times(rng, pacing, drinks, span):
+        if started > elapsed:
+            continue
+        catalog_id = rng.choice(_ALL_IDS) if rng.random() < STRAY_PROBABILITY else rng.choice(usual)
+        log.append(
+            SyntheticDrink(
+                hours_ago=round(min(MAX_HOURS_AGO, elapsed - started), 2),
+                catalog_id=catalog_id,
+                count=2.0 if rng.random() < 0.05 else 1.0,
+                sip_minutes=rng.choices(SIP_MINUTES, weights=SIP_WEIGHTS)[0],
+            )
+        )
+    return SyntheticSession(
+        index=index,
+        weight_lb=weight,
+        is_male=is_male,
+        pacing=pacing,
+        drinks=log,
+        hours_until_target=round(rng.uniform(4.0, 14.0), 1),
+    )
+
+
+def generate(count: int | None = None, *, seed: int = 0, start: int = 0) -> Iterator[SyntheticSession]:
+    """Yield sessions `start`, `start + 1`, ... lazily; forever when `count` is None."""
+    indices = _count(start) if count is None else range(start, start + count)
+    for index in indices:
+        yield session_at(index, seed=seed)
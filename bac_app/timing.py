@@ -0,0 +1,37 @@
+"""Per-request phase timers rendered as a `Server-Timing` header.
+
+Phases accumulate, so a phase entered several times in one request reports
+its total. Phases can overlap: `db` is the storage time of the whole request
+and also falls inside whichever compute phase issued the query.
+"""
+
+from __future__ import annotations
+
+import re
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+_TOKEN_RE = re.compile(r"[^A-Za-z0-9!#$%&'*+.^_`|~-]")
+
+
+class PhaseTimer:
+    def __init__(self) -> None:
+        self.phases: dict[str, float] = {}
+
+    def add(self, name: str, ms: float) -> None:
+        self.phases[name] = self.phases.get(name, 0.0) + ms
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, (time.perf_counter() - started) * 1000.0)
+
+    def header(self) -> str:
+        return ", ".join(f"{_TOKEN_RE.sub('_', name)};dur={ms:.2f}" for name, ms in self.phases.items())
+
+    def log_fields(self) -> str:
+        return ",".join(f"{name}:{ms:.1f}" for name, ms in self.phases.items())
@@ -0,0 +1 @@
+"""Performance benchmarks; see `benchmarks/bench_compute.py`."""
@@ -0,0 +1,311 @@
+"""Micro-benchmarks for the BAC math and the `/api/state` compute helpers.
+
+Each function is timed at 1, 10, 50 and 500 drinks: one drink, a normal night,
+a heavy night, and an adversarial log that `MAX_HOURS_AGO` still allows.
+Results are written as a JSON baseline; `compare` re-runs the suite (or reads a
+second results file) and exits non-zero when any case got slower than the
+baseline by more than `--threshold` percent.
+
+Usage:
+    python -m benchmarks.bench_compute run --out benchmarks/baselines/local.json
+    python -m benchmarks.bench_compute compare benchmarks/baselines/local.json --threshold 15
+    python -m benchmarks.bench_compute compare base.json --current new.json --only bac_curve
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import timeit
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from bac_app import calculations, hangover  # noqa: E402
+from bac_app.session import Session  # noqa: E402
+
+DRINK_COUNTS = (1, 10, 50, 500)
+DEFAULT_REPEAT = 5
+DEFAULT_MIN_TIME_SEC = 0.2
+DEFAULT_THRESHOLD_PCT = 10.0
+DEFAULT_SEED = 1337
+WEIGHT_LB = 170.0
+IS_MALE = True
+HOURS_UNTIL_TARGET = 8.0
+HISTORY_SESSIONS = 5
+# Standard drink plus the heavier pours the catalog offers (double, pint of IPA, etc.).
+DRINK_GRAMS = (14.0, 14.0, 14.0, 17.7, 21.0, 28.0)
+
+
+@dataclass
+class Case:
+    name: str
+    drinks: int
+    fn: Callable[[], Any]
+
+    @property
+    def key(self) -> str:
+        return f"{self.name}[n={self.drinks}]"
+
+
+def make_events(count: int, *, seed: int = DEFAULT_SEED) -> list[tuple[float, float]]:
+    """`count` (hours_from_now, grams) events in the past, at most 24h back, oldest first."""
+    rng = random.Random(seed * 1000 + count)
+    span = min(24.0, max(0.5, count * 0.4))
+    return sorted((-round(rng.uniform(0.0, span), 2), rng.choice(DRINK_GRAMS)) for _ in range(count))
+
+
+def _session(events: list[tuple[float, float]]) -> Session:
+    model = Session(weight_lb=WEIGHT_LB, is_male=IS_MALE)
+    for t, grams in events:
+        model.add_drink_grams(t, grams)
+    return model
+
+
+class _HistoryFixture:
+    """Throwaway SQLite database with, per drink count, a user and a few finished sessions.
+
+    `_compare_curve_from_history` reads the user's recent sessions from storage,
+    so its timing includes the (cached) payload lookup just like `/api/state`.
+    """
+
+    def __init__(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory(prefix="bac-bench-")
+        os.environ["APP_DB_PATH"] = os.path.join(self._tmp.name, "app.db")
+        os.environ["FEEDBACK_DB_PATH"] = os.path.join(self._tmp.name, "feedback.db")
+        os.environ.setdefault("MAINTENANCE_SCHEDULER", "0")
+        import app as web
+
+        self.web = web
+        web._ensure_auth_db()
+        self._users: dict[int, int] = {}
+
+    def user_for(self, count: int) -> int:
+        """A user whose recent history is sessions of `count` drinks each."""
+        if count in self._users:
+            return self._users[count]
+        db_path = self.web._auth_db_path()
+        user = self.web.create_user(
+            db_path,
+            email=f"bench-{count}@example.com",
+            password="benchmark123",
+            display_name="Bench",
+            username=f"bench{count}",
+            is_male=IS_MALE,
+            default_weight_lb=WEIGHT_LB,
+        )
+        if user is None:
+            raise RuntimeError("could not create benchmark user")
+        user_id = int(user["id"])
+        for i in range(HISTORY_SESSIONS):
+            past = _session(make_events(count, seed=DEFAULT_SEED + i + 1))
+            self.web.save_user_session(db_path, user_id=user_id, name=f"bench-{i}", payload=self.web._session_to_cookie(past))
+        self._users[count] = user_id
+        return user_id
+
+    def close(self) -> None:
+        self._tmp.cleanup()
+
+
+def build_cases(counts: tuple[int, ...], history: _HistoryFixture | None) -> list[Case]:
+    cases: list[Case] = []
+    for n in counts:
+        events = make_events(n)
+        model = _session(events)
+        start_h = min(t for t, _ in events) - 0.5
+        curve = model.curve(step_hours=0.25, start_hours=start_h, max_hours=max(model.hours_until_sober_from_now() + 1.0, 2))
+        grams_per_hour = sum(g for t, g in events if t >= -3.0) / 3.0
+
+        cases += [
+            Case("bac_at_time", n, lambda e=events: calculations.bac_at_time(0.0, e, WEIGHT_LB, IS_MALE)),
+            Case(
+                "bac_curve",
+                n,
+                lambda e=events, s=start_h: calculations.bac_curve(e, WEIGHT_LB, IS_MALE, step_hours=0.25, start_hours=s, max_hours=24.0),
+            ),
+            Case("time_to_sober", n, lambda e=events: calculations.time_to_sober(e, WEIGHT_LB, IS_MALE)),
+            Case("Session.hours_until_sober_from_now", n, model.hours_until_sober_from_now),
+            Case("hangover.get_plan", n, lambda e=events: hangover.get_plan(e, WEIGHT_LB, IS_MALE, HOURS_UNTIL_TARGET)),
+        ]
+        if history is None:
+            continue
+        web = history.web
+        user_id = history.user_for(n)
+        cases += [
+            Case(
+                "app._project_curve_with_rate",
+                n,
+                lambda e=events, r=grams_per_hour: web._project_curve_with_rate(
+                    e, grams_per_hour=r, weight_lb=WEIGHT_LB, is_male=IS_MALE, horizon_hours=HOURS_UNTIL_TARGET
+                ),
+            ),
+            Case("app._event_markers", n, lambda e=events: web._event_markers(e, weight_lb=WEIGHT_LB, is_male=IS_MALE)),
+            Case(
+                "app._compare_curve_from_history",
+                n,
+                lambda m=model, c=curve, u=user_id: web._compare_curve_from_history(u, m, c),
+            ),
+        ]
+    return cases
+
+
+def time_case(case: Case, *, repeat: int, min_time_sec: float) -> dict[str, Any]:
+    timer = timeit.Timer(case.fn)
+    loops = 1
+    while True:
+        if timer.timeit(loops) >= min_time_sec or loops >= 1_000_000:
+            break
+        loops *= 2
+    runs = [timer.timeit(loops) / loops * 1e6 for _ in range(max(1, repeat))]
+    return {
+        "function": case.name,
+        "drinks": case.drinks,
+        "loops": loops,
+        "min_us": round(min(runs), 3),
+        "median_us": round(statistics.median(runs), 3),
+        "max_us": round(max(runs), 3),
+    }
+
+
+def run_suite(
+    *,
+    counts: tuple[int, ...] = DRINK_COUNTS,
+    only: list[str] | None = None,
+    include_app: bool = True,
+    repeat: int = DEFAULT_REPEAT,
+    min_time_sec: float = DEFAULT_MIN_TIME_SEC,
+    verbose: bool = True,
+) -> dict[str, Any]:
+    history = _HistoryFixture() if include_app else None
+    try:
+        results: dict[str, Any] = {}
+        for case in build_cases(counts, history):
+            if only and not any(pattern in case.name for pattern in only):
+                continue
+            results[case.key] = time_case(case, repeat=repeat, min_time_sec=min_time_sec)
+            if verbose:
+                print(f"{case.key:<48} {results[case.key]['min_us']:>12.2f} us")
+    finally:
+        if history is not None:
+            history.close()
+    return {
+        "meta": {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": repeat,
+            "min_time_sec": min_time_sec,
+        },
+        "results": results,
+    }
+
+
+def compare_results(
+    baseline: dict[str, Any],
+    current: dict[str, Any],
+    *,
+    threshold_pct: float,
+    metric: str = "min_us",
+) -> tuple[list[dict[str, Any]], list[str]]:
+    """Per-case change against the baseline, plus the keys that regressed past the threshold."""
+    rows: list[dict[str, Any]] = []
+    regressions: list[str] = []
+    base_results = baseline.get("results", {})
+    for key, now in current.get("results", {}).items():
+        before = base_results.get(key)
+        if before is None or not before.get(metric):
+            rows.append({"case": key, "baseline": None, "current": now[metric], "change_pct": None})
+            continue
+        change = (now[metric] - before[metric]) / before[metric] * 100.0
+        rows.append({"case": key, "baseline": before[metric], "current": now[metric], "change_pct": round(change, 1)})
+        if change > threshold_pct:
+            regressions.append(key)
+    return rows, regressions
+
+
+def _load(path: str) -> dict[str, Any]:
+    with open(path, encoding="utf-8") as handle:
+        return json.load(handle)
+
+
+def _write(path: str, data: dict[str, Any]) -> None:
+    target = Path(path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    target.write_text(json.dumps(data, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+
+
+def _add_suite_args(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--sizes", default=",".join(str(n) for n in DRINK_COUNTS), help="Comma-separated drink counts.")
+    parser.add_argument("--only", action="append", help="Only run functions whose name contains this (repeatable).")
+    parser.add_argument("--no-app", action="store_true", help="Skip the app.py helpers (no Flask import, no database).")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="Timed runs per case; the fastest is kept.")
+    parser.add_argument("--min-time", type=float, default=DEFAULT_MIN_TIME_SEC, help="Minimum seconds per timed run.")
+
+
+def _suite_kwargs(args: argparse.Namespace) -> dict[str, Any]:
+    return {
+        "counts": tuple(int(n) for n in args.sizes.split(",") if n.strip()),
+        "only": args.only,
+        "include_app": not args.no_app,
+        "repeat": args.repeat,
+        "min_time_sec": args.min_time,
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark BAC computations and compare against a JSON baseline.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="Run the suite and write a results file.")
+    run.add_argument("--out", default="benchmarks/baselines/local.json", help="Where to write results.")
+    _add_suite_args(run)
+
+    compare = sub.add_parser("compare", help="Fail if any case regressed past the threshold.")
+    compare.add_argument("baseline", help="Baseline results file.")
+    compare.add_argument("--current", help="Compare this results file instead of re-running the suite.")
+    compare.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD_PCT, help="Allowed slowdown in percent.")
+    compare.add_argument("--metric", choices=("min_us", "median_us"), default="min_us")
+    compare.add_argument("--save", help="Also write the fresh results here.")
+    _add_suite_args(compare)
+
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        data = run_suite(**_suite_kwargs(args))
+        _write(args.out, data)
+        print(f"Wrote {len(data['results'])} results to {args.out}")
+        return 0
+
+    baseline = _load(args.baseline)
+    if args.current:
+        current = _load(args.current)
+    else:
+        current = run_suite(**_suite_kwargs(args), verbose=False)
+        if args.save:
+            _write(args.save, current)
+    rows, regressions = compare_results(baseline, current, threshold_pct=args.threshold, metric=args.metric)
+    for row in rows:
+        if row["change_pct"] is None:
+            print(f"{row['case']:<48} {'new':>10} {row['current']:>12.2f} us")
+            continue
+        flag = "  REGRESSED" if row["case"] in regressions else ""
+        print(f"{row['case']:<48} {row['change_pct']:>+9.1f}% {row['current']:>12.2f} us (was {row['baseline']:.2f}){flag}")
+    if regressions:
+        print(f"{len(regressions)} case(s) regressed more than {args.threshold:.1f}%.")
+        return 1
+    print("No regressions.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
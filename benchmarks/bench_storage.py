@@ -0,0 +1,786 @@
+"""Storage benchmarks: every public `auth_store` / `feedback_store` function at growing table sizes.
+
+For each scale a fresh database is seeded with a synthetic population whose
+large tables (sessions, drink events, group alerts, friendships, feedback) hold
+roughly `scale` rows, while every user keeps about the same amount of personal
+data. A function whose latency still grows with the scale is therefore paying
+for table size rather than for the caller's own rows - a missing index, a scan,
+or a cache warmed from a whole table.
+
+Each call is timed on its own and traced with `querytrace`, so results carry
+statement and connection counts next to the median and p95 latency. Caches are
+cleared before the snapshot, history and alert cases so they measure the cold
+path a fresh worker takes.
+
+Postgres is optional: pass `--database-url` plus `--reset`, which truncates the
+app's tables in that database before each scale is seeded.
+
+Usage:
+    python -m benchmarks.bench_storage --scales 1000,100000 --out benchmarks/baselines/storage.json
+    python -m benchmarks.bench_storage --scales 1000,100000,1000000 --only list_friend_feed --only get_group_snapshot
+    python -m benchmarks.bench_storage --database-url postgresql://localhost/bac_bench --reset --scales 1000,100000
+"""
+
+from __future__ import annotations
+
+import argparse
+import inspect
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from werkzeug.security import generate_password_hash  # noqa: E402
+
+from bac_app import auth_store, feedback_store, querytrace  # noqa: E402
+
+SCALES = (1_000, 100_000, 1_000_000)
+DEFAULT_SCALES = (1_000, 100_000)
+DEFAULT_REPEAT = 15
+DEFAULT_GROWTH_FLAG = 3.0
+SEED_BATCH_SIZE = 5_000
+PASSWORD = "benchmark-pass"
+GROUP_SIZE = 8
+FRIENDS_EACH_WAY = 4
+SESSION_TEMPLATES = 24
+PROBE_HISTORY = 12
+EVENTS_PER_SESSION = 4
+ALERT_TYPES = ("threshold", "check", "status", "home_safe", "emergency")
+CATALOG_IDS = ("bud-light", "ipa-typical", "white-claw-5", "red-wine", "vodka-cran", "margarita")
+# Starts a background thread instead of doing work the caller waits for.
+SKIPPED = {"auth_store.schedule_account_purge": "starts the background purge loop"}
+PG_TABLES = (
+    "session_events",
+    "saved_sessions",
+    "group_buddy_pairs",
+    "group_alerts",
+    "guardian_links",
+    "group_members",
+    "social_groups",
+    "friendships",
+    "friend_requests",
+    "user_presence",
+    "user_social_settings",
+    "user_favorites",
+    "emergency_contacts",
+    "password_resets",
+    "email_verifications",
+    "maintenance_locks",
+    "users",
+)
+PG_ID_TABLES = (
+    "users",
+    "saved_sessions",
+    "session_events",
+    "social_groups",
+    "group_alerts",
+    "guardian_links",
+    "friend_requests",
+    "emergency_contacts",
+    "password_resets",
+    "email_verifications",
+)
+
+
+@dataclass
+class Population:
+    """Row counts for one scale; per-user data stays roughly constant as it grows."""
+
+    scale: int
+    users: int
+    groups: int
+    sessions: int
+    events: int
+    alerts: int
+    feedback: int
+
+    @classmethod
+    def for_scale(cls, scale: int) -> Population:
+        users = max(200, scale // 10)
+        return cls(
+            scale=scale,
+            users=users,
+            groups=max(20, users // GROUP_SIZE),
+            sessions=max(500, scale // 2),
+            events=max(1_000, scale),
+            alerts=max(500, scale),
+            feedback=max(500, scale),
+        )
+
+
+def _ts(now: datetime, *, days_ago: float) -> str:
+    return (now - timedelta(days=days_ago)).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _batches(rows: Iterable[tuple], size: int) -> Iterator[list[tuple]]:
+    batch: list[tuple] = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _bulk_insert(conn: Any, table: str, columns: tuple[str, ...], rows: Iterable[tuple]) -> int:
+    """Insert rows in bulk, bypassing per-statement tracing (seeding is not what is measured)."""
+    count = 0
+    if conn.is_postgres:
+        with conn.cursor() as cur:
+            with cur.copy(f"COPY {table} ({', '.join(columns)}) FROM STDIN") as copy:
+                for row in rows:
+                    copy.write_row(row)
+                    count += 1
+        return count
+    query = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})"
+    for batch in _batches(rows, SEED_BATCH_SIZE):
+        conn.executemany(query, batch)
+        count += len(batch)
+    return count
+
+
+def _session_templates(rng: random.Random) -> list[tuple[str, tuple[Any, ...]]]:
+    """A few realistic payloads with their precomputed summaries, reused across sessions."""
+    templates = []
+    for _ in range(SESSION_TEMPLATES):
+        drinks = rng.randint(1, 8)
+        span = rng.uniform(0.5, 5.0)
+        events = sorted(
+            [[-round(rng.uniform(0.0, span), 2), rng.choice((14.0, 14.0, 17.7, 21.0)), rng.randint(90, 220), 10.0, 4.0] for _ in range(drinks)]
+        )
+        payload = {"weight_lb": rng.randint(110, 260), "is_male": rng.random() < 0.5, "events": events, "saved_at_epoch": 0}
+        summary = auth_store.session_summary(payload)
+        templates.append((json.dumps(payload, separators=(",", ":")), tuple(summary[c] for c in auth_store.SESSION_SUMMARY_COLUMNS)))
+    return templates
+
+
+def seed(db_path: str, feedback_db: str, pop: Population, *, seed_value: int = 0) -> dict[str, int]:
+    """Fill an initialised, empty database with `pop`; return rows written per table."""
+    rng = random.Random(seed_value)
+    now = datetime.now(timezone.utc)
+    password_hash = generate_password_hash(PASSWORD)
+    counts: dict[str, int] = {}
+    templates = _session_templates(rng)
+    n_users = pop.users
+
+    def member_ids(group_id: int) -> range:
+        first = (group_id - 1) * GROUP_SIZE + 1
+        return range(first, min(first + GROUP_SIZE, n_users + 1))
+
+    with auth_store._connect(db_path) as conn:
+        if not conn.is_postgres:
+            conn.execute("PRAGMA synchronous = OFF")
+        counts["users"] = _bulk_insert(
+            conn,
+            "users",
+            ("id", "email", "password_hash", "display_name", "email_verified", "is_male", "default_weight_lb", "username", "invite_code", "created_at"),
+            (
+                (i, f"user{i}@bench.example", password_hash, f"User {i}", 1, i % 2, 120 + i % 140, f"user{i}", f"U{i:09d}", _ts(now, days_ago=400 - i % 400))
+                for i in range(1, n_users + 1)
+            ),
+        )
+        counts["friendships"] = _bulk_insert(
+            conn,
+            "friendships",
+            ("user_id", "friend_user_id", "created_at"),
+            (
+                (i, (i - 1 + d * sign) % n_users + 1, _ts(now, days_ago=d))
+                for i in range(1, n_users + 1)
+                for d in range(1, FRIENDS_EACH_WAY + 1)
+                for sign in (1, -1)
+            ),
+        )
+        counts["friend_requests"] = _bulk_insert(
+            conn,
+            "friend_requests",
+            ("from_user_id", "to_user_id", "status", "created_at"),
+            (((i + FRIENDS_EACH_WAY) % n_users + 1, i, "pending", _ts(now, days_ago=1)) for i in range(1, n_users + 1, 4)),
+        )
+        counts["user_social_settings"] = _bulk_insert(
+            conn,
+            "user_social_settings",
+            ("user_id", "share_with_friends", "updated_at"),
+            ((i, 1 if i % 2 else 0, _ts(now, days_ago=5)) for i in range(1, n_users + 1)),
+        )
+        counts["user_presence"] = _bulk_insert(
+            conn,
+            "user_presence",
+            ("user_id", "bac_now", "drink_count", "location_note", "updated_at"),
+            ((i, round(rng.uniform(0.0, 0.12), 4), rng.randint(0, 6), None, _ts(now, days_ago=rng.uniform(0.0, 3.0))) for i in range(1, n_users + 1)),
+        )
+        counts["user_favorites"] = _bulk_insert(
+            conn,
+            "user_favorites",
+            ("user_id", "catalog_id", "use_count", "updated_at"),
+            ((i, CATALOG_IDS[(i + k) % len(CATALOG_IDS)], k + 1, _ts(now, days_ago=k)) for i in range(1, n_users + 1) for k in range(3)),
+        )
+        counts["emergency_contacts"] = _bulk_insert(
+            conn,
+            "emergency_contacts",
+            ("user_id", "name", "phone", "created_at"),
+            ((i, "Contact", f"555{i:07d}", _ts(now, days_ago=30)) for i in range(1, n_users + 1)),
+        )
+        for table in ("password_resets", "email_verifications"):
+            counts[table] = _bulk_insert(
+                conn,
+                table,
+                ("user_id", "token", "expires_at", "used_at"),
+                ((i, f"{table}-{i}", _ts(now, days_ago=-1 if i % 4 == 1 else 2), None) for i in range(1, n_users + 1, 2)),
+            )
+
+        counts["social_groups"] = _bulk_insert(
+            conn,
+            "social_groups",
+            ("id", "name", "invite_code", "owner_user_id", "created_at"),
+            ((k, f"Group {k}", f"G{k:09d}", member_ids(k)[0], _ts(now, days_ago=90)) for k in range(1, pop.groups + 1) if len(member_ids(k))),
+        )
+        group_count = counts["social_groups"]
+        counts["group_members"] = _bulk_insert(
+            conn,
+            "group_members",
+            ("group_id", "user_id", "role", "share_enabled", "joined_at"),
+            (
+                (k, uid, "owner" if pos == 0 else "member", 1 if uid % 2 else 0, _ts(now, days_ago=60))
+                for k in range(1, group_count + 1)
+                for pos, uid in enumerate(member_ids(k))
+            ),
+        )
+        counts["group_buddy_pairs"] = _bulk_insert(
+            conn,
+            "group_buddy_pairs",
+            ("group_id", "user_id", "buddy_user_id", "created_at"),
+            (
+                row
+                for k in range(1, group_count + 1)
+                if len(member_ids(k)) >= 3
+                for row in ((k, member_ids(k)[1], member_ids(k)[2], _ts(now, days_ago=7)), (k, member_ids(k)[2], member_ids(k)[1], _ts(now, days_ago=7)))
+            ),
+        )
+        counts["guardian_links"] = _bulk_insert(
+            conn,
+            "guardian_links",
+            ("id", "group_id", "label", "token", "receive_alerts", "is_active", "created_at"),
+            ((k, k, "Parent", f"guardian-{k}", 1, 1, _ts(now, days_ago=30)) for k in range(1, group_count + 1)),
+        )
+
+        def alert_rows() -> Iterator[tuple]:
+            for _ in range(pop.alerts):
+                k = rng.randint(1, group_count)
+                members = member_ids(k)
+                sender = members[rng.randrange(len(members))]
+                yield (k, sender, None, rng.choice(ALERT_TYPES), "Benchmark alert", _ts(now, days_ago=rng.uniform(0.0, 60.0)))
+
+        counts["group_alerts"] = _bulk_insert(
+            conn,
+            "group_alerts",
+            ("group_id", "from_user_id", "target_user_id", "alert_type", "message", "created_at"),
+            alert_rows(),
+        )
+
+        # Every 20th user (the probe user included) has an open auto session; the rest is closed
+        # history, the first few of it the probe user's so their history lookups return rows.
+        active_users = list(range(1, n_users + 1, 20))
+        owners: list[tuple[int, float]] = []
+
+        def session_rows() -> Iterator[tuple]:
+            for uid in active_users:
+                payload_json, summary = templates[len(owners) % len(templates)]
+                owners.append((uid, 0.1))
+                started = _ts(now, days_ago=0.1)
+                yield (len(owners), uid, "Auto session", payload_json, 1, 1, started, started, started, None, started, *summary, started[:10])
+            for k in range(pop.sessions - len(active_users)):
+                uid = 1 if k < PROBE_HISTORY else rng.randint(1, n_users)
+                days = rng.uniform(0.5, 365.0)
+                payload_json, summary = templates[len(owners) % len(templates)]
+                owners.append((uid, days))
+                started, ended = _ts(now, days_ago=days), _ts(now, days_ago=days - 0.2)
+                yield (len(owners), uid, f"Night {len(owners)}", payload_json, int(k % 3 == 0), 0, started, ended, ended, ended, started, *summary, started[:10])
+
+        counts["saved_sessions"] = _bulk_insert(
+            conn,
+            "saved_sessions",
+            (
+                "id",
+                "user_id",
+                "name",
+                "payload_json",
+                "is_auto",
+                "is_active",
+                "started_at",
+                "last_event_at",
+                "updated_at",
+                "ended_at",
+                "created_at",
+                *auth_store.SESSION_SUMMARY_COLUMNS,
+                "session_date",
+            ),
+            session_rows(),
+        )
+        epoch = now.timestamp()
+
+        def event_rows() -> Iterator[tuple]:
+            for index in range(min(len(owners), pop.events // EVENTS_PER_SESSION)):
+                uid, days = owners[index]
+                start = int(epoch - days * 86400)
+                logged = _ts(now, days_ago=days)
+                for n in range(EVENTS_PER_SESSION):
+                    yield (index + 1, uid, "drink", None, start + n * 1800, 14.0, 150, 10.0, 4.0, logged)
+
+        counts["session_events"] = _bulk_insert(
+            conn,
+            "session_events",
+            ("session_id", "user_id", "kind", "ref_event_id", "event_at_epoch", "grams", "calories", "carbs_g", "sugar_g", "logged_at"),
+            event_rows(),
+        )
+        if conn.is_postgres:
+            for table in PG_ID_TABLES:
+                conn.execute(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), GREATEST((SELECT MAX(id) FROM {table}), 1))")
+        conn.commit()
+
+    with auth_store._connect(feedback_db) as conn:
+        counts["feedback"] = _bulk_insert(
+            conn,
+            "feedback",
+            ("message", "rating", "contact", "context_json", "user_agent", "created_at"),
+            (("Benchmark feedback", rng.randint(1, 5), None, "{}", "bench", _ts(now, days_ago=rng.uniform(0.0, 120.0))) for _ in range(pop.feedback)),
+        )
+        if conn.is_postgres:
+            conn.execute("SELECT setval(pg_get_serial_sequence('feedback', 'id'), GREATEST((SELECT MAX(id) FROM feedback), 1))")
+        conn.commit()
+    return counts
+
+
+@dataclass
+class BenchContext:
+    """Ids of a typical user and their group in the seeded population, plus scratch-row helpers."""
+
+    db: str
+    feedback_db: str
+    pop: Population
+    user_id: int = 1
+    friend_id: int = 2
+    member_id: int = 2
+    group_id: int = 1
+    group_invite: str = "G000000001"
+    guardian_token: str = "guardian-1"
+    guardian_link_id: int = 1
+    active_session_id: int = 1
+    session_ids: list[int] = field(default_factory=list)
+    _fresh: int = 0
+
+    @property
+    def email(self) -> str:
+        return f"user{self.user_id}@bench.example"
+
+    @property
+    def username(self) -> str:
+        return f"user{self.user_id}"
+
+    def load(self) -> None:
+        with auth_store._connect(self.db) as conn:
+            rows = conn.execute(
+                "SELECT id FROM saved_sessions WHERE user_id = ? AND COALESCE(is_active, 0) = 0 ORDER BY id DESC LIMIT 5",
+                (self.user_id,),
+            ).fetchall()
+        self.session_ids = [int(r[0]) for r in rows]
+
+    def fresh_user(self) -> int:
+        self._fresh += 1
+        with auth_store._connect(self.db) as conn:
+            user_id = auth_store._insert_and_get_id(
+                conn,
+                "INSERT INTO users (email, password_hash, display_name, username, invite_code, is_male, default_weight_lb) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (f"fresh{self._fresh}-{time.time_ns()}@bench.example", "x", "Fresh", f"fresh{self._fresh}_{time.time_ns() % 10**9}", f"F{time.time_ns()}", 1, 170),
+            )
+            conn.commit()
+        return user_id
+
+    def fresh_member(self) -> int:
+        user_id = self.fresh_user()
+        auth_store.join_group_by_code(self.db, user_id=user_id, invite_code=self.group_invite)
+        return user_id
+
+
+def _payload() -> dict[str, Any]:
+    return {"weight_lb": 170, "is_male": True, "events": [[-1.5, 14.0, 150, 10.0, 4.0], [-0.5, 14.0, 150, 10.0, 4.0]], "saved_at_epoch": int(time.time())}
+
+
+def _event(offset_sec: int = 0) -> tuple[int, float, int, float, float]:
+    return (int(time.time()) - offset_sec, 14.0, 150, 10.0, 4.0)
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+@dataclass
+class Case:
+    name: str
+    call: Callable[..., Any]
+    setup: Callable[[BenchContext], dict[str, Any]] | None = None
+
+
+def build_cases() -> list[Case]:
+    a, f = auth_store, feedback_store
+
+    def clear_caches(c: BenchContext) -> dict[str, Any]:
+        a.clear_snapshot_cache(c.db)
+        return {}
+
+    def clear_alerts(c: BenchContext) -> dict[str, Any]:
+        a.clear_alert_cooldowns(c.db)
+        return {}
+
+    def friend_request(c: BenchContext) -> dict[str, Any]:
+        sender = c.fresh_user()
+        a.send_friend_request(c.db, from_user_id=sender, to_user_id=c.user_id)
+        with a._connect(c.db) as conn:
+            row = conn.execute("SELECT id FROM friend_requests WHERE from_user_id = ? AND to_user_id = ?", (sender, c.user_id)).fetchone()
+        return {"request_id": int(row[0])}
+
+    def guardian_link(c: BenchContext) -> dict[str, Any]:
+        return {"link_id": a.create_guardian_link(c.db, group_id=c.group_id, label="Scratch")["id"]}
+
+    def pending_presence(c: BenchContext) -> dict[str, Any]:
+        a.record_presence(c.db, user_id=c.user_id, bac_now=0.01 * (time.time() % 10), drink_count=3)
+        return {}
+
+    def active_session(c: BenchContext) -> dict[str, Any]:
+        user_id = c.fresh_user()
+        a.upsert_auto_session(c.db, user_id=user_id, name="Auto", payload=_payload(), event_time_iso=_now_iso(), touch_last_event=True)
+        return {"user_id": user_id}
+
+    return [
+        Case("auth_store.acquire_maintenance_lock", lambda c: a.acquire_maintenance_lock(c.db, name="bench", owner="bench", ttl_sec=1)),
+        Case("auth_store.add_emergency_contact", lambda c: a.add_emergency_contact(c.db, user_id=c.user_id, name="Mom", phone="5550100")),
+        Case("auth_store.add_friendship", lambda c, user_id: a.add_friendship(c.db, user_a=user_id, user_b=c.user_id), lambda c: {"user_id": c.fresh_user()}),
+        Case(
+            "auth_store.apply_session_event_changes",
+            lambda c: a.apply_session_event_changes(
+                c.db, user_id=c.user_id, session_id=c.active_session_id, removed=[], added=[_event()], logged_at_iso=_now_iso()
+            ),
+        ),
+        Case("auth_store.are_friends", lambda c: a.are_friends(c.db, user_a=c.user_id, user_b=c.friend_id)),
+        Case("auth_store.authenticate_user", lambda c: a.authenticate_user(c.db, email=c.email, password=PASSWORD)),
+        Case("auth_store.backfill_session_summaries", lambda c: a.backfill_session_summaries(c.db)),
+        Case("auth_store.clear_alert_cooldowns", lambda c: a.clear_alert_cooldowns(c.db)),
+        Case("auth_store.clear_group_buddy_pair", lambda c: a.clear_group_buddy_pair(c.db, group_id=c.group_id, user_id=c.user_id)),
+        Case("auth_store.clear_snapshot_cache", lambda c: a.clear_snapshot_cache(c.db)),
+        Case("auth_store.compact_closed_session_events", lambda c: a.compact_closed_session_events(c.db, older_than_days=30, max_rows=500)),
+        Case(
+            "auth_store.consume_password_reset_token",
+            lambda c, token: a.consume_password_reset_token(c.db, token=token, new_password=PASSWORD),
+            lambda c: {"token": a.create_password_reset_token(c.db, email=c.email)},
+        ),
+        Case("auth_store.create_email_verification_token", lambda c: a.create_email_verification_token(c.db, user_id=c.user_id)),
+        Case("auth_store.create_group", lambda c, user_id: a.create_group(c.db, owner_user_id=user_id, name="Scratch"), lambda c: {"user_id": c.fresh_user()}),
+        Case(
+            "auth_store.create_group_alert",
+            lambda c: a.create_group_alert(c.db, group_id=c.group_id, alert_type="check", message="Check in", from_user_id=c.user_id),
+        ),
+        Case("auth_store.create_guardian_link", lambda c: a.create_guardian_link(c.db, group_id=c.group_id, label="Scratch")),
+        Case("auth_store.create_password_reset_token", lambda c: a.create_password_reset_token(c.db, email=c.email)),
+        Case(
+            "auth_store.create_user",
+            lambda c: a.create_user(
+                c.db,
+                email=f"new-{time.time_ns()}@bench.example",
+                password=PASSWORD,
+                display_name="New",
+                username=None,
+                is_male=True,
+                default_weight_lb=170,
+            ),
+        ),
+        Case(
+            "auth_store.delete_emergency_contact",
+            lambda c, contact_id: a.delete_emergency_contact(c.db, user_id=c.user_id, contact_id=contact_id),
+            lambda c: {"contact_id": a.add_emergency_contact(c.db, user_id=c.user_id, name="Tmp", phone="5550101")["id"]},
+        ),
+        Case("auth_store.delete_expired_tokens", lambda c: a.delete_expired_tokens(c.db, max_rows=500)),
+        Case("auth_store.delete_user_account", lambda c, user_id: a.delete_user_account(c.db, user_id=user_id), lambda c: {"user_id": c.fresh_member()}),
+        Case(
+            "auth_store.finalize_abandoned_auto_sessions",
+            lambda c: a.finalize_abandoned_auto_sessions(c.db, inactive_hours=6, max_active_hours=18),
+        ),
+        Case("auth_store.finalize_active_auto_session", lambda c, user_id: a.finalize_active_auto_session(c.db, user_id=user_id), active_session),
+        Case("auth_store.find_user_by_email", lambda c: a.find_user_by_email(c.db, email=c.email)),
+        Case("auth_store.find_user_by_invite_code", lambda c: a.find_user_by_invite_code(c.db, invite_code=f"U{c.user_id:09d}")),
+        Case("auth_store.find_user_by_username", lambda c: a.find_user_by_username(c.db, username=c.username)),
+        Case(
+            "auth_store.flush_presence",
+            lambda c: a.flush_presence(c.db),
+            pending_presence,
+        ),
+        Case("auth_store.get_active_auto_session", lambda c: a.get_active_auto_session(c.db, user_id=c.user_id)),
+        Case("auth_store.get_group_role", lambda c: a.get_group_role(c.db, group_id=c.group_id, user_id=c.user_id)),
+        Case("auth_store.get_group_snapshot", lambda c: a.get_group_snapshot(c.db, group_id=c.group_id, user_id=c.user_id), clear_caches),
+        Case(
+            "auth_store.get_group_snapshot_by_guardian_token",
+            lambda c: a.get_group_snapshot_by_guardian_token(c.db, token=c.guardian_token),
+            clear_caches,
+        ),
+        Case("auth_store.get_privacy_summary", lambda c: a.get_privacy_summary(c.db, user_id=c.user_id)),
+        Case("auth_store.get_schema_version", lambda c: a.get_schema_version(c.db)),
+        Case("auth_store.get_session_payloads", lambda c: a.get_session_payloads(c.db, user_id=c.user_id, session_ids=c.session_ids)),
+        Case("auth_store.get_share_with_friends", lambda c: a.get_share_with_friends(c.db, user_id=c.user_id)),
+        Case("auth_store.get_user_by_id", lambda c: a.get_user_by_id(c.db, c.user_id)),
+        Case(
+            "auth_store.get_user_session_payload",
+            lambda c: a.get_user_session_payload(c.db, user_id=c.user_id, session_id=c.session_ids[0] if c.session_ids else 0),
+        ),
+        Case("auth_store.init_db", lambda c: a.init_db(c.db)),
+        Case("auth_store.invalidate_group_snapshot", lambda c: a.invalidate_group_snapshot(c.db, group_id=c.group_id)),
+        Case("auth_store.is_group_member", lambda c: a.is_group_member(c.db, group_id=c.group_id, user_id=c.user_id)),
+        Case(
+            "auth_store.join_group_by_code",
+            lambda c, user_id: a.join_group_by_code(c.db, user_id=user_id, invite_code=c.group_invite),
+            lambda c: {"user_id": c.fresh_user()},
+        ),
+        Case("auth_store.list_account_rows", lambda c: a.list_account_rows(c.db, user_id=c.user_id, dataset="sessions")),
+        Case("auth_store.list_emergency_contacts", lambda c: a.list_emergency_contacts(c.db, user_id=c.user_id)),
+        Case("auth_store.list_favorite_drinks", lambda c: a.list_favorite_drinks(c.db, user_id=c.user_id)),
+        Case("auth_store.list_friend_feed", lambda c: a.list_friend_feed(c.db, user_id=c.user_id)),
+        Case("auth_store.list_friends", lambda c: a.list_friends(c.db, user_id=c.user_id)),
+        Case("auth_store.list_guardian_links", lambda c: a.list_guardian_links(c.db, group_id=c.group_id)),
+        Case("auth_store.list_incoming_friend_requests", lambda c: a.list_incoming_friend_requests(c.db, user_id=c.user_id)),
+        Case("auth_store.list_recent_session_payloads", lambda c: a.list_recent_session_payloads(c.db, user_id=c.user_id), clear_caches),
+        Case("auth_store.list_session_dates", lambda c: a.list_session_dates(c.db, user_id=c.user_id)),
+        Case("auth_store.list_session_events", lambda c: a.list_session_events(c.db, user_id=c.user_id, session_id=c.active_session_id)),
+        Case("auth_store.list_user_groups", lambda c: a.list_user_groups(c.db, user_id=c.user_id)),
+        Case("auth_store.list_user_sessions", lambda c: a.list_user_sessions(c.db, user_id=c.user_id)),
+        Case("auth_store.local_session_date", lambda c: a.local_session_date()),
+        Case("auth_store.maybe_create_threshold_alert", lambda c: a.maybe_create_threshold_alert(c.db, user_id=c.user_id, bac_now=0.1), clear_alerts),
+        Case("auth_store.normalize_presence_cursor", lambda c: a.normalize_presence_cursor("2026-01-01T00:00:00+00:00")),
+        Case("auth_store.presence_cursor_now", lambda c: a.presence_cursor_now()),
+        Case("auth_store.prune_group_alerts", lambda c: a.prune_group_alerts(c.db, older_than_days=30, max_rows=500)),
+        Case("auth_store.prune_stale_presence", lambda c: a.prune_stale_presence(c.db, older_than_hours=48, max_rows=500)),
+        Case("auth_store.purge_deleted_users", lambda c: a.purge_deleted_users(c.db, max_users=5)),
+        Case("auth_store.record_presence", lambda c: a.record_presence(c.db, user_id=c.user_id, bac_now=0.01 * (time.time() % 10), drink_count=3)),
+        Case("auth_store.release_maintenance_lock", lambda c: a.release_maintenance_lock(c.db, name="bench", owner="bench")),
+        Case(
+            "auth_store.reset_session_events",
+            lambda c, user_id: a.reset_session_events(
+                c.db, user_id=user_id, session_id=a.get_active_auto_session(c.db, user_id=user_id)["id"], events=[_event(1800), _event()], logged_at_iso=_now_iso()
+            ),
+            active_session,
+        ),
+        Case(
+            "auth_store.respond_friend_request",
+            lambda c, request_id: a.respond_friend_request(c.db, user_id=c.user_id, request_id=request_id, accept=True),
+            friend_request,
+        ),
+        Case("auth_store.revoke_all_sharing_for_user", lambda c, user_id: a.revoke_all_sharing_for_user(c.db, user_id=user_id), lambda c: {"user_id": c.fresh_member()}),
+        Case("auth_store.revoke_guardian_link", lambda c, link_id: a.revoke_guardian_link(c.db, group_id=c.group_id, link_id=link_id), guardian_link),
+        Case("auth_store.save_user_session", lambda c: a.save_user_session(c.db, user_id=c.user_id, name="Saved", payload=_payload())),
+        Case(
+            "auth_store.save_user_sessions_many",
+            lambda c, user_id: a.save_user_sessions_many(
+                c.db,
+                user_id=user_id,
+                sessions=[
+                    {"name": f"Import {i}", "payload": _payload(), "started_at": "2025-01-01 22:00:00", "ended_at": "2025-01-02 02:00:00", "created_at": "2025-01-01 22:00:00", "session_date": "2025-01-01"}
+                    for i in range(50)
+                ],
+            ),
+            lambda c: {"user_id": c.fresh_user()},
+        ),
+        Case(
+            "auth_store.send_friend_request",
+            lambda c, user_id: a.send_friend_request(c.db, from_user_id=user_id, to_user_id=c.user_id),
+            lambda c: {"user_id": c.fresh_user()},
+        ),
+        Case("auth_store.session_summary", lambda c: a.session_summary(_payload())),
+        Case("auth_store.set_group_buddy_pair", lambda c: a.set_group_buddy_pair(c.db, group_id=c.group_id, user_a=c.user_id, user_b=c.member_id)),
+        Case("auth_store.set_group_member_role", lambda c: a.set_group_member_role(c.db, group_id=c.group_id, target_user_id=c.member_id, role="member")),
+        Case("auth_store.set_group_share_enabled", lambda c: a.set_group_share_enabled(c.db, group_id=c.group_id, user_id=c.user_id, enabled=True)),
+        Case("auth_store.set_guardian_link_alerts", lambda c: a.set_guardian_link_alerts(c.db, group_id=c.group_id, link_id=c.guardian_link_id, enabled=True)),
+        Case("auth_store.set_share_with_friends", lambda c: a.set_share_with_friends(c.db, user_id=c.user_id, enabled=True)),
+        Case("auth_store.track_favorite_drink", lambda c: a.track_favorite_drink(c.db, user_id=c.user_id, catalog_id="bud-light")),
+        Case(
+            "auth_store.update_user_profile",
+            lambda c: a.update_user_profile(c.db, user_id=c.user_id, display_name="User 1", username=c.username, is_male=True, default_weight_lb=170),
+        ),
+        Case(
+            "auth_store.upsert_auto_session",
+            lambda c: a.upsert_auto_session(c.db, user_id=c.user_id, name="Auto session", payload=_payload(), event_time_iso=_now_iso(), touch_last_event=True),
+        ),
+        Case("auth_store.upsert_presence", lambda c: a.upsert_presence(c.db, user_id=c.user_id, bac_now=0.04, drink_count=2)),
+        Case(
+            "auth_store.upsert_presence_many",
+            lambda c: a.upsert_presence_many(
+                c.db,
+                [{"user_id": uid, "bac_now": 0.03, "drink_count": 1, "location_note": None, "bac_model": None, "updated_at": a.presence_cursor_now()} for uid in range(1, 51)],
+            ),
+        ),
+        Case(
+            "auth_store.verify_email_token",
+            lambda c, token: a.verify_email_token(c.db, token=token),
+            lambda c: {"token": a.create_email_verification_token(c.db, user_id=c.user_id)},
+        ),
+        Case("auth_store.verify_user_password", lambda c: a.verify_user_password(c.db, user_id=c.user_id, password=PASSWORD)),
+        Case("feedback_store.init_db", lambda c: f.init_db(c.feedback_db)),
+        Case("feedback_store.list_recent", lambda c: f.list_recent(c.feedback_db)),
+        Case("feedback_store.prune_feedback", lambda c: f.prune_feedback(c.feedback_db, older_than_days=90, max_rows=500)),
+        Case("feedback_store.save_feedback", lambda c: f.save_feedback(c.feedback_db, message="Benchmark", rating=4, context={"page": "bench"})),
+    ]
+
+
+def uncovered(cases: list[Case]) -> list[str]:
+    """Public storage functions with neither a case nor a skip reason."""
+    names = {case.name for case in cases} | set(SKIPPED)
+    missing = []
+    for module in (auth_store, feedback_store):
+        prefix = module.__name__.rsplit(".", 1)[-1]
+        for name, fn in inspect.getmembers(module, inspect.isfunction):
+            if not name.startswith("_") and fn.__module__ == module.__name__ and f"{prefix}.{name}" not in names:
+                missing.append(f"{prefix}.{name}")
+    return missing
+
+
+def time_case(ctx: BenchContext, case: Case, *, repeat: int) -> dict[str, Any]:
+    samples: list[float] = []
+    queries: list[int] = []
+    connections: list[int] = []
+    rows: list[int] = []
+    for _ in range(max(1, repeat)):
+        kwargs = case.setup(ctx) if case.setup else {}
+        with querytrace.capture(case.name) as trace:
+            started = time.perf_counter()
+            case.call(ctx, **(kwargs or {}))
+            samples.append((time.perf_counter() - started) * 1000.0)
+        queries.append(trace.query_count)
+        connections.append(trace.connections)
+        rows.append(trace.rows)
+    samples.sort()
+    return {
+        "median_ms": round(statistics.median(samples), 3),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3),
+        "queries": int(statistics.median(queries)),
+        "connections": int(statistics.median(connections)),
+        "rows": int(statistics.median(rows)),
+    }
+
+
+def _reset_postgres(db_path: str) -> None:
+    with auth_store._connect(db_path) as conn:
+        conn.execute("TRUNCATE " + ", ".join(PG_TABLES) + " RESTART IDENTITY CASCADE")
+        conn.execute("TRUNCATE feedback RESTART IDENTITY")
+        conn.commit()
+
+
+def run_scale(scale: int, *, workdir: str, database_url: str | None, only: list[str] | None, repeat: int) -> dict[str, Any]:
+    pop = Population.for_scale(scale)
+    if database_url:
+        db_path = feedback_db = database_url
+        auth_store.init_db(db_path)
+        feedback_store.init_db(feedback_db)
+        _reset_postgres(db_path)
+    else:
+        db_path = os.path.join(workdir, f"app-{scale}.db")
+        feedback_db = os.path.join(workdir, f"feedback-{scale}.db")
+        auth_store.init_db(db_path)
+        feedback_store.init_db(feedback_db)
+    auth_store.clear_snapshot_cache(db_path)
+    auth_store.clear_alert_cooldowns(db_path)
+
+    started = time.perf_counter()
+    counts = seed(db_path, feedback_db, pop)
+    seed_sec = time.perf_counter() - started
+    print(f"scale {scale}: seeded {sum(counts.values())} rows in {seed_sec:.1f}s ({pop.users} users, {counts['social_groups']} groups)")
+
+    ctx = BenchContext(db=db_path, feedback_db=feedback_db, pop=pop)
+    ctx.load()
+    results: dict[str, Any] = {}
+    for case in build_cases():
+        if only and not any(pattern in case.name for pattern in only):
+            continue
+        results[case.name] = time_case(ctx, case, repeat=repeat)
+    return {"population": pop.__dict__, "rows": counts, "seed_sec": round(seed_sec, 1), "results": results}
+
+
+def growth_table(report: dict[str, Any], *, flag_ratio: float) -> list[dict[str, Any]]:
+    """Median latency at each scale, and the ratio between the largest and smallest."""
+    scales = sorted(report["scales"], key=int)
+    names = sorted({name for s in scales for name in report["scales"][s]["results"]})
+    table = []
+    for name in names:
+        cells = [report["scales"][s]["results"].get(name) for s in scales]
+        first, last = cells[0], cells[-1]
+        ratio = None
+        if first and last and first["median_ms"] > 0:
+            ratio = round(last["median_ms"] / first["median_ms"], 2)
+        table.append({"function": name, "cells": cells, "growth": ratio, "flagged": ratio is not None and ratio >= flag_ratio})
+    return table
+
+
+def _print_table(report: dict[str, Any], table: list[dict[str, Any]]) -> None:
+    scales = sorted(report["scales"], key=int)
+    header = f"{'function':<52}" + "".join(f"{'n=' + s:>20}" for s in scales) + f"{'growth':>9}"
+    print("\n" + header)
+    print("-" * len(header))
+    for row in table:
+        cells = "".join(
+            f"{cell['median_ms']:>11.2f}ms q={cell['queries']:<3}" if cell else f"{'-':>20}" for cell in row["cells"]
+        )
+        growth = f"{row['growth']:>7.1f}x" if row["growth"] is not None else f"{'-':>8}"
+        print(f"{row['function']:<52}{cells}{growth}{'  <-- scales with table size' if row['flagged'] else ''}")
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Time storage functions against synthetic populations of growing size.")
+    parser.add_argument("--scales", default=",".join(str(s) for s in DEFAULT_SCALES), help=f"Comma-separated row counts (e.g. {','.join(str(s) for s in SCALES)}).")
+    parser.add_argument("--only", action="append", help="Only time functions whose name contains this (repeatable).")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="Timed calls per function and scale.")
+    parser.add_argument("--flag-growth", type=float, default=DEFAULT_GROWTH_FLAG, help="Flag functions this many times slower at the largest scale.")
+    parser.add_argument("--database-url", help="Benchmark a local Postgres database instead of SQLite files.")
+    parser.add_argument("--reset", action="store_true", help="Allow truncating every app table in --database-url.")
+    parser.add_argument("--keep-dir", help="Keep the seeded SQLite files in this directory.")
+    parser.add_argument("--out", help="Write the full report as JSON.")
+    args = parser.parse_args(argv)
+    if args.database_url and not args.reset:
+        parser.error("--database-url truncates the app tables before seeding; pass --reset to confirm")
+
+    missing = uncovered(build_cases())
+    if missing:
+        print("Not benchmarked (add a case): " + ", ".join(missing))
+    for name, reason in SKIPPED.items():
+        print(f"Skipping {name}: {reason}")
+
+    workdir = args.keep_dir or tempfile.mkdtemp(prefix="bac-storage-bench-")
+    os.makedirs(workdir, exist_ok=True)
+    report: dict[str, Any] = {
+        "meta": {"created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()), "backend": "postgres" if args.database_url else "sqlite", "repeat": args.repeat},
+        "scales": {},
+    }
+    try:
+        for scale in (int(s) for s in args.scales.split(",") if s.strip()):
+            report["scales"][str(scale)] = run_scale(scale, workdir=workdir, database_url=args.database_url, only=args.only, repeat=args.repeat)
+    finally:
+        if not args.keep_dir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    table = growth_table(report, flag_ratio=args.flag_growth)
+    _print_table(report, table)
+    report["growth"] = {row["function"]: row["growth"] for row in table}
+    if args.out:
+        Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.out).write_text(json.dumps(report, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
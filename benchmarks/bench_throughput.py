@@ -0,0 +1,210 @@
+"""Population-scale throughput of the BAC engine on synthetic sessions.
+
+Sessions from `bac_app.synthetic` are pushed through the work `/api/state` does
+per drinker: build a `Session`, chart its `bac_curve`, compute `time_to_sober`
+and a `hangover.get_plan`. The same index range is processed single-threaded,
+on a thread pool and on a process pool; each worker generates its own slice of
+the seeded stream, so nothing but (start, count) crosses a process boundary.
+
+Memory per session is measured separately with `tracemalloc`, over a sample
+that keeps every built `Session` and its curve alive, so it reflects what a
+worker holding that many sessions would retain.
+
+Usage:
+    python -m benchmarks.bench_throughput --sessions 100000
+    python -m benchmarks.bench_throughput --sessions 1000000 --modes processes --workers 8 --out throughput.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import os
+import platform
+import resource
+import sys
+import time
+import tracemalloc
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from bac_app import calculations, hangover, synthetic  # noqa: E402
+from bac_app.session import Session  # noqa: E402
+
+MODES = ("single", "threads", "processes")
+DEFAULT_SESSIONS = 20_000
+DEFAULT_CHUNK = 2_000
+DEFAULT_MEMORY_SAMPLE = 2_000
+DEFAULT_SEED = 1337
+CURVE_STEP_HOURS = 0.25
+STAGES = ("generate", "session", "bac_curve", "time_to_sober", "get_plan")
+
+
+def _curve(model: Session, events: list[tuple[float, float]]) -> list[tuple[float, float]]:
+    # Charted from half an hour before the first drink, as /api/state does.
+    start_h = min(t for t, _ in events) - 0.5
+    return calculations.bac_curve(events, model.weight_lb, model.is_male, step_hours=CURVE_STEP_HOURS, start_hours=start_h, max_hours=24.0)
+
+
+def process_range(start: int, count: int, seed: int, timed: bool = False) -> dict[str, Any]:
+    """Run `count` sessions from `start` through the engine; optionally time each stage."""
+    clock = time.perf_counter
+    stage_sec = dict.fromkeys(STAGES, 0.0)
+    drinks = 0
+    checksum = 0.0
+    for index in range(start, start + count):
+        t0 = clock()
+        spec = synthetic.session_at(index, seed=seed)
+        t1 = clock()
+        model = spec.to_session()
+        events = model.events
+        t2 = clock()
+        curve = _curve(model, events)
+        t3 = clock()
+        sober = calculations.time_to_sober(events, model.weight_lb, model.is_male)
+        t4 = clock()
+        plan = hangover.get_plan(events, model.weight_lb, model.is_male, spec.hours_until_target)
+        t5 = clock()
+        drinks += len(events)
+        checksum += len(curve) + sober + plan["peak_bac"]
+        if timed:
+            stage_sec["generate"] += t1 - t0
+            stage_sec["session"] += t2 - t1
+            stage_sec["bac_curve"] += t3 - t2
+            stage_sec["time_to_sober"] += t4 - t3
+            stage_sec["get_plan"] += t5 - t4
+    return {"sessions": count, "drinks": drinks, "checksum": checksum, "stage_sec": stage_sec}
+
+
+def _chunks(total: int, size: int) -> list[tuple[int, int]]:
+    return [(start, min(size, total - start)) for start in range(0, total, size)]
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux and bytes on macOS.
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return round(max(peak, children) / scale, 1)
+
+
+def run_mode(mode: str, *, sessions: int, chunk: int, workers: int, seed: int) -> dict[str, Any]:
+    chunks = _chunks(sessions, chunk)
+    started = time.perf_counter()
+    if mode == "single":
+        parts = [process_range(start, count, seed, True) for start, count in chunks]
+    else:
+        pool: Executor = ThreadPoolExecutor(workers) if mode == "threads" else ProcessPoolExecutor(workers)
+        with pool:
+            futures = [pool.submit(process_range, start, count, seed) for start, count in chunks]
+            parts = [future.result() for future in futures]
+    elapsed = time.perf_counter() - started
+    done = sum(p["sessions"] for p in parts)
+    result: dict[str, Any] = {
+        "mode": mode,
+        "workers": 1 if mode == "single" else workers,
+        "sessions": done,
+        "drinks": sum(p["drinks"] for p in parts),
+        "seconds": round(elapsed, 3),
+        "sessions_per_sec": round(done / elapsed, 1) if elapsed > 0 else None,
+        "checksum": round(sum(p["checksum"] for p in parts), 3),
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+    if mode == "single":
+        stage_sec = {name: sum(p["stage_sec"][name] for p in parts) for name in STAGES}
+        result["stage_us_per_session"] = {name: round(sec / done * 1e6, 2) for name, sec in stage_sec.items()}
+    return result
+
+
+def memory_per_session(sample: int, *, seed: int) -> dict[str, Any]:
+    """Bytes retained per session (spec, Session, curve and plan kept alive) and peak while building."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        kept = []
+        for spec in synthetic.generate(sample, seed=seed):
+            model = spec.to_session()
+            events = model.events
+            curve = _curve(model, events)
+            plan = hangover.get_plan(events, model.weight_lb, model.is_male, spec.hours_until_target)
+            kept.append((spec, model, curve, plan))
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del kept
+    return {
+        "sample": sample,
+        "bytes_per_session": round((current - before) / max(1, sample)),
+        "peak_bytes_per_session": round((peak - before) / max(1, sample)),
+    }
+
+
+def _print_report(report: dict[str, Any]) -> None:
+    print(f"\n{'mode':<10}{'workers':>8}{'sessions':>11}{'seconds':>10}{'sessions/s':>13}{'peak RSS':>11}")
+    for row in report["modes"]:
+        print(
+            f"{row['mode']:<10}{row['workers']:>8}{row['sessions']:>11}{row['seconds']:>10.2f}"
+            f"{row['sessions_per_sec']:>13.0f}{row['peak_rss_mb']:>8.1f} MB"
+        )
+    single = next((row for row in report["modes"] if row["mode"] == "single"), None)
+    if single:
+        stages = ", ".join(f"{name} {us:.1f}" for name, us in single["stage_us_per_session"].items())
+        print(f"\nsingle-thread us/session: {stages}")
+    memory = report.get("memory")
+    if memory:
+        print(
+            f"memory: {memory['bytes_per_session'] / 1024:.1f} KiB retained per session, "
+            f"{memory['peak_bytes_per_session'] / 1024:.1f} KiB peak ({memory['sample']} sampled)"
+        )
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Measure BAC engine throughput on synthetic sessions.")
+    parser.add_argument("--sessions", type=int, default=DEFAULT_SESSIONS, help="Sessions per mode.")
+    parser.add_argument("--modes", default=",".join(MODES), help=f"Comma-separated subset of {', '.join(MODES)}.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="Pool size for threads and processes.")
+    parser.add_argument("--chunk", type=int, default=DEFAULT_CHUNK, help="Sessions per submitted task.")
+    parser.add_argument("--memory-sample", type=int, default=DEFAULT_MEMORY_SAMPLE, help="Sessions kept alive for the memory measurement (0 skips it).")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--out", help="Write the report as JSON.")
+    args = parser.parse_args(argv)
+
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+    unknown = [m for m in modes if m not in MODES]
+    if unknown:
+        parser.error(f"unknown mode(s): {', '.join(unknown)}")
+
+    report: dict[str, Any] = {
+        "meta": {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "seed": args.seed,
+            "chunk": args.chunk,
+        },
+        "modes": [],
+    }
+    for mode in modes:
+        row = run_mode(mode, sessions=args.sessions, chunk=max(1, args.chunk), workers=max(1, args.workers), seed=args.seed)
+        print(f"{mode}: {row['sessions_per_sec']:.0f} sessions/s")
+        report["modes"].append(row)
+    if args.memory_sample > 0:
+        report["memory"] = memory_per_session(args.memory_sample, seed=args.seed)
+
+    _print_report(report)
+    if args.out:
+        Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.out).write_text(json.dumps(report, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
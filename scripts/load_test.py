@@ -0,0 +1,488 @@
+"""Load test for BAC Tracker Web.
+
+Simulates many virtual users against a local (or already running) instance.
+Each user registers, sets a profile, joins a group, then for the rest of the
+run logs drinks at random intervals and polls `/api/state` and its group
+snapshot the way the web client does. One user per group creates it and a
+guardian link, and that link is polled like a parent watching the page.
+
+Users are scheduled, not threaded: `--users` controls how many people exist,
+`--concurrency` how many requests are in flight at once. Without `--base-url`
+the app is started on a free port against a throwaway SQLite file (or
+`--database-url` for a local Postgres), with the per-user write limit lifted
+so the load is not all 429s.
+
+Usage:
+    python scripts/load_test.py --users 2000 --concurrency 50 --duration 300
+    python scripts/load_test.py --database-url postgresql://localhost/bac_load --server gunicorn --threads 4
+    python scripts/load_test.py --base-url http://127.0.0.1:5000 --users 200 --json-out load.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import heapq
+import json
+import math
+import os
+import random
+import shutil
+import socket
+import string
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from dataclasses import dataclass, field
+from http.cookiejar import CookieJar
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+CATALOG_IDS = (
+    "bud-light",
+    "coors-light",
+    "modelo-especial",
+    "ipa-typical",
+    "white-claw-5",
+    "high-noon",
+    "red-wine",
+    "white-wine",
+    "champagne",
+    "vodka-cran",
+)
+SERVER_START_TIMEOUT_SEC = 30.0
+REQUEST_TIMEOUT_SEC = 20.0
+
+
+def _json_request(
+    opener: urllib.request.OpenerDirector,
+    method: str,
+    url: str,
+    *,
+    payload: dict | None = None,
+    headers: dict[str, str] | None = None,
+) -> tuple[int, dict]:
+    data = None
+    req_headers = {"Accept": "application/json"}
+    if headers:
+        req_headers.update(headers)
+    if payload is not None:
+        data = json.dumps(payload).encode("utf-8")
+        req_headers["Content-Type"] = "application/json"
+    req = urllib.request.Request(url, data=data, headers=req_headers, method=method.upper())
+    try:
+        with opener.open(req, timeout=REQUEST_TIMEOUT_SEC) as resp:
+            status = int(resp.status)
+            body = resp.read().decode("utf-8")
+    except urllib.error.HTTPError as exc:
+        status = int(exc.code)
+        body = exc.read().decode("utf-8")
+    try:
+        parsed = json.loads(body) if body else {}
+    except json.JSONDecodeError:
+        parsed = {"raw": body}
+    return status, parsed
+
+
+def _percentile(sorted_values: list[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100.0 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+class Stats:
+    """Latency samples and status counts per endpoint template."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.statuses: dict[str, dict[int, int]] = defaultdict(lambda: defaultdict(int))
+
+    def record(self, endpoint: str, status: int, ms: float) -> None:
+        with self._lock:
+            self.latencies[endpoint].append(ms)
+            self.statuses[endpoint][status] += 1
+
+    def report(self, elapsed_sec: float) -> dict:
+        endpoints = {}
+        total = errors = 0
+        with self._lock:
+            for endpoint in sorted(self.latencies):
+                values = sorted(self.latencies[endpoint])
+                statuses = dict(self.statuses[endpoint])
+                failed = sum(n for code, n in statuses.items() if code == 0 or code >= 400)
+                total += len(values)
+                errors += failed
+                endpoints[endpoint] = {
+                    "requests": len(values),
+                    "rps": round(len(values) / elapsed_sec, 2) if elapsed_sec > 0 else 0.0,
+                    "p50_ms": round(_percentile(values, 50), 1),
+                    "p95_ms": round(_percentile(values, 95), 1),
+                    "p99_ms": round(_percentile(values, 99), 1),
+                    "max_ms": round(values[-1], 1) if values else 0.0,
+                    "error_rate": round(failed / len(values), 4) if values else 0.0,
+                    "statuses": {str(code): n for code, n in sorted(statuses.items())},
+                }
+        return {
+            "elapsed_sec": round(elapsed_sec, 1),
+            "requests": total,
+            "rps": round(total / elapsed_sec, 2) if elapsed_sec > 0 else 0.0,
+            "error_rate": round(errors / total, 4) if total else 0.0,
+            "endpoints": endpoints,
+        }
+
+
+@dataclass
+class GroupSlot:
+    """Shared by the members of one group; filled in by the user that creates it."""
+
+    group_id: int | None = None
+    invite_code: str | None = None
+    guardian_token: str | None = None
+    failed: bool = False
+
+
+@dataclass
+class VirtualUser:
+    index: int
+    group: GroupSlot
+    is_leader: bool
+    opener: urllib.request.OpenerDirector = field(
+        default_factory=lambda: urllib.request.build_opener(urllib.request.HTTPCookieProcessor(CookieJar()))
+    )
+    csrf: str = ""
+    stage: str = "bootstrap"
+    next_due: dict[str, float] = field(default_factory=dict)
+
+
+class LoadTest:
+    def __init__(self, base_url: str, args: argparse.Namespace):
+        self.base = base_url.rstrip("/")
+        self.args = args
+        self.stats = Stats()
+        self.rng = random.Random(args.seed)
+        self._rng_lock = threading.Lock()
+        self._queue: list[tuple[float, int, VirtualUser]] = []
+        self._queue_cv = threading.Condition()
+        self._seq = 0
+        self._stop_at = 0.0
+        self._guardian_opener = urllib.request.build_opener()
+
+    def _rand(self) -> float:
+        with self._rng_lock:
+            return self.rng.random()
+
+    def _exp(self, mean_sec: float) -> float:
+        return -mean_sec * math.log(1.0 - self._rand())
+
+    def _jitter(self, interval: float) -> float:
+        return interval * (0.9 + 0.2 * self._rand())
+
+    def _schedule(self, user: VirtualUser, at: float) -> None:
+        with self._queue_cv:
+            self._seq += 1
+            heapq.heappush(self._queue, (at, self._seq, user))
+            self._queue_cv.notify()
+
+    def _next_user(self) -> tuple[float, VirtualUser] | None:
+        with self._queue_cv:
+            while True:
+                now = time.monotonic()
+                if now >= self._stop_at:
+                    return None
+                if self._queue and self._queue[0][0] <= now:
+                    at, _, user = heapq.heappop(self._queue)
+                    return at, user
+                wait = (self._queue[0][0] - now) if self._queue else 1.0
+                self._queue_cv.wait(min(wait, self._stop_at - now, 1.0))
+
+    def _call(
+        self,
+        user: VirtualUser | None,
+        endpoint: str,
+        method: str,
+        path: str,
+        payload: dict | None = None,
+    ) -> tuple[int, dict]:
+        opener = user.opener if user is not None else self._guardian_opener
+        headers = {"X-CSRF-Token": user.csrf} if user is not None and method != "GET" and user.csrf else None
+        started = time.perf_counter()
+        try:
+            status, body = _json_request(opener, method, f"{self.base}{path}", payload=payload, headers=headers)
+        except (OSError, urllib.error.URLError) as exc:
+            status, body = 0, {"error": str(exc)}
+        self.stats.record(f"{method} {endpoint}", status, (time.perf_counter() - started) * 1000.0)
+        if user is not None and isinstance(body, dict) and body.get("csrf_token"):
+            user.csrf = str(body["csrf_token"])
+        return status, body
+
+    def _step(self, user: VirtualUser) -> float | None:
+        """Run the user's next action; return seconds until the one after, or None to retire the user."""
+        if user.stage == "bootstrap":
+            status, _ = self._call(user, "/api/auth/me", "GET", "/api/auth/me")
+            if status != 200:
+                return None
+            user.stage = "register"
+            return 0.0
+        if user.stage == "register":
+            with self._rng_lock:
+                suffix = "".join(self.rng.choices(string.ascii_lowercase + string.digits, k=8))
+            weight = 120 + int(self._rand() * 120)
+            status, _ = self._call(
+                user,
+                "/api/auth/register",
+                "POST",
+                "/api/auth/register",
+                {
+                    "display_name": f"Load {user.index}",
+                    "username": "",
+                    "email": f"load-{user.index}-{suffix}@example.com",
+                    "password": "loadtest123",
+                    "confirm_password": "loadtest123",
+                    "gender": "male" if user.index % 2 else "female",
+                    "default_weight_lb": weight,
+                },
+            )
+            if status != 200:
+                return None
+            status, _ = self._call(user, "/api/setup", "POST", "/api/setup", {"weight_lb": weight, "is_male": bool(user.index % 2)})
+            user.stage = "group"
+            return self._jitter(2.0)
+        if user.stage == "group":
+            if not self._join_group(user):
+                if user.group.failed:
+                    user.stage = "active"
+                    return 0.0
+                return 1.0
+            user.stage = "active"
+            return 0.0
+        return self._active_step(user)
+
+    def _join_group(self, user: VirtualUser) -> bool:
+        slot = user.group
+        if user.is_leader:
+            status, body = self._call(user, "/api/social/groups/create", "POST", "/api/social/groups/create", {"name": f"Load group {user.index}"})
+            group = body.get("group") or {}
+            if status != 200 or not group.get("id"):
+                slot.failed = True
+                return False
+            status, body = self._call(
+                user,
+                "/api/social/groups/<id>/guardian-links",
+                "POST",
+                f"/api/social/groups/{group['id']}/guardian-links",
+                {"label": "Parent", "receive_alerts": True},
+            )
+            slot.guardian_token = (body.get("item") or {}).get("token") if status == 200 else None
+            slot.group_id = int(group["id"])
+            slot.invite_code = str(group.get("invite_code", ""))
+            return True
+        if slot.invite_code is None:
+            return False
+        status, _ = self._call(user, "/api/social/groups/join", "POST", "/api/social/groups/join", {"invite_code": slot.invite_code})
+        return status == 200
+
+    def _active_step(self, user: VirtualUser) -> float:
+        args = self.args
+        now = time.monotonic()
+        due = user.next_due
+        if not due:
+            # Spread each user's first poll over one interval so polls do not arrive in lockstep.
+            due["state"] = now + self._rand() * args.poll_interval
+            due["drink"] = now + self._exp(args.drink_interval)
+            if user.group.group_id is not None:
+                due["group"] = now + self._rand() * args.poll_interval
+            if user.is_leader and user.group.guardian_token:
+                due["guardian"] = now + self._rand() * args.guardian_interval
+            return max(0.0, min(due.values()) - now)
+
+        action = min(due, key=due.get)
+        if action == "state":
+            self._call(user, "/api/state", "GET", "/api/state")
+            due["state"] = now + self._jitter(args.poll_interval)
+        elif action == "drink":
+            catalog_id = CATALOG_IDS[int(self._rand() * len(CATALOG_IDS))]
+            sip = 0 if self._rand() < 0.7 else 15
+            self._call(user, "/api/drink", "POST", "/api/drink", {"catalog_id": catalog_id, "count": 1, "hours_ago": 0, "sip_minutes": sip})
+            due["drink"] = now + self._exp(args.drink_interval)
+        elif action == "group":
+            self._call(user, "/api/social/groups/<id>", "GET", f"/api/social/groups/{user.group.group_id}")
+            due["group"] = now + self._jitter(args.poll_interval)
+        elif action == "guardian":
+            self._call(None, "/api/guardian/<token>", "GET", f"/api/guardian/{user.group.guardian_token}")
+            due["guardian"] = now + self._jitter(args.guardian_interval)
+        return max(0.0, min(due.values()) - time.monotonic())
+
+    def _worker(self) -> None:
+        while True:
+            item = self._next_user()
+            if item is None:
+                return
+            _, user = item
+            try:
+                delay = self._step(user)
+            except Exception as exc:  # keep the worker alive; the failure is already counted by _call where possible
+                self.stats.record(f"EXC {type(exc).__name__}", 0, 0.0)
+                delay = self.args.poll_interval
+            if delay is not None:
+                self._schedule(user, time.monotonic() + delay)
+
+    def _progress(self, started: float) -> None:
+        while time.monotonic() < self._stop_at:
+            time.sleep(min(10.0, max(0.1, self._stop_at - time.monotonic())))
+            report = self.stats.report(time.monotonic() - started)
+            with self._queue_cv:
+                scheduled = len(self._queue)
+            print(f"  t={report['elapsed_sec']:>6.0f}s requests={report['requests']} rps={report['rps']} errors={report['error_rate']:.2%} users={scheduled}")
+
+    def run(self) -> dict:
+        args = self.args
+        started = time.monotonic()
+        self._stop_at = started + args.duration
+        slots: list[GroupSlot] = []
+        for i in range(args.users):
+            if i % args.group_size == 0:
+                slots.append(GroupSlot())
+            user = VirtualUser(index=i, group=slots[-1], is_leader=i % args.group_size == 0)
+            # Ramp users in evenly; leaders of each group arrive first so invite codes exist.
+            self._schedule(user, started + args.ramp_up * i / max(1, args.users))
+        workers = [threading.Thread(target=self._worker, name=f"load-{i}", daemon=True) for i in range(args.concurrency)]
+        for worker in workers:
+            worker.start()
+        if not args.quiet:
+            threading.Thread(target=self._progress, args=(started,), daemon=True).start()
+        for worker in workers:
+            worker.join()
+        return self.stats.report(time.monotonic() - started)
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return int(sock.getsockname()[1])
+
+
+def _wait_ready(base_url: str, proc: subprocess.Popen) -> None:
+    opener = urllib.request.build_opener()
+    deadline = time.monotonic() + SERVER_START_TIMEOUT_SEC
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"server exited with code {proc.returncode}")
+        try:
+            status, _ = _json_request(opener, "GET", f"{base_url}/readyz")
+            if status == 200:
+                return
+        except (OSError, urllib.error.URLError):
+            pass
+        time.sleep(0.25)
+    raise RuntimeError(f"server not ready after {SERVER_START_TIMEOUT_SEC:.0f}s")
+
+
+def start_server(args: argparse.Namespace, workdir: str) -> tuple[subprocess.Popen, str]:
+    port = _free_port()
+    env = dict(os.environ)
+    env.update(
+        {
+            "PORT": str(port),
+            "FEEDBACK_DB_PATH": os.path.join(workdir, "feedback.db"),
+            "WRITE_RATE_LIMIT_WINDOW_SEC": "1",
+            "WRITE_RATE_LIMIT_MAX_REQUESTS": "5000",
+        }
+    )
+    if args.database_url:
+        env["DATABASE_URL"] = args.database_url
+    else:
+        env.pop("DATABASE_URL", None)
+        env["APP_DB_PATH"] = os.path.join(workdir, "app.db")
+
+    server = args.server
+    if server == "auto":
+        server = "gunicorn" if shutil.which("gunicorn") else "flask"
+    if server == "gunicorn":
+        cmd = ["gunicorn", "-w", str(args.workers), "--threads", str(args.threads), "-b", f"127.0.0.1:{port}", "app:app"]
+    else:
+        cmd = [sys.executable, "app.py"]
+    with open(os.path.join(workdir, "server.log"), "wb") as log:
+        proc = subprocess.Popen(cmd, cwd=str(REPO_ROOT), env=env, stdout=log, stderr=subprocess.STDOUT)
+    base_url = f"http://127.0.0.1:{port}"
+    print(f"Started {' '.join(cmd)} on {base_url}")
+    _wait_ready(base_url, proc)
+    return proc, base_url
+
+
+def _print_report(report: dict) -> None:
+    print(
+        f"\n{report['requests']} requests in {report['elapsed_sec']}s: "
+        f"{report['rps']} req/s, error rate {report['error_rate']:.2%}\n"
+    )
+    header = f"{'endpoint':<48} {'count':>7} {'rps':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'errors':>7}"
+    print(header)
+    print("-" * len(header))
+    for endpoint, row in report["endpoints"].items():
+        print(
+            f"{endpoint:<48} {row['requests']:>7} {row['rps']:>7.2f} {row['p50_ms']:>6.1f}ms "
+            f"{row['p95_ms']:>6.1f}ms {row['p99_ms']:>6.1f}ms {row['error_rate']:>7.2%}"
+        )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Run a multi-user load test against BAC Tracker Web.")
+    parser.add_argument("--base-url", help="Test an already running instance instead of starting one.")
+    parser.add_argument("--database-url", help="Start the app against this Postgres URL instead of a temporary SQLite file.")
+    parser.add_argument("--server", choices=("auto", "gunicorn", "flask"), default="auto", help="How to start the app (auto prefers gunicorn).")
+    parser.add_argument("--workers", type=int, default=1, help="gunicorn workers (production runs 1).")
+    parser.add_argument("--threads", type=int, default=1, help="gunicorn threads per worker.")
+    parser.add_argument("--users", type=int, default=500, help="Virtual users to simulate.")
+    parser.add_argument("--concurrency", type=int, default=25, help="Maximum requests in flight at once.")
+    parser.add_argument("--duration", type=float, default=120.0, help="Test length in seconds.")
+    parser.add_argument("--ramp-up", type=float, default=30.0, help="Seconds over which users arrive.")
+    parser.add_argument("--poll-interval", type=float, default=60.0, help="Seconds between /api/state and group polls per user.")
+    parser.add_argument("--guardian-interval", type=float, default=60.0, help="Seconds between guardian page polls per group.")
+    parser.add_argument("--drink-interval", type=float, default=900.0, help="Mean seconds between drinks per user.")
+    parser.add_argument("--group-size", type=int, default=6, help="Users per group; the first creates it and a guardian link.")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for user behaviour.")
+    parser.add_argument("--json-out", help="Also write the report as JSON.")
+    parser.add_argument("--quiet", action="store_true", help="No progress lines while running.")
+    args = parser.parse_args()
+    args.users = max(1, args.users)
+    args.concurrency = max(1, args.concurrency)
+    args.group_size = max(1, args.group_size)
+
+    proc = None
+    workdir = tempfile.mkdtemp(prefix="bac-load-")
+    try:
+        if args.base_url:
+            base_url = args.base_url
+            print("Note: against an external instance, set WRITE_RATE_LIMIT_WINDOW_SEC=1 and WRITE_RATE_LIMIT_MAX_REQUESTS=5000 there or registrations will be rate limited.")
+        else:
+            proc, base_url = start_server(args, workdir)
+        print(f"Running {args.users} users, concurrency {args.concurrency}, for {args.duration:.0f}s...")
+        report = LoadTest(base_url, args).run()
+        _print_report(report)
+        if args.json_out:
+            Path(args.json_out).write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+        return 0
+    except Exception as exc:
+        print(f"Load test failed: {exc}")
+        log_path = Path(workdir) / "server.log"
+        if log_path.exists():
+            print("Last server log lines:")
+            print("\n".join(log_path.read_text(errors="replace").splitlines()[-20:]))
+        return 1
+    finally:
+        if proc is not None:
+            proc.terminate()
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
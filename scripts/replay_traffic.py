@@ -0,0 +1,377 @@
+"""Replay captured traffic against a local BAC Tracker Web instance.
+
+Reads the JSONL written by traffic capture (`TRAFFIC_CAPTURE_DIR`, including
+rotated `traffic.jsonl.N` files) and re-sends every request at its original
+offset divided by `--speed`. Captures hold no credentials or values, so the
+replay rebuilds a plausible world as it goes: each captured actor becomes a
+freshly registered user, each pseudonymised group becomes a real group (the
+first actor to touch it creates it, the others join), guardian views use a
+link on one of those groups, and request bodies are filled in from their
+recorded shape. That setup traffic is not part of the report.
+
+The report lists, per route, replayed p50/p95/p99 next to the captured p95,
+the error rate, and how many responses landed in a different status class
+than in the capture (`diff`).
+
+Usage:
+    python scripts/replay_traffic.py traffic/ --speed 1
+    python scripts/replay_traffic.py traffic/traffic.jsonl --speed 10 --concurrency 64 --json-out replay.json
+    python scripts/replay_traffic.py traffic/ --base-url http://127.0.0.1:5000 --speed 0
+"""
+
+from __future__ import annotations
+
+import argparse
+import glob
+import json
+import os
+import random
+import re
+import shutil
+import string
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from http.cookiejar import CookieJar
+from pathlib import Path
+from typing import Any
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from load_test import CATALOG_IDS, Stats, _json_request, _percentile, start_server  # noqa: E402
+
+_ARG_RE = re.compile(r"<(?:[a-z]+:)?([a-zA-Z_][a-zA-Z0-9_]*)>")
+PASSWORD = "replaytraffic1"
+BODY_OVERRIDES: dict[str, dict[str, Any]] = {
+    "/api/setup": {"weight_lb": 170, "is_male": True},
+    "/api/social/groups/create": {"name": "Replay group"},
+}
+
+
+def load_records(paths: list[str]) -> list[dict[str, Any]]:
+    files: list[str] = []
+    for path in paths:
+        files += sorted(glob.glob(os.path.join(path, "traffic.jsonl*"))) if os.path.isdir(path) else [path]
+    records = []
+    for name in files:
+        with open(name, encoding="utf-8") as handle:
+            for line in handle:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if isinstance(record, dict) and record.get("route") and record.get("method"):
+                    records.append(record)
+    records.sort(key=lambda r: float(r.get("ts", 0.0)))
+    return records
+
+
+def body_from_shape(shape: Any) -> Any:
+    """A request body with the recorded keys and value types."""
+    if isinstance(shape, dict):
+        if "list" in shape and "item" in shape and isinstance(shape.get("list"), int):
+            item = shape["item"]
+            return [body_from_shape(item) for _ in range(shape["list"])] if item is not None else []
+        return {key: body_from_shape(value) for key, value in shape.items() if key != "<key>"}
+    return {"str": "x", "int": 1, "float": 1.0, "bool": True, "null": None, "object": {}, "list": []}.get(shape)
+
+
+@dataclass
+class ReplayActor:
+    opener: urllib.request.OpenerDirector = field(
+        default_factory=lambda: urllib.request.build_opener(urllib.request.HTTPCookieProcessor(CookieJar()))
+    )
+    csrf: str = ""
+    email: str = ""
+    registered: bool = False
+    groups: set[str] = field(default_factory=set)
+    pending: deque = field(default_factory=deque)
+    busy: bool = False
+
+
+@dataclass
+class ReplayGroup:
+    group_id: int | None = None
+    invite_code: str = ""
+    guardian_token: str | None = None
+    ready: threading.Event = field(default_factory=threading.Event)
+
+
+class Replayer:
+    def __init__(self, base_url: str, args: argparse.Namespace):
+        self.base = base_url.rstrip("/")
+        self.args = args
+        self.stats = Stats()
+        self.setup_stats = Stats()
+        self.captured: dict[str, list[float]] = {}
+        self.mismatches: dict[str, int] = {}
+        self.max_lag_ms = 0.0
+        self._lock = threading.Lock()
+        self._actors: dict[str, ReplayActor] = {}
+        self._groups: dict[str, ReplayGroup] = {}
+
+    def _send(
+        self,
+        actor: ReplayActor,
+        method: str,
+        path: str,
+        payload: Any = None,
+        *,
+        label: str | None = None,
+    ) -> tuple[int, dict]:
+        headers = {"X-CSRF-Token": actor.csrf} if method != "GET" and actor.csrf else None
+        started = time.perf_counter()
+        try:
+            status, body = _json_request(actor.opener, method, f"{self.base}{path}", payload=payload, headers=headers)
+        except OSError as exc:
+            status, body = 0, {"error": str(exc)}
+        ms = (time.perf_counter() - started) * 1000.0
+        (self.stats if label else self.setup_stats).record(label or f"{method} {path}", status, ms)
+        if isinstance(body, dict) and body.get("csrf_token"):
+            actor.csrf = str(body["csrf_token"])
+        return status, body
+
+    def _bootstrap(self, actor: ReplayActor) -> None:
+        if not actor.csrf:
+            self._send(actor, "GET", "/api/auth/me")
+
+    def _register_payload(self, actor: ReplayActor) -> dict[str, Any]:
+        suffix = "".join(random.choices(string.ascii_lowercase + string.digits, k=10))
+        actor.email = f"replay-{suffix}@example.com"
+        return {
+            "display_name": f"Replay {suffix}",
+            "username": "",
+            "email": actor.email,
+            "password": PASSWORD,
+            "confirm_password": PASSWORD,
+            "gender": "male",
+            "default_weight_lb": 170,
+        }
+
+    def _ensure_registered(self, actor: ReplayActor) -> None:
+        if actor.registered:
+            return
+        self._bootstrap(actor)
+        status, _ = self._send(actor, "POST", "/api/auth/register", self._register_payload(actor))
+        actor.registered = status == 200
+        if actor.registered:
+            self._send(actor, "POST", "/api/setup", BODY_OVERRIDES["/api/setup"])
+
+    def _actor(self, key: str | None) -> ReplayActor:
+        if key is None:
+            return ReplayActor()
+        with self._lock:
+            actor = self._actors.get(key)
+            if actor is None:
+                actor = self._actors[key] = ReplayActor()
+            return actor
+
+    def _group_for(self, actor: ReplayActor, pseudonym: str) -> int | None:
+        """The local group standing in for a captured group id, joined by `actor`."""
+        with self._lock:
+            group = self._groups.get(pseudonym)
+            creator = group is None
+            if creator:
+                group = self._groups[pseudonym] = ReplayGroup()
+        if creator:
+            self._ensure_registered(actor)
+            status, body = self._send(actor, "POST", "/api/social/groups/create", BODY_OVERRIDES["/api/social/groups/create"])
+            info = body.get("group") or {}
+            if status == 200 and info.get("id"):
+                group.group_id = int(info["id"])
+                group.invite_code = str(info.get("invite_code", ""))
+                status, body = self._send(actor, "POST", f"/api/social/groups/{group.group_id}/guardian-links", {"label": "Replay"})
+                if status == 200:
+                    group.guardian_token = (body.get("item") or {}).get("token")
+                actor.groups.add(pseudonym)
+            group.ready.set()
+        else:
+            group.ready.wait(30)
+        if group.group_id is not None and pseudonym not in actor.groups:
+            self._ensure_registered(actor)
+            self._send(actor, "POST", "/api/social/groups/join", {"invite_code": group.invite_code})
+            actor.groups.add(pseudonym)
+        return group.group_id
+
+    def _guardian_token(self) -> str:
+        with self._lock:
+            tokens = [g.guardian_token for g in self._groups.values() if g.guardian_token]
+        return tokens[0] if tokens else "missing"
+
+    def _path(self, actor: ReplayActor, record: dict[str, Any]) -> str:
+        args = record.get("args") or {}
+
+        def substitute(match: re.Match) -> str:
+            name = match.group(1)
+            if name == "group_id" and args.get(name):
+                return str(self._group_for(actor, args[name]) or 0)
+            if name == "token":
+                return self._guardian_token()
+            return "1"
+
+        path = _ARG_RE.sub(substitute, record["route"])
+        query = record.get("query") or []
+        if query:
+            path += "?" + "&".join(f"{key}=0" for key in query)
+        return path
+
+    def _body(self, record: dict[str, Any]) -> Any:
+        route = record["route"]
+        if route in BODY_OVERRIDES:
+            return dict(BODY_OVERRIDES[route])
+        if route == "/api/social/groups/join":
+            # Which group was joined is not captured; join the newest one so the write still happens.
+            with self._lock:
+                codes = [g.invite_code for g in self._groups.values() if g.invite_code]
+            return {"invite_code": codes[-1] if codes else "MISSING"}
+        if route == "/api/drink":
+            body = body_from_shape(record.get("body")) or {}
+            body.update({"catalog_id": random.choice(CATALOG_IDS), "count": 1, "hours_ago": 0, "sip_minutes": 0})
+            return body
+        shape = record.get("body")
+        return body_from_shape(shape) if shape is not None else None
+
+    def replay_one(self, actor: ReplayActor, record: dict[str, Any], due: float) -> None:
+        self.max_lag_ms = max(self.max_lag_ms, (time.monotonic() - due) * 1000.0)
+        method = str(record["method"]).upper()
+        route = str(record["route"])
+        label = f"{method} {route}"
+        if route == "/api/auth/register":
+            self._bootstrap(actor)
+            status, _ = self._send(actor, method, route, self._register_payload(actor), label=label)
+            actor.registered = actor.registered or status == 200
+        elif route == "/api/auth/login":
+            self._ensure_registered(actor)
+            status, _ = self._send(actor, method, route, {"email": actor.email, "password": PASSWORD}, label=label)
+        else:
+            if record.get("actor") is not None:
+                self._ensure_registered(actor)
+            elif method != "GET":
+                self._bootstrap(actor)
+            status, _ = self._send(actor, method, self._path(actor, record), self._body(record), label=label)
+        with self._lock:
+            self.captured.setdefault(label, []).append(float(record.get("duration_ms", 0.0)))
+            if status // 100 != int(record.get("status", 0)) // 100:
+                self.mismatches[label] = self.mismatches.get(label, 0) + 1
+
+    def _drain(self, actor: ReplayActor) -> None:
+        """Replay an actor's queued records one at a time, in capture order."""
+        while True:
+            with self._lock:
+                if not actor.pending:
+                    actor.busy = False
+                    return
+                record, due = actor.pending.popleft()
+            try:
+                self.replay_one(actor, record, due)
+            except Exception as exc:
+                self.stats.record(f"EXC {type(exc).__name__}", 0, 0.0)
+
+    def _dispatch(self, pool: ThreadPoolExecutor, record: dict[str, Any], due: float) -> None:
+        actor = self._actor(record.get("actor"))
+        with self._lock:
+            actor.pending.append((record, due))
+            if actor.busy:
+                return
+            actor.busy = True
+        pool.submit(self._drain, actor)
+
+    def run(self, records: list[dict[str, Any]]) -> dict[str, Any]:
+        speed = self.args.speed
+        first_ts = float(records[0].get("ts", 0.0)) if records else 0.0
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=self.args.concurrency) as pool:
+            for record in records:
+                offset = (float(record.get("ts", first_ts)) - first_ts) / speed if speed > 0 else 0.0
+                due = started + offset
+                delay = due - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                self._dispatch(pool, record, due)
+        report = self.stats.report(time.monotonic() - started)
+        for label, row in report["endpoints"].items():
+            captured = sorted(self.captured.get(label, []))
+            row["captured_p95_ms"] = round(_percentile(captured, 95), 1)
+            row["status_mismatches"] = self.mismatches.get(label, 0)
+        report["speed"] = speed
+        report["max_start_lag_ms"] = round(self.max_lag_ms, 1)
+        report["setup_requests"] = self.setup_stats.report(1.0)["requests"]
+        return report
+
+
+def _print_report(report: dict[str, Any]) -> None:
+    print(
+        f"\n{report['requests']} requests in {report['elapsed_sec']}s at {report['speed']:g}x: "
+        f"{report['rps']} req/s, error rate {report['error_rate']:.2%}, max start lag {report['max_start_lag_ms']}ms "
+        f"({report['setup_requests']} setup requests not counted)\n"
+    )
+    header = f"{'endpoint':<52} {'count':>6} {'p50':>8} {'p95':>8} {'p99':>8} {'prod p95':>9} {'errors':>7} {'diff':>5}"
+    print(header)
+    print("-" * len(header))
+    for endpoint, row in report["endpoints"].items():
+        print(
+            f"{endpoint:<52} {row['requests']:>6} {row['p50_ms']:>6.1f}ms {row['p95_ms']:>6.1f}ms {row['p99_ms']:>6.1f}ms "
+            f"{row['captured_p95_ms']:>7.1f}ms {row['error_rate']:>7.2%} {row['status_mismatches']:>5}"
+        )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Replay captured traffic against BAC Tracker Web.")
+    parser.add_argument("paths", nargs="+", help="Capture files or directories holding traffic.jsonl*.")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay speed multiplier; 0 sends as fast as possible.")
+    parser.add_argument("--concurrency", type=int, default=32, help="Maximum requests in flight at once.")
+    parser.add_argument("--limit", type=int, default=0, help="Only replay the first N records.")
+    parser.add_argument("--base-url", help="Replay against an already running instance instead of starting one.")
+    parser.add_argument("--database-url", help="Start the app against this Postgres URL instead of a temporary SQLite file.")
+    parser.add_argument("--server", choices=("auto", "gunicorn", "flask"), default="auto", help="How to start the app (auto prefers gunicorn).")
+    parser.add_argument("--workers", type=int, default=1, help="gunicorn workers (production runs 1).")
+    parser.add_argument("--threads", type=int, default=1, help="gunicorn threads per worker.")
+    parser.add_argument("--json-out", help="Also write the report as JSON.")
+    args = parser.parse_args()
+    args.concurrency = max(1, args.concurrency)
+    args.speed = max(0.0, args.speed)
+
+    records = load_records(args.paths)
+    if args.limit > 0:
+        records = records[: args.limit]
+    if not records:
+        print("No capture records found.")
+        return 1
+    span = float(records[-1].get("ts", 0.0)) - float(records[0].get("ts", 0.0))
+    print(f"Loaded {len(records)} records spanning {span:.0f}s; replaying at {args.speed:g}x.")
+
+    proc = None
+    workdir = tempfile.mkdtemp(prefix="bac-replay-")
+    try:
+        if args.base_url:
+            base_url = args.base_url
+        else:
+            proc, base_url = start_server(args, workdir)
+        report = Replayer(base_url, args).run(records)
+        _print_report(report)
+        if args.json_out:
+            Path(args.json_out).write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+        return 0
+    except Exception as exc:
+        print(f"Replay failed: {exc}")
+        return 1
+    finally:
+        if proc is not None:
+            proc.terminate()
+            try:
+                proc.wait(timeout=10)
+            except Exception:
+                proc.kill()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
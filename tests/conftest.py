@@ -0,0 +1,33 @@
+"""Shared pytest fixtures."""
+
+from contextlib import contextmanager
+
+import pytest
+
+from bac_app import querytrace
+
+
+@pytest.fixture
+def query_budget():
+    """Assert a block stays within a database query budget.
+
+        with query_budget(queries=2, connections=2):
+            client.get("/api/state")
+
+    Repeated statements (N+1 suspects) fail the block unless `repeats` allows them.
+    """
+
+    @contextmanager
+    def budget(*, queries: int, connections: int | None = None, repeats: int = 0):
+        with querytrace.capture("budget") as trace:
+            yield trace
+        detail = "\n".join(f"  x{s.count} {s.fingerprint}" for s in trace.statements.values())
+        assert trace.query_count <= queries, f"{trace.query_count} queries > budget {queries}:\n{detail}"
+        if connections is not None:
+            assert trace.connections <= connections, f"{trace.connections} connections > budget {connections}"
+        repeated = trace.repeated()
+        assert len(repeated) <= repeats, "repeated statements:\n" + "\n".join(
+            f"  x{s.count} {s.fingerprint}" for s in repeated
+        )
+
+    return budget
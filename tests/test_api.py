@@ -2,10 +2,15 @@
 
 import csv
 import io
+import json
+import os
+import sqlite3
+import time
+import zipfile
 
 import pytest
 
-from app import LOGIN_ATTEMPTS, RATE_LIMIT_BUCKETS, app
+from app import LOGIN_ATTEMPTS, RATE_LIMIT_BUCKETS, _auth_db_path, app
 
 
 @pytest.fixture(autouse=True)
@@ -364,6 +369,196 @@ def test_session_export_csv_contains_saved_rows(client):
     assert rows[0]["is_active"] == "false"
 
 
+def test_session_export_streams_jsonl_drink_rows(client):
+    register(client, email="jsonl@example.edu", name="Jsonl User")
+    client.post("/api/setup", json={"weight_lb": 165, "is_male": True})
+    client.post("/api/drink", json={"drink_key": "beer", "count": 2, "hours_ago": 0})
+    client.post("/api/session/save", json={"name": "JSONL Night"})
+
+    exported = client.get("/api/session/export?format=jsonl&detail=events")
+    assert exported.status_code == 200
+    assert exported.mimetype == "application/x-ndjson"
+    assert exported.is_streamed
+
+    rows = [json.loads(line) for line in exported.get_data(as_text=True).splitlines()]
+    named = [row for row in rows if row["session_name"] == "JSONL Night"]
+    assert len(named) == 1
+    assert named[0]["grams_alcohol"] > 0
+    assert named[0]["drank_at"]
+
+    bad = client.get("/api/session/export?format=xml")
+    assert bad.status_code == 400
+
+
+def test_session_export_includes_live_drinks_of_active_session(client):
+    register(client, email="live-export@example.edu", name="Live Export")
+    client.post("/api/setup", json={"weight_lb": 165, "is_male": True})
+    client.post("/api/drink", json={"drink_key": "beer", "count": 1, "hours_ago": 2})
+    client.post("/api/drink", json={"drink_key": "beer", "count": 1, "hours_ago": 1})
+    client.post("/api/drink", json={"drink_key": "beer", "count": 2, "hours_ago": 0})
+
+    exported = client.get("/api/session/export?format=jsonl&detail=events&include_active=true")
+    assert exported.status_code == 200
+    rows = [json.loads(line) for line in exported.get_data(as_text=True).splitlines()]
+    assert [row["standard_drinks"] for row in rows] == [1.0, 1.0, 2.0]
+    assert len({row["session_id"] for row in rows}) == 1
+    assert all(row["drank_at"] for row in rows)
+
+
+def test_account_export_streams_zip_of_jsonl(client):
+    register(client, email="archive@example.edu", name="Archive User")
+    client.post("/api/setup", json={"weight_lb": 165, "is_male": True})
+    client.post("/api/drink", json={"drink_key": "beer", "count": 1, "hours_ago": 0})
+    client.post("/api/session/save", json={"name": "Archive Night"})
+    client.post("/api/account/emergency-contacts", json={"name": "Roommate", "phone": "555-0100"})
+
+    exported = client.get("/api/account/export")
+    assert exported.status_code == 200
+    assert exported.mimetype == "application/zip"
+    assert exported.is_streamed
+
+    archive = zipfile.ZipFile(io.BytesIO(exported.get_data()))
+    assert "profile.jsonl" in archive.namelist()
+    manifest = json.loads(archive.read("manifest.json"))
+    assert manifest["counts"]["profile"] == 1
+    assert manifest["counts"]["emergency_contacts"] == 1
+
+    profile = json.loads(archive.read("profile.jsonl").decode().splitlines()[0])
+    assert profile["email"] == "archive@example.edu"
+    assert "password_hash" not in profile
+    sessions = [json.loads(line) for line in archive.read("sessions.jsonl").decode().splitlines()]
+    named = [row for row in sessions if row["name"] == "Archive Night"]
+    assert named and len(named[0]["payload"]["events"]) == 1
+
+
+def test_session_import_groups_drinks_by_inactivity_gap(client):
+    register(client, email="import@example.edu", name="Import User")
+    rows = [
+        {"drank_at": "2025-03-07T21:00:00", "catalog_id": "bud-light"},
+        {"drank_at": "2025-03-07T22:15:00", "standard_drinks": 1.5, "session_name": "Formal"},
+        {"drank_at": "2025-03-14T20:30:00", "grams_alcohol": 14},
+        {"drank_at": "not a time", "grams_alcohol": 14},
+    ]
+    data = "\n".join(json.dumps(row) for row in rows)
+
+    imported = client.post("/api/session/import", json={"format": "jsonl", "data": data})
+    assert imported.status_code == 200
+    body = imported.get_json()
+    assert body["sessions"] == 2
+    assert body["drinks"] == 3
+    assert body["skipped"] == 1
+
+    items = client.get("/api/session/list").get_json()["items"]
+    formal = next(item for item in items if item["name"] == "Formal")
+    assert formal["drink_count"] == 2
+    assert formal["session_date"] == "2025-03-07"
+    assert formal["peak_bac"] > 0
+
+    bad = client.post("/api/session/import", json={"format": "xml", "data": data})
+    assert bad.status_code == 400
+
+
+def test_session_import_skips_out_of_range_timestamps(client):
+    register(client, email="import-range@example.edu", name="Import Range")
+    now = time.time()
+    rows = [
+        {"drank_at": now - 3600, "standard_drinks": 1},
+        {"drank_at": "inf", "standard_drinks": 1},
+        {"drank_at": float("inf"), "standard_drinks": 1},
+        {"drank_at": "nan", "standard_drinks": 1},
+        {"drank_at": 1e20, "standard_drinks": 1},
+        {"drank_at": -1e12, "standard_drinks": 1},
+        {"drank_at": "0001-01-01T00:00:00", "standard_drinks": 1},
+        {"drank_at": now + 86400, "standard_drinks": 1},
+    ]
+    data = "\n".join(json.dumps(row) for row in rows)
+
+    imported = client.post("/api/session/import", json={"format": "jsonl", "data": data})
+    assert imported.status_code == 200
+    body = imported.get_json()
+    assert body["drinks"] == 1
+    assert body["skipped"] == 7
+    assert body["errors"][-1] == "row 8: drank_at is in the future"
+
+    csv_data = "drank_at,standard_drinks\ninf,1\nnan,1\n" + f"{now - 60},1\n"
+    imported = client.post("/api/session/import", json={"format": "csv", "data": csv_data})
+    assert imported.status_code == 200
+    assert imported.get_json()["skipped"] == 2
+
+
+def test_maintenance_run_finalizes_abandoned_sessions_and_prunes(client):
+    from bac_app.maintenance import MaintenanceScheduler
+
+    user = register(client, email="maint@example.edu", name="Maint User")
+    client.post("/api/setup", json={"weight_lb": 165, "is_male": True})
+    client.post("/api/drink", json={"drink_key": "beer", "count": 1, "hours_ago": 0})
+    client.post("/api/drink", json={"drink_key": "beer", "count": 1, "hours_ago": 0})
+
+    conn = sqlite3.connect(_auth_db_path())
+    try:
+        conn.execute(
+            "UPDATE saved_sessions SET started_at = '2020-01-01T20:00:00', last_event_at = '2020-01-01T21:00:00'"
+        )
+        conn.execute("UPDATE session_events SET logged_at = '2020-01-01T21:00:00'")
+        conn.execute(
+            "INSERT INTO password_resets (user_id, token, expires_at) VALUES (?, 'old-token', '2020-01-01 00:00:00')",
+            (user["id"],),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+    forbidden = client.get("/api/admin/maintenance?run=1")
+    assert forbidden.status_code == 403
+    res = client.get("/api/admin/maintenance?token=test-token&run=1")
+    assert res.status_code == 200
+    ran = res.get_json()["ran"]
+    assert ran["finalize_abandoned_sessions"] == 1
+    assert ran["delete_expired_tokens"] == 1
+
+    items = client.get("/api/session/list").get_json()["items"]
+    assert items[0]["is_active"] is False
+    assert items[0]["drink_count"] == 2
+
+    other = MaintenanceScheduler(_auth_db_path(), owner="other-worker")
+    assert other.run_once() is None
+
+
+def test_finalize_abandoned_sessions_pages_past_live_ones():
+    from datetime import datetime, timedelta
+
+    from bac_app import auth_store
+
+    db_path = _auth_db_path()
+    auth_store.init_db(db_path)
+    now = datetime.now().replace(microsecond=0)
+    payload = {"weight_lb": 170, "is_male": True, "events": [[0.0, 14.0, 150, 12.0, 1.0]]}
+    abandoned = []
+    for idx in range(7):
+        user = auth_store.create_user(
+            db_path,
+            email=f"night{idx}@example.edu",
+            password="password123",
+            display_name=f"Night {idx}",
+            username=None,
+            is_male=True,
+            default_weight_lb=170,
+        )
+        # The lowest user ids are still out; only the later ones walked away.
+        last = now - timedelta(minutes=10) if idx < 4 else now - timedelta(hours=8)
+        auth_store.upsert_auto_session(
+            db_path, user_id=user["id"], name="Tonight", payload=payload, event_time_iso=last.isoformat(), touch_last_event=True
+        )
+        if idx >= 4:
+            abandoned.append(user["id"])
+
+    closed = auth_store.finalize_abandoned_auto_sessions(db_path, inactive_hours=3, max_active_hours=12, limit=2)
+    assert closed == 2
+    assert auth_store.finalize_abandoned_auto_sessions(db_path, inactive_hours=3, max_active_hours=12, limit=2) == 1
+    still_active = {uid for uid in abandoned if auth_store.get_active_auto_session(db_path, user_id=uid)}
+    assert still_active == set()
+
+
 def test_favorites_persist_per_user(client):
     register(client, email="fav@example.edu", password="password123")
     client.post("/api/setup", json={"weight_lb": 160, "is_male": True})
@@ -502,6 +697,53 @@ def test_account_delete_requires_password_and_removes_login(client):
     assert login.status_code == 401
 
 
+def test_account_delete_marks_then_purges_in_background(client):
+    from bac_app.auth_store import purge_deleted_users
+
+    user = register(client, email="purge-me@example.edu", password="password123", name="Purge Me")
+    client.post("/api/setup", json={"weight_lb": 165, "is_male": True})
+    client.post("/api/drink", json={"drink_key": "beer", "count": 1, "hours_ago": 0})
+    client.post("/api/session/save", json={"name": "Gone Night"})
+    client.post("/api/social/groups/create", json={"name": "Gone Group"})
+
+    ok = client.post("/api/account/delete", json={"password": "password123", "confirm_text": "DELETE"})
+    assert ok.status_code == 200
+
+    purge_deleted_users(_auth_db_path(), batch_size=1)
+    conn = sqlite3.connect(_auth_db_path())
+    try:
+        for table, column in (("users", "id"), ("saved_sessions", "user_id"), ("social_groups", "owner_user_id")):
+            count = conn.execute(f"SELECT COUNT(*) FROM {table} WHERE {column} = ?", (user["id"],)).fetchone()[0]
+            assert count == 0, table
+    finally:
+        conn.close()
+
+    register(client, email="purge-me@example.edu", password="password123", name="Purge Again")
+
+
+def test_soft_deleted_account_cannot_be_found_or_reissued_codes(client):
+    from bac_app import auth_store
+
+    register(client, email="ghost@example.edu", password="password123", name="Ghost")
+    me = client.get("/api/auth/me").get_json()["user"]
+    user = auth_store.get_user_by_id(_auth_db_path(), me["id"])
+    username, invite_code = user["username"], user["invite_code"]
+    auth_store.delete_user_account(_auth_db_path(), user_id=me["id"], purge=False)
+
+    auth_store.init_db(_auth_db_path())
+    conn = sqlite3.connect(_auth_db_path())
+    try:
+        row = conn.execute("SELECT username, invite_code FROM users WHERE id = ?", (me["id"],)).fetchone()
+        assert row == (None, None)
+        # Even a row whose codes survived is invisible to lookups once deleted.
+        conn.execute("UPDATE users SET username = ?, invite_code = ? WHERE id = ?", (username, invite_code, me["id"]))
+        conn.commit()
+    finally:
+        conn.close()
+    assert auth_store.find_user_by_username(_auth_db_path(), username=username) is None
+    assert auth_store.find_user_by_invite_code(_auth_db_path(), invite_code=invite_code) is None
+
+
 def test_session_event_delete_and_restore(client):
     register(client, email="restore@example.edu", name="RestoreUser")
     client.post("/api/setup", json={"weight_lb": 170, "is_male": True})
@@ -866,3 +1108,463 @@ def test_session_event_edit_and_delete(client):
     assert delete.status_code == 200
     final_state = client.get("/api/state").get_json()
     assert len(final_state["session_events"]) == 1
+
+
+def test_group_snapshot_incremental_alert_cursor():
+    app.config["TESTING"] = True
+    owner = app.test_client()
+    member = app.test_client()
+    register(owner, email="cursor-owner@example.edu", name="Owner")
+    register(member, email="cursor-member@example.edu", name="Member")
+
+    created = owner.post("/api/social/groups/create", json={"name": "Cursor Crew"})
+    group_id = created.get_json()["group"]["id"]
+    member.post("/api/social/groups/join", json={"invite_code": created.get_json()["group"]["invite_code"]})
+    owner.post(f"/api/social/groups/{group_id}/location", json={"preset": "at_bar"})
+
+    full = owner.get(f"/api/social/groups/{group_id}").get_json()
+    assert full["incremental"] is False
+    assert len(full["alerts"]) == 1
+    cursor = full["cursor"]["since_alert_id"]
+    assert cursor == full["alerts"][0]["id"]
+
+    unchanged = owner.get(f"/api/social/groups/{group_id}?since_alert_id={cursor}").get_json()
+    assert unchanged["incremental"] is True
+    assert unchanged["alerts"] == []
+    assert unchanged["cursor"]["since_alert_id"] == cursor
+
+    member.post(f"/api/social/groups/{group_id}/location", json={"preset": "home_safe"})
+    delta = owner.get(f"/api/social/groups/{group_id}?since_alert_id={cursor}").get_json()
+    assert [a["alert_type"] for a in delta["alerts"]] == ["home_safe"]
+    assert delta["resync"] is False
+
+    token = owner.post(f"/api/social/groups/{group_id}/guardian-links", json={"label": "Mom"}).get_json()["item"]["token"]
+    guardian_delta = owner.get(f"/api/guardian/{token}?since_alert_id={delta['cursor']['since_alert_id']}").get_json()
+    assert guardian_delta["alerts"] == []
+
+
+def test_friend_feed_expired_cursor_forces_resync():
+    app.config["TESTING"] = True
+    a = app.test_client()
+    b = app.test_client()
+    register(a, email="feed-cursor-a@example.edu", name="FeedA")
+    b_user = register(b, email="feed-cursor-b@example.edu", name="FeedB")
+    a.post("/api/social/invite/accept", json={"invite_code": b_user["invite_code"]})
+    b.post("/api/social/share", json={"enabled": True})
+    b.get("/api/state")
+
+    first = a.get("/api/social/feed").get_json()
+    assert first["incremental"] is False
+    assert first["cursor"]["updated_since"]
+
+    expired = a.get("/api/social/feed?updated_since=2000-01-01 00:00:00").get_json()
+    assert expired["resync"] is True
+    assert expired["incremental"] is False
+    assert len(expired["items"]) == 1
+
+    recent = a.get(f"/api/social/feed?updated_since={first['cursor']['updated_since']}").get_json()
+    assert recent["incremental"] is True
+    assert recent["resync"] is False
+
+
+def test_group_snapshot_cache_shared_and_invalidated_on_share(monkeypatch):
+    from bac_app import auth_store
+
+    app.config["TESTING"] = True
+    owner = app.test_client()
+    member = app.test_client()
+    register(owner, email="cache-owner@example.edu", name="Owner")
+    register(member, email="cache-member@example.edu", name="Member")
+    created = owner.post("/api/social/groups/create", json={"name": "Cache Crew"}).get_json()["group"]
+    member.post("/api/social/groups/join", json={"invite_code": created["invite_code"]})
+    member.get("/api/state")
+
+    loads = []
+    real_load = auth_store._load_group_base
+    monkeypatch.setattr(auth_store, "_load_group_base", lambda conn, gid: loads.append(gid) or real_load(conn, gid))
+
+    hidden = owner.get(f"/api/social/groups/{created['id']}").get_json()
+    own_view = member.get(f"/api/social/groups/{created['id']}").get_json()
+    assert len(loads) == 1
+    assert next(m for m in hidden["members"] if m["display_name"] == "Member")["drink_count"] is None
+    assert next(m for m in own_view["members"] if m["display_name"] == "Member")["drink_count"] == 0
+
+    member.post(f"/api/social/groups/{created['id']}/share", json={"enabled": True})
+    shared = owner.get(f"/api/social/groups/{created['id']}").get_json()
+    assert len(loads) == 2
+    assert next(m for m in shared["members"] if m["display_name"] == "Member")["drink_count"] == 0
+
+
+def test_state_polls_write_presence_behind():
+    from bac_app import auth_store
+
+    app.config["TESTING"] = True
+    a = app.test_client()
+    b = app.test_client()
+    register(a, email="presence-a@example.edu", name="PresA")
+    b_user = register(b, email="presence-b@example.edu", name="PresB")
+    a.post("/api/social/invite/accept", json={"invite_code": b_user["invite_code"]})
+    b.post("/api/social/share", json={"enabled": True})
+    b.post("/api/setup", json={"weight_lb": 160, "is_male": True})
+
+    db_path = _auth_db_path()
+    b.get("/api/state")
+    assert auth_store.flush_presence(db_path) == 1
+    b.get("/api/state")
+    assert auth_store.flush_presence(db_path) == 0
+
+    b.post("/api/drink", json={"drink_key": "beer", "count": 1, "hours_ago": 0})
+    b.get("/api/state")
+    feed = a.get("/api/social/feed").get_json()["items"]
+    assert feed[0]["drink_count"] == 1
+    assert auth_store.flush_presence(db_path) == 1
+
+
+def test_threshold_alert_cooldown_skips_db_while_quiet(monkeypatch):
+    from bac_app import auth_store
+
+    app.config["TESTING"] = True
+    owner = app.test_client()
+    register(owner, email="cooldown@example.edu", name="Cooldown")
+    group = owner.post("/api/social/groups/create", json={"name": "Cooldown Crew"}).get_json()["group"]
+    user_id = owner.get("/api/auth/me").get_json()["user"]["id"]
+    db_path = _auth_db_path()
+
+    auth_store.clear_alert_cooldowns(db_path)
+    auth_store.maybe_create_threshold_alert(db_path, user_id=user_id, bac_now=0.09)
+    auth_store.maybe_create_threshold_alert(db_path, user_id=user_id, bac_now=0.10)
+    alerts = owner.get(f"/api/social/groups/{group['id']}").get_json()["alerts"]
+    assert [a["alert_type"] for a in alerts] == ["threshold"]
+
+    def fail_connect(path):
+        raise AssertionError("cooldown hit should not touch the DB")
+
+    monkeypatch.setattr(auth_store, "_connect", fail_connect)
+    auth_store.maybe_create_threshold_alert(db_path, user_id=user_id, bac_now=0.11)
+
+
+def test_threshold_alert_reaches_group_joined_through_another_worker(monkeypatch):
+    from bac_app import auth_store
+
+    app.config["TESTING"] = True
+    owner, loner = app.test_client(), app.test_client()
+    register(owner, email="crew-owner@example.edu", name="CrewOwner")
+    register(loner, email="loner@example.edu", name="Loner")
+    group = owner.post("/api/social/groups/create", json={"name": "Late Crew"}).get_json()["group"]
+    loner_id = loner.get("/api/auth/me").get_json()["user"]["id"]
+    db_path = _auth_db_path()
+
+    auth_store.clear_alert_cooldowns(db_path)
+    auth_store.maybe_create_threshold_alert(db_path, user_id=loner_id, bac_now=0.09)
+    assert (db_path, loner_id) not in auth_store._ALERT_QUIET_UNTIL
+
+    # The join lands in the DB without this worker's registry hearing about it.
+    conn = sqlite3.connect(db_path)
+    conn.execute("INSERT INTO group_members (group_id, user_id, role, share_enabled) VALUES (?, ?, 'member', 0)", (group["id"], loner_id))
+    conn.commit()
+    conn.close()
+    auth_store.maybe_create_threshold_alert(db_path, user_id=loner_id, bac_now=0.10)
+    alerts = owner.get(f"/api/social/groups/{group['id']}").get_json()["alerts"]
+    assert [a["alert_type"] for a in alerts] == ["threshold"]
+
+    # Expired cooldowns and quiet periods are swept on a later call.
+    later = time.time() + auth_store.THRESHOLD_ALERT_COOLDOWN_SEC + 1
+    monkeypatch.setattr(auth_store.time, "time", lambda: later)
+    auth_store.maybe_create_threshold_alert(db_path, user_id=loner_id, bac_now=0.01)
+    auth_store.maybe_create_threshold_alert(db_path, user_id=0, bac_now=0.09)
+    assert (db_path, loner_id) not in auth_store._ALERT_QUIET_UNTIL
+    assert (group["id"], loner_id, "threshold") not in auth_store._ALERT_COOLDOWNS.get(db_path, {})
+
+
+def test_drinks_append_to_session_event_log(client):
+    from bac_app.auth_store import get_active_auto_session, list_session_events
+
+    register(client, email="event-log@example.edu", name="EventLog")
+    client.post("/api/setup", json={"weight_lb": 170, "is_male": True})
+    client.post("/api/drink", json={"drink_key": "beer", "count": 1, "hours_ago": 1})
+    client.post("/api/drink", json={"drink_key": "beer", "count": 1, "hours_ago": 0})
+    user_id = client.get("/api/auth/me").get_json()["user"]["id"]
+
+    active = get_active_auto_session(_auth_db_path(), user_id=user_id)
+    # The snapshot was written when the session started; later drinks are log rows.
+    assert len(json.loads(active["payload_json"])["events"]) == 1
+    events = list_session_events(_auth_db_path(), user_id=user_id, session_id=active["id"])
+    assert [round(e["grams"], 1) for e in events] == [14.0, 14.0]
+
+    client.patch("/api/session/events", json={"index": 0, "hours_ago": 2, "standard_drinks": 2})
+    client.patch("/api/session/events", json={"index": 1, "delete": True})
+    events = list_session_events(_auth_db_path(), user_id=user_id, session_id=active["id"])
+    assert [round(e["grams"], 1) for e in events] == [28.0]
+
+    client.post("/api/reset")
+    history = client.get("/api/session/list").get_json()["items"]
+    assert history[0]["drink_count"] == 1
+
+
+def test_session_summary_columns_and_backfill(client):
+    from bac_app import auth_store
+
+    register(client, email="summary@example.edu", name="Summary")
+    client.post("/api/setup", json={"weight_lb": 160, "is_male": True})
+    client.post("/api/drink", json={"drink_key": "beer", "count": 4, "hours_ago": 1})
+    client.post("/api/session/save", json={"name": "Big night"})
+
+    item = client.get("/api/session/list").get_json()["items"][0]
+    assert item["drink_count"] == 1
+    assert item["total_grams"] == 56.0
+    assert item["peak_bac"] >= 0.08
+    assert item["minutes_over_limit"] > 0
+    assert item["duration_minutes"] > 60
+
+    with auth_store._connect(_auth_db_path()) as conn:
+        conn.execute("UPDATE saved_sessions SET drink_count = NULL, peak_bac = NULL")
+        conn.commit()
+    assert auth_store.backfill_session_summaries(_auth_db_path(), batch_size=1) == 2  # saved session + active auto session
+    assert client.get("/api/session/list").get_json()["items"][0] == item
+
+
+def test_active_auto_session_is_unique_per_user(client):
+    from bac_app import auth_store
+
+    register(client, email="autosave@example.edu", name="Autosave")
+    client.post("/api/setup", json={"weight_lb": 160, "is_male": True})
+    client.post("/api/drink", json={"drink_key": "beer", "count": 1, "hours_ago": 0})
+    user_id = client.get("/api/auth/me").get_json()["user"]["id"]
+    active = auth_store.get_active_auto_session(_auth_db_path(), user_id=user_id)
+
+    payload = {"weight_lb": 160, "is_male": True, "events": [], "saved_at_epoch": 0}
+    again = auth_store.upsert_auto_session(
+        _auth_db_path(),
+        user_id=user_id,
+        name="Auto",
+        payload=payload,
+        event_time_iso="2026-01-01T21:00:00",
+        touch_last_event=True,
+    )
+    assert again == active["id"]
+    assert json.loads(auth_store.get_active_auto_session(_auth_db_path(), user_id=user_id)["payload_json"])["events"] == []
+
+    with auth_store._connect(_auth_db_path()) as conn:
+        with pytest.raises(sqlite3.IntegrityError):
+            conn.execute(
+                "INSERT INTO saved_sessions (user_id, name, payload_json, is_auto, is_active) VALUES (?, 'Dup', '{}', 1, 1)",
+                (user_id,),
+            )
+        # Databases from before the index may hold duplicates; init_db keeps the newest.
+        conn.execute("DROP INDEX idx_saved_sessions_one_active_auto")
+        conn.execute(
+            "INSERT INTO saved_sessions (user_id, name, payload_json, is_auto, is_active) VALUES (?, 'Dup', '{}', 1, 1)",
+            (user_id,),
+        )
+        conn.commit()
+    auth_store.init_db(_auth_db_path())
+    assert auth_store.get_active_auto_session(_auth_db_path(), user_id=user_id)["name"] == "Dup"
+
+
+def test_session_history_keyset_pagination(client):
+    register(client, email="pages@example.edu", name="Pages")
+    client.post("/api/setup", json={"weight_lb": 160, "is_male": True})
+    client.post("/api/drink", json={"drink_key": "beer", "count": 1, "hours_ago": 0})
+    saved_ids = [client.post("/api/session/save", json={"name": f"Night {i}"}).get_json()["session_id"] for i in range(3)]
+
+    first = client.get("/api/session/list?limit=2").get_json()
+    assert [item["id"] for item in first["items"]] == saved_ids[::-1][:2]
+    second = client.get(f"/api/session/list?limit=2&before_id={first['next_cursor']['before_id']}").get_json()
+    assert [item["id"] for item in second["items"]] == [saved_ids[0]]
+    assert second["next_cursor"] is None
+
+    dates = client.get("/api/session/dates?limit=1").get_json()
+    assert dates["items"][0]["session_count"] == 3
+    older = client.get(f"/api/session/dates?before_date={dates['next_cursor']['before_date']}").get_json()
+    assert older["items"] == []
+    assert client.get("/api/session/dates?before_date=nope").status_code == 400
+
+
+def test_metrics_endpoint_exposes_route_histograms(client):
+    from bac_app import metrics
+
+    metrics.REGISTRY.reset()
+    assert client.get("/metrics").status_code == 403
+    register(client, email="metrics@example.edu", name="Metrics")
+    client.post("/api/setup", json={"weight_lb": 160, "is_male": True})
+    client.post("/api/drink", json={"drink_key": "beer", "count": 1, "hours_ago": 0})
+    client.get("/api/state")
+
+    res = client.get("/metrics", headers={"Authorization": "Bearer test-token"})
+    assert res.status_code == 200
+    text = res.get_data(as_text=True)
+    assert 'bac_http_request_duration_seconds_bucket{method="GET",route="/api/state",le="+Inf"} 1' in text
+    assert 'bac_http_requests_total{method="POST",route="/api/drink",status="200"} 1' in text
+    assert 'bac_db_queries_total{backend="sqlite",op="select"}' in text
+
+    summary = client.get("/metrics?token=test-token&format=json").get_json()
+    state = next(r for r in summary["routes"] if r["route"] == "/api/state")
+    assert state["count"] == 1 and state["p99_ms"] is not None
+
+
+def test_metrics_merge_across_worker_snapshots(tmp_path):
+    import subprocess
+    import sys
+
+    from bac_app import metrics
+
+    live, dead = metrics.MetricsRegistry(), metrics.MetricsRegistry()
+    for reg in (live, dead):
+        reg.inc("bac_http_requests_total", {"method": "GET", "route": "/api/state", "status": 200})
+        reg.observe("bac_http_request_duration_seconds", {"method": "GET", "route": "/api/state"}, 0.02)
+        reg.add("bac_http_requests_in_flight", {}, 1)
+    exited = subprocess.Popen([sys.executable, "-c", "pass"])
+    exited.wait()
+    metrics.write_snapshot(str(tmp_path), registry=live, pid=os.getpid())
+    metrics.write_snapshot(str(tmp_path), registry=dead, pid=exited.pid)
+
+    for _ in range(2):  # the second scrape reads the exited worker from the archive
+        merged = metrics.collect(str(tmp_path))
+        key = (("method", "GET"), ("route", "/api/state"), ("status", "200"))
+        assert merged["bac_http_requests_total"][key] == 2
+        assert merged["bac_http_request_duration_seconds"][key[:2]]["count"] == 2
+        assert merged["bac_http_requests_in_flight"][()] == 1
+    assert not (tmp_path / f"metrics-{exited.pid}.json").exists()
+
+
+def test_schema_pass_runs_once_per_database_file(client, monkeypatch):
+    import app as app_module
+
+    calls = []
+    real_init = app_module.init_auth_db
+    monkeypatch.setattr(app_module, "init_auth_db", lambda path: (calls.append(path), real_init(path)))
+
+    register(client, email="schema-once@example.edu", name="Schema Once")
+    assert client.get("/api/state").status_code == 200
+    assert client.get("/api/auth/me").get_json()["user"]["email"] == "schema-once@example.edu"
+    assert len(calls) == 1
+
+    # A database file swapped out from under the process gets its schema again.
+    client.post("/api/auth/logout")
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(_auth_db_path() + suffix):
+            os.remove(_auth_db_path() + suffix)
+    register(client, email="schema-again@example.edu", name="Schema Again")
+    assert client.get("/api/auth/me").get_json()["user"]["email"] == "schema-again@example.edu"
+    assert len(calls) == 2
+
+
+def test_hot_endpoints_stay_within_query_budgets(client, query_budget):
+    owner = register(client, email="budget@example.edu", name="Budget")
+    client.post("/api/setup", json={"weight_lb": 160, "is_male": True})
+    client.post("/api/drink", json={"drink_key": "beer", "count": 1, "hours_ago": 0})
+    group = client.post("/api/social/groups/create", json={"name": "Budget group"}).get_json()["group"]
+
+    with query_budget(queries=2, connections=2):
+        assert client.get("/api/state").status_code == 200
+    with query_budget(queries=4, connections=3):
+        assert client.post("/api/drink", json={"drink_key": "beer", "count": 1, "hours_ago": 0}).status_code == 200
+    with query_budget(queries=4, connections=1):
+        assert client.get(f"/api/social/groups/{group['id']}").status_code == 200
+    # Membership of the sender and the target is checked on separate connections.
+    with query_budget(queries=3, connections=3, repeats=1) as trace:
+        res = client.post(f"/api/social/groups/{group['id']}/check", json={"target_user_id": owner["id"]})
+        assert res.status_code == 200
+    assert trace.repeated()[0].fingerprint.startswith("SELECT ? FROM group_members")
+
+
+def test_state_response_has_server_timing_phases(client):
+    register(client, email="timing@example.edu", name="Timing")
+    client.post("/api/setup", json={"weight_lb": 160, "is_male": True})
+    client.post("/api/drink", json={"drink_key": "beer", "count": 1, "hours_ago": 0})
+
+    res = client.get("/api/state?hours_until_target=8")
+    phases = {part.split(";")[0].strip(): float(part.split("dur=")[1]) for part in res.headers["Server-Timing"].split(",")}
+    for name in ("session_decode", "db", "compute.curve", "compute.history", "compute.plan", "serialize", "total"):
+        assert name in phases
+    assert phases["total"] >= phases["compute.curve"]
+    assert "Server-Timing" not in client.get("/healthz").headers
+
+
+def test_profiling_is_off_by_default_and_admin_only(client, monkeypatch):
+    register(client, email="profile@example.edu", name="Profile")
+    assert client.get("/api/admin/profile?token=test-token").status_code == 404
+    res = client.get("/api/state?profile=1", headers={"X-Admin-Token": "test-token"})
+    assert res.is_json and "X-Profiled-Status" not in res.headers
+
+    monkeypatch.setenv("PROFILING_ENABLED", "1")
+    assert client.get("/api/state?profile=1").is_json
+    res = client.get("/api/state?profile=1", headers={"X-Admin-Token": "test-token"})
+    assert res.headers["X-Profiled-Status"] == "200"
+    assert "api_state" in res.get_data(as_text=True)
+
+
+def test_stack_sampler_profile_returns_collapsed_stacks(client, monkeypatch):
+    import app as app_module
+
+    monkeypatch.setenv("PROFILING_ENABLED", "1")
+    assert client.get("/api/admin/profile?seconds=5").status_code == 403
+    assert client.get("/api/admin/profile/result?token=test-token").status_code in (200, 404)
+    res = client.get("/api/admin/profile?token=test-token&seconds=0.5&interval_ms=2")
+    assert res.status_code == 202 and res.get_json()["duration_sec"] == 0.5
+    assert client.get("/api/admin/profile?token=test-token").status_code == 409
+    app_module.STACK_SAMPLER.wait(5)
+
+    text = client.get("/api/admin/profile/result?token=test-token").get_data(as_text=True)
+    stack, count = text.splitlines()[0].rsplit(" ", 1)
+    assert int(count) >= 1 and ";" in stack
+
+
+def test_memory_endpoint_tracks_allocations_and_route_peaks(client):
+    from bac_app import memtrack, metrics
+
+    assert client.get("/api/admin/memory").status_code == 403
+    status = client.get("/api/admin/memory?token=test-token").get_json()
+    assert status["tracing"] is False and "top" not in status
+    try:
+        assert client.get("/api/admin/memory?token=test-token&action=start").get_json()["tracing"] is True
+        assert client.get("/api/admin/memory?token=test-token&action=snapshot").get_json()["has_baseline"] is True
+        metrics.REGISTRY.reset()
+        register(client, email="memory@example.edu", name="Memory")
+        client.get("/api/state")
+
+        top = client.get("/api/admin/memory?token=test-token&limit=5").get_json()
+        assert len(top["top"]) == 5 and top["traced"]["current_bytes"] > 0
+        diff = client.get("/api/admin/memory?token=test-token&action=diff&limit=5").get_json()["diff"]
+        assert diff and "size_diff_bytes" in diff[0]
+        peaks = metrics.collect(None)["bac_http_request_peak_alloc_bytes"]
+        assert peaks[(("method", "GET"), ("route", "/api/state"))]["count"] == 1
+    finally:
+        memtrack.stop()
+
+
+def test_traffic_capture_records_shapes_without_secrets(client, tmp_path, monkeypatch):
+    capture_dir = tmp_path / "traffic"
+    client.get("/api/state")
+    assert not capture_dir.exists()
+
+    monkeypatch.setenv("TRAFFIC_CAPTURE_DIR", str(capture_dir))
+    monkeypatch.setenv("TRAFFIC_CAPTURE_SAMPLE_RATE", "1")
+    register(client, email="capture@example.edu", password="hunter2hunter2", name="Capture")
+    client.post("/api/setup", json={"weight_lb": 170, "is_male": True})
+    client.post("/api/drink", json={"catalog_id": "bud-light", "count": 1, "hours_ago": 0, "sip_minutes": 0})
+    group = client.post("/api/social/groups/create", json={"name": "Capture crew"}).get_json()["group"]
+    token = client.post(f"/api/social/groups/{group['id']}/guardian-links", json={"label": "Mom"}).get_json()["item"]["token"]
+    client.get(f"/api/guardian/{token}?since_alert_id=3")
+    client.get("/api/admin/memory?token=test-token")
+
+    raw = (capture_dir / "traffic.jsonl").read_text()
+    for secret in ("capture@example.edu", "hunter2hunter2", token, group["invite_code"], "Capture crew", "bud-light", "test-token"):
+        assert secret not in raw
+    records = [json.loads(line) for line in raw.splitlines()]
+    routes = [r["route"] for r in records]
+    assert routes == [
+        "/api/auth/register",
+        "/api/setup",
+        "/api/drink",
+        "/api/social/groups/create",
+        "/api/social/groups/<int:group_id>/guardian-links",
+        "/api/guardian/<token>",
+    ]
+    register_rec, _, drink, _, link, guardian = records
+    assert register_rec["body"]["email"] == "str" and register_rec["body"]["default_weight_lb"] == "int"
+    assert drink["body"] == {"catalog_id": "str", "count": "int", "hours_ago": "int", "sip_minutes": "int"}
+    assert drink["status"] == 200 and drink["duration_ms"] > 0
+    assert len({r["actor"] for r in records[:5]}) == 1 and guardian["actor"] == drink["actor"]
+    assert link["args"]["group_id"] != str(group["id"]) and len(link["args"]["group_id"]) == 16
+    assert guardian["args"] == {"token": "<redacted>"} and guardian["query"] == ["since_alert_id"]
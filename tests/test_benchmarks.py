@@ -0,0 +1,76 @@
+"""Smoke tests for the benchmark scripts under benchmarks/."""
+
+from bac_app import auth_store, feedback_store, synthetic
+from bac_app.catalog import get_entry
+from benchmarks.bench_compute import compare_results, make_events
+from benchmarks.bench_storage import BenchContext, Population, build_cases, growth_table, seed, time_case, uncovered
+from benchmarks.bench_throughput import process_range
+
+
+def test_benchmark_compare_flags_regressions_past_threshold():
+    events = make_events(500)
+    assert events == make_events(500)
+    assert len(events) == 500 and min(t for t, _ in events) >= -24.0
+
+    baseline = {"results": {"bac_curve[n=10]": {"min_us": 100.0}, "time_to_sober[n=10]": {"min_us": 100.0}}}
+    current = {
+        "results": {
+            "bac_curve[n=10]": {"min_us": 125.0},
+            "time_to_sober[n=10]": {"min_us": 105.0},
+            "bac_at_time[n=10]": {"min_us": 3.0},
+        }
+    }
+    rows, regressions = compare_results(baseline, current, threshold_pct=10.0)
+    assert regressions == ["bac_curve[n=10]"]
+    assert {r["case"]: r["change_pct"] for r in rows} == {
+        "bac_curve[n=10]": 25.0,
+        "time_to_sober[n=10]": 5.0,
+        "bac_at_time[n=10]": None,
+    }
+    assert compare_results(baseline, current, threshold_pct=30.0)[1] == []
+
+
+def test_storage_benchmark_covers_every_public_function(tmp_path):
+    cases = build_cases()
+    assert uncovered(cases) == []
+
+    db_path, feedback_db = str(tmp_path / "app.db"), str(tmp_path / "feedback.db")
+    auth_store.init_db(db_path)
+    feedback_store.init_db(feedback_db)
+    pop = Population.for_scale(1000)
+    counts = seed(db_path, feedback_db, pop)
+    assert counts["users"] == pop.users and counts["session_events"] == pop.events
+
+    ctx = BenchContext(db=db_path, feedback_db=feedback_db, pop=pop)
+    ctx.load()
+    assert ctx.session_ids
+    results = {case.name: time_case(ctx, case, repeat=1) for case in cases}
+    assert results["auth_store.list_friend_feed"]["queries"] >= 1
+    auth_store.flush_presence(db_path)
+    auth_store.clear_snapshot_cache(db_path)
+    auth_store.clear_alert_cooldowns(db_path)
+
+    report = {"scales": {"1000": {"results": {"f": {"median_ms": 1.0}}}, "100000": {"results": {"f": {"median_ms": 4.0}}}}}
+    assert growth_table(report, flag_ratio=3.0) == [{"function": "f", "cells": [{"median_ms": 1.0}, {"median_ms": 4.0}], "growth": 4.0, "flagged": True}]
+
+
+def test_synthetic_sessions_are_seeded_sliceable_and_plausible():
+    stream = list(synthetic.generate(200, seed=7))
+    assert [s.drinks for s in stream] == [s.drinks for s in synthetic.generate(200, seed=7)]
+    assert [s.drinks for s in synthetic.generate(50, seed=7, start=150)] == [s.drinks for s in stream[150:]]
+    assert [s.drinks for s in stream] != [s.drinks for s in synthetic.generate(200, seed=8)]
+
+    assert {s.pacing for s in stream} == set(synthetic.PACING)
+    assert {s.is_male for s in stream} == {True, False}
+    for spec in stream:
+        assert synthetic.MIN_WEIGHT_LB <= spec.weight_lb <= synthetic.MAX_WEIGHT_LB
+        assert spec.drinks
+        for drink in spec.drinks:
+            assert get_entry(drink.catalog_id) is not None
+            assert drink.sip_minutes in (0, 15, 30)
+            assert 0.0 <= drink.effective_hours_ago <= synthetic.MAX_HOURS_AGO
+        assert spec.to_session().events == spec.events()
+
+    result = process_range(0, 20, 7, True)
+    assert result["sessions"] == 20 and result["drinks"] == sum(len(s.drinks) for s in stream[:20])
+    assert result["stage_sec"]["get_plan"] > 0
@@ -0,0 +1,150 @@
+"""Presence buffering, BAC projection and incremental presence feeds."""
+
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from bac_app import auth_store
+from bac_app.calculations import bac_at_time
+from bac_app.presence import PresenceBuffer, models_equivalent, presence_model, project_bac_many
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "app.db")
+    auth_store.init_db(path)
+    yield path
+    auth_store.flush_presence(path)
+    auth_store.clear_snapshot_cache()
+
+
+def _user(db_path, name):
+    return auth_store.create_user(
+        db_path,
+        email=f"{name}@example.com",
+        password="password123",
+        display_name=name.title(),
+        username=None,
+        is_male=True,
+        default_weight_lb=170,
+    )
+
+
+def test_presence_model_projects_bac_at_read_time():
+    events = [(-1.0, 14.0), (-0.25, 28.0), (-20.0, 14.0)]
+    model = presence_model(events, 160, True, at_epoch=100_000)
+    assert model.count("[") == 3  # the drink from 20h ago is fully eliminated
+    now, missing = project_bac_many([model, None], at_epoch=100_000)
+    later = project_bac_many([model], at_epoch=103_600)[0]
+    assert missing is None
+    assert abs(now - bac_at_time(0.0, events, 160, True)) < 0.0002
+    assert abs(later - bac_at_time(1.0, events, 160, True)) < 0.0002
+    assert models_equivalent(model, presence_model(events, 160, True, at_epoch=100_030))
+
+
+def test_incremental_polls_follow_projected_bac(db_path):
+    viewer, drinker, sober = _user(db_path, "viewer"), _user(db_path, "drinker"), _user(db_path, "sober")
+    group = auth_store.create_group(db_path, owner_user_id=viewer["id"], name="Crew")
+    for member in (drinker, sober):
+        auth_store.join_group_by_code(db_path, user_id=member["id"], invite_code=group["invite_code"])
+        auth_store.set_group_share_enabled(db_path, group_id=group["id"], user_id=member["id"], enabled=True)
+        auth_store.set_share_with_friends(db_path, user_id=member["id"], enabled=True)
+        auth_store.add_friendship(db_path, user_a=viewer["id"], user_b=member["id"])
+    link = auth_store.create_guardian_link(db_path, group_id=group["id"], label="Parent")
+
+    # Both rows were last written 30 minutes ago, when the previous poll's cursor was issued.
+    then = datetime.now(timezone.utc) - timedelta(minutes=30)
+    model = presence_model([(-1.0, 28.0), (-0.5, 14.0)], 170, True, at_epoch=then.timestamp())
+    auth_store.upsert_presence(db_path, user_id=drinker["id"], bac_now=0.05, drink_count=2, bac_model=model)
+    auth_store.upsert_presence(db_path, user_id=sober["id"], bac_now=0.0, drink_count=0)
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute("UPDATE user_presence SET updated_at = ?", ((then - timedelta(seconds=5)).strftime(auth_store.PRESENCE_CURSOR_FORMAT),))
+        conn.commit()
+    finally:
+        conn.close()
+    cursor = then.strftime(auth_store.PRESENCE_CURSOR_FORMAT)
+    auth_store.clear_snapshot_cache()
+
+    bac_at_cursor = project_bac_many([model], at_epoch=then.timestamp())[0]
+    snapshot = auth_store.get_group_snapshot(db_path, group_id=group["id"], user_id=viewer["id"], updated_since=cursor)
+    [member] = snapshot["members"]
+    assert member["user_id"] == drinker["id"]
+    assert 0 < member["bac_now"] < bac_at_cursor - 0.005
+
+    [friend] = auth_store.list_friend_feed(db_path, user_id=viewer["id"], updated_since=cursor)
+    assert friend["user_id"] == drinker["id"] and friend["bac_now"] == pytest.approx(member["bac_now"], abs=1e-4)
+
+    guardian = auth_store.get_group_snapshot_by_guardian_token(db_path, token=link["token"], updated_since=cursor)
+    assert [m["display_name"] for m in guardian["members"]] == ["Drinker"]
+
+    # Once nothing can change before the next poll, incremental polls go quiet.
+    assert auth_store.list_friend_feed(db_path, user_id=viewer["id"], updated_since=auth_store.presence_cursor_now()) == []
+
+
+def test_incremental_group_polls_do_not_reveal_hidden_heartbeats(db_path):
+    viewer, hider = _user(db_path, "viewer"), _user(db_path, "hider")
+    group = auth_store.create_group(db_path, owner_user_id=viewer["id"], name="Crew")
+    auth_store.join_group_by_code(db_path, user_id=hider["id"], invite_code=group["invite_code"])
+    auth_store.set_group_share_enabled(db_path, group_id=group["id"], user_id=hider["id"], enabled=False)
+
+    def poll(cursor):
+        snapshot = auth_store.get_group_snapshot(db_path, group_id=group["id"], user_id=viewer["id"], updated_since=cursor)
+        return {m["user_id"]: m for m in snapshot["members"]}, snapshot["cursor"]["updated_since"]
+
+    quiet, cursor = poll(None)
+    quiet, cursor = poll(cursor)
+    auth_store.record_presence(db_path, user_id=hider["id"], bac_now=0.04, drink_count=2)
+    active, _ = poll(cursor)
+
+    assert set(quiet) == set(active) == {hider["id"]}
+    assert quiet[hider["id"]] == active[hider["id"]]
+    assert active[hider["id"]]["bac_now"] is None and active[hider["id"]]["updated_at"] is None
+
+
+def test_presence_buffer_skips_unchanged_heartbeats():
+    buf = PresenceBuffer(bac_epsilon=0.005, max_staleness_sec=300)
+    assert buf.record(1, bac_now=0.05, drink_count=2, location_note=None, updated_at="t0", now=0) is True
+    assert len(buf.take_pending(now=0)) == 1
+    assert buf.record(1, bac_now=0.052, drink_count=2, location_note=None, updated_at="t1", now=60) is False
+    assert buf.get(1)["updated_at"] == "t1"
+    assert buf.record(1, bac_now=0.052, drink_count=3, location_note=None, updated_at="t2", now=120) is True
+    buf.take_pending(now=120)
+    assert buf.record(1, bac_now=0.052, drink_count=3, location_note=None, updated_at="t3", now=420) is True
+
+
+def test_presence_buffer_forgets_idle_users_after_flush():
+    buf = PresenceBuffer(max_staleness_sec=300)
+    buf.record(1, bac_now=0.05, drink_count=2, location_note=None, updated_at="2026-01-01 00:00:00", now=0)
+    buf.record(2, bac_now=0.02, drink_count=1, location_note=None, updated_at="2026-01-01 00:04:00", now=240)
+    assert len(buf.take_pending(now=240)) == 2
+    buf.take_pending(now=400)
+    assert buf.get(1) is None and buf.get(2) is not None
+    # A row still waiting to be written is kept however long the user is idle.
+    buf.record(2, bac_now=0.02, drink_count=4, location_note=None, updated_at="2026-01-01 00:11:00", now=660)
+    assert [row["drink_count"] for row in buf.take_pending(now=200_000)] == [4]
+    assert buf.get(2) is not None
+    buf.take_pending(now=200_000)
+    assert buf.get(2) is None
+
+    buf.record(3, bac_now=0.0, drink_count=0, location_note=None, updated_at="2026-01-01 00:20:00", now=0)
+    assert buf.discard_older_than("2026-01-01 00:05:00") == 0
+    assert buf.discard_older_than("2026-01-01 00:30:00") == 1 and buf.get(3) is None
+
+
+def test_prune_stale_presence_drops_buffered_copies(db_path):
+    user = _user(db_path, "idle")
+    auth_store.record_presence(db_path, user_id=user["id"], bac_now=0.03, drink_count=1)
+    assert auth_store.flush_presence(db_path) == 1
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute("UPDATE user_presence SET updated_at = '2020-01-01 00:00:00'")
+        conn.commit()
+    finally:
+        conn.close()
+    auth_store._presence_buffer(db_path)._entries[user["id"]].updated_at = "2020-01-01 00:00:00"
+
+    assert auth_store.prune_stale_presence(db_path, older_than_hours=48) == 1
+    assert auth_store._presence_buffer(db_path).get(user["id"]) is None
+    assert auth_store.flush_presence(db_path) == 0
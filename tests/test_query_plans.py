@@ -0,0 +1,284 @@
+"""Query-plan regression tests for auth_store.
+
+A realistic dataset is seeded, a workload touching every public storage
+function is run while statements are recorded, and each recorded statement is
+re-planned with EXPLAIN QUERY PLAN. Any full-table scan of a table that grows
+with usage fails the test, so new queries must come with a supporting index.
+"""
+
+import re
+import sqlite3
+import time
+
+import pytest
+
+from bac_app import auth_store
+
+# Tables that stay tiny no matter how many users there are.
+SMALL_TABLES = {"app_metadata", "maintenance_locks"}
+
+# Statements that scan on purpose, keyed by a fragment of their SQL.
+ALLOWED_SCANS = {
+    # One-off startup backfill of rows written before summary columns existed.
+    "WHERE drink_count IS NULL OR session_date IS NULL": "saved_sessions",
+}
+
+SEED_USERS = 60
+
+
+def _partial_indexes(conn):
+    rows = conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL")
+    return {name for name, sql in rows if " WHERE " in sql.upper()}
+
+
+def _plan_scans(conn, query, params):
+    rows = conn.execute("EXPLAIN QUERY PLAN " + query, params).fetchall()
+    partial = _partial_indexes(conn)
+    scans = []
+    for row in rows:
+        detail = row[-1]
+        match = re.match(r"SCAN (\w+)(?: AS \w+)?(?: USING (?:COVERING )?INDEX (\w+))?", detail)
+        if not match:
+            continue
+        table, index = match.group(1), match.group(2)
+        # A partial index only holds the rows its WHERE clause selects.
+        if table in SMALL_TABLES or index in partial:
+            continue
+        scans.append(detail)
+    return scans
+
+
+def _resolve_alias(conn, query, scan_detail):
+    name = scan_detail.split()[1]
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    if name in tables:
+        return name
+    alias = re.search(r"(?:FROM|JOIN)\s+(\w+)\s+(?:AS\s+)?" + re.escape(name) + r"\b", query, re.IGNORECASE)
+    return alias.group(1) if alias else name
+
+
+def _seed(db_path):
+    users = []
+    for i in range(SEED_USERS):
+        user = auth_store.create_user(
+            db_path,
+            email=f"user{i}@example.edu",
+            password="password123",
+            display_name=f"User {i}",
+            username=f"user{i}",
+            is_male=bool(i % 2),
+            default_weight_lb=150 + i,
+        )
+        users.append(user)
+    now = int(time.time())
+    for i, user in enumerate(users):
+        uid = user["id"]
+        payload = {"weight_lb": 160, "is_male": True, "events": [[-1.0, 14.0, 150, 10.0, 1.0]], "saved_at_epoch": now}
+        for n in range(3):
+            auth_store.save_user_session(db_path, user_id=uid, name=f"Night {n}", payload=payload)
+        auth_store.track_favorite_drink(db_path, user_id=uid, catalog_id="bud-light")
+        auth_store.add_emergency_contact(db_path, user_id=uid, name="Roommate", phone="555-0100")
+        friend = users[(i + 1) % len(users)]
+        auth_store.add_friendship(db_path, user_a=uid, user_b=friend["id"])
+        auth_store.set_share_with_friends(db_path, user_id=uid, enabled=True)
+        auth_store.upsert_presence(db_path, user_id=uid, bac_now=0.02, drink_count=1)
+    for i in range(0, len(users), 6):
+        group = auth_store.create_group(db_path, owner_user_id=users[i]["id"], name=f"Group {i}")
+        for member in users[i + 1 : i + 6]:
+            auth_store.join_group_by_code(db_path, user_id=member["id"], invite_code=group["invite_code"])
+            auth_store.set_group_share_enabled(db_path, group_id=group["id"], user_id=member["id"], enabled=True)
+            auth_store.create_group_alert(
+                db_path, group_id=group["id"], alert_type="check", message="check", from_user_id=member["id"]
+            )
+        auth_store.create_guardian_link(db_path, group_id=group["id"], label="Parent")
+    return users
+
+
+def _workload(db_path, users):
+    a, b, c = users[0], users[1], users[2]
+    now = int(time.time())
+    auth_store.authenticate_user(db_path, email=a["email"], password="password123")
+    auth_store.authenticate_user(db_path, email=a["username"], password="password123")
+    auth_store.get_user_by_id(db_path, a["id"])
+    auth_store.verify_user_password(db_path, user_id=a["id"], password="password123")
+    auth_store.update_user_profile(
+        db_path, user_id=a["id"], display_name="User A", username="usera", is_male=True, default_weight_lb=170
+    )
+    auth_store.find_user_by_email(db_path, email=b["email"])
+    auth_store.find_user_by_username(db_path, username=b["username"])
+    auth_store.find_user_by_invite_code(db_path, invite_code=b["invite_code"])
+    auth_store.get_schema_version(db_path)
+
+    payload = {"weight_lb": 160, "is_male": True, "events": [[0.0, 14.0, 150, 10.0, 1.0]], "saved_at_epoch": now}
+    session_id = auth_store.upsert_auto_session(
+        db_path, user_id=a["id"], name="Auto", payload=payload, event_time_iso="2026-01-01T20:00:00", touch_last_event=True
+    )
+    auth_store.upsert_auto_session(
+        db_path, user_id=a["id"], name="Auto", payload=payload, event_time_iso="2026-01-01T20:05:00", touch_last_event=False
+    )
+    auth_store.apply_session_event_changes(
+        db_path, user_id=a["id"], session_id=session_id, removed=[], added=[(now, 14.0, 150, 10.0, 1.0)],
+        logged_at_iso="2026-01-01T20:00:00",
+    )
+    auth_store.apply_session_event_changes(
+        db_path, user_id=a["id"], session_id=session_id, removed=[(now, 14.0, 150, 10.0, 1.0)], added=[],
+        logged_at_iso="2026-01-01T20:01:00",
+    )
+    auth_store.reset_session_events(
+        db_path, user_id=a["id"], session_id=session_id, events=[(now, 14.0, 150, 10.0, 1.0)],
+        logged_at_iso="2026-01-01T20:02:00",
+    )
+    auth_store.get_active_auto_session(db_path, user_id=a["id"])
+    auth_store.list_session_events(db_path, user_id=a["id"], session_id=session_id)
+    sessions = auth_store.list_user_sessions(db_path, user_id=a["id"], include_active=True)
+    auth_store.list_user_sessions(db_path, user_id=a["id"], session_date=sessions[0]["session_date"], before_id=sessions[0]["id"])
+    auth_store.list_session_dates(db_path, user_id=a["id"], before_date="2999-01-01")
+    auth_store.get_user_session_payload(db_path, user_id=a["id"], session_id=sessions[-1]["id"])
+    auth_store.get_session_payloads(db_path, user_id=a["id"], session_ids=[s["id"] for s in sessions])
+    auth_store.list_recent_session_payloads(db_path, user_id=a["id"])
+    auth_store.finalize_active_auto_session(db_path, user_id=a["id"], payload=payload)
+    auth_store.backfill_session_summaries(db_path)
+    auth_store.save_user_sessions_many(
+        db_path,
+        user_id=a["id"],
+        sessions=[
+            {
+                "name": "Imported",
+                "payload": payload,
+                "started_at": "2025-01-01T20:00:00",
+                "ended_at": "2025-01-01T22:00:00",
+                "created_at": "2025-01-02 03:00:00",
+                "session_date": "2025-01-01",
+            }
+        ],
+    )
+    auth_store.list_favorite_drinks(db_path, user_id=a["id"])
+
+    auth_store.get_share_with_friends(db_path, user_id=a["id"])
+    auth_store.upsert_presence_many(
+        db_path, [{"user_id": a["id"], "bac_now": 0.05, "drink_count": 2, "location_note": None, "bac_model": None}]
+    )
+    auth_store.list_friends(db_path, user_id=a["id"])
+    auth_store.are_friends(db_path, user_a=a["id"], user_b=b["id"])
+    auth_store.send_friend_request(db_path, from_user_id=a["id"], to_user_id=c["id"])
+    incoming = auth_store.list_incoming_friend_requests(db_path, user_id=c["id"])
+    auth_store.respond_friend_request(db_path, user_id=c["id"], request_id=incoming[0]["request_id"], accept=True)
+    auth_store.list_friend_feed(db_path, user_id=a["id"])
+    auth_store.list_friend_feed(db_path, user_id=a["id"], updated_since=auth_store.presence_cursor_now())
+
+    group = auth_store.list_user_groups(db_path, user_id=a["id"])[0]
+    gid = group["id"]
+    auth_store.is_group_member(db_path, group_id=gid, user_id=b["id"])
+    auth_store.get_group_role(db_path, group_id=gid, user_id=b["id"])
+    auth_store.set_group_member_role(db_path, group_id=gid, target_user_id=b["id"], role="mod")
+    auth_store.set_group_buddy_pair(db_path, group_id=gid, user_a=b["id"], user_b=c["id"])
+    auth_store.clear_group_buddy_pair(db_path, group_id=gid, user_id=b["id"])
+    auth_store.clear_alert_cooldowns()
+    auth_store.maybe_create_threshold_alert(db_path, user_id=b["id"], bac_now=0.12)
+    auth_store.clear_snapshot_cache()
+    auth_store.get_group_snapshot(db_path, group_id=gid, user_id=a["id"])
+    link = auth_store.create_guardian_link(db_path, group_id=gid, label="Guardian")
+    auth_store.list_guardian_links(db_path, group_id=gid)
+    auth_store.set_guardian_link_alerts(db_path, group_id=gid, link_id=link["id"], enabled=False)
+    auth_store.clear_snapshot_cache()
+    auth_store.get_group_snapshot_by_guardian_token(db_path, token=link["token"])
+    auth_store.revoke_guardian_link(db_path, group_id=gid, link_id=link["id"])
+    auth_store.get_privacy_summary(db_path, user_id=a["id"])
+    auth_store.revoke_all_sharing_for_user(db_path, user_id=b["id"])
+
+    contacts = auth_store.list_emergency_contacts(db_path, user_id=a["id"])
+    auth_store.delete_emergency_contact(db_path, user_id=a["id"], contact_id=contacts[0]["id"])
+    token = auth_store.create_password_reset_token(db_path, email=c["email"])
+    auth_store.consume_password_reset_token(db_path, token=token, new_password="password456")
+    verify = auth_store.create_email_verification_token(db_path, user_id=c["id"])
+    auth_store.verify_email_token(db_path, token=verify)
+    for dataset in auth_store.ACCOUNT_EXPORT_QUERIES:
+        auth_store.list_account_rows(db_path, user_id=a["id"], dataset=dataset)
+
+    auth_store.acquire_maintenance_lock(db_path, name="maintenance", owner="test", ttl_sec=60)
+    auth_store.release_maintenance_lock(db_path, name="maintenance", owner="test")
+    auth_store.finalize_abandoned_auto_sessions(db_path, inactive_hours=3, max_active_hours=12)
+    auth_store.prune_group_alerts(db_path, older_than_days=30)
+    auth_store.delete_expired_tokens(db_path)
+    auth_store.prune_stale_presence(db_path, older_than_hours=168)
+    auth_store.compact_closed_session_events(db_path, older_than_days=7)
+    auth_store.delete_user_account(db_path, user_id=users[-1]["id"], purge=False)
+    auth_store.purge_deleted_users(db_path)
+
+
+@pytest.fixture(scope="module")
+def recorded_queries(tmp_path_factory):
+    db_path = str(tmp_path_factory.mktemp("plans") / "plans.db")
+    auth_store.init_db(db_path)
+    users = _seed(db_path)
+
+    recorded: list[tuple[str, tuple]] = []
+    original = auth_store._ConnWrapper.execute
+
+    def recording_execute(self, query, params=()):
+        recorded.append((query, tuple(params)))
+        return original(self, query, params)
+
+    auth_store._ConnWrapper.execute = recording_execute
+    try:
+        _workload(db_path, users)
+    finally:
+        auth_store._ConnWrapper.execute = original
+        auth_store.clear_snapshot_cache()
+        auth_store.clear_alert_cooldowns()
+    return db_path, recorded
+
+
+def test_workload_covers_storage_queries(recorded_queries):
+    _, recorded = recorded_queries
+    assert len({q for q, _ in recorded}) > 80
+
+
+def test_no_full_table_scans(recorded_queries):
+    db_path, recorded = recorded_queries
+    conn = sqlite3.connect(db_path)
+    failures = []
+    seen = set()
+    try:
+        for query, params in recorded:
+            head = query.lstrip().split(None, 1)[0].upper()
+            if head not in {"SELECT", "UPDATE", "DELETE", "INSERT"} or query in seen:
+                continue
+            seen.add(query)
+            allowed = next((table for frag, table in ALLOWED_SCANS.items() if frag in query), None)
+            for scan in _plan_scans(conn, query, params):
+                table = _resolve_alias(conn, query, scan)
+                if table in SMALL_TABLES or table == allowed:
+                    continue
+                failures.append(f"{scan}\n{' '.join(query.split())}")
+    finally:
+        conn.close()
+    assert not failures, "full-table scans:\n\n" + "\n\n".join(failures)
+
+
+def test_postgres_coalesce_fallbacks_match_text_columns(recorded_queries):
+    # session_date is TEXT on Postgres; COALESCE with a bare date() fails there with
+    # "COALESCE types text and date cannot be matched".
+    _, recorded = recorded_queries
+    adapted = {auth_store._adapt_sql_for_postgres(query) for query, _ in recorded}
+    mismatched = [" ".join(q.split()) for q in adapted if re.search(r"COALESCE\(\s*session_date\s*,\s*date\(", q)]
+    assert not mismatched
+    assert any("CAST(date(created_at) AS TEXT)" in q for q in adapted)
+
+
+def test_session_date_falls_back_to_text_for_unbackfilled_rows(tmp_path):
+    db_path = str(tmp_path / "dates.db")
+    auth_store.init_db(db_path)
+    user = auth_store.create_user(
+        db_path, email="d@example.com", password="password123", display_name="D", username=None, is_male=True, default_weight_lb=170
+    )
+    auth_store.save_user_session(db_path, user_id=user["id"], name="Old", payload={"weight_lb": 170, "is_male": True, "events": []})
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute("UPDATE saved_sessions SET session_date = NULL, created_at = '2025-03-01 02:00:00'")
+        conn.commit()
+        assert conn.execute("SELECT type FROM pragma_table_info('saved_sessions') WHERE name = 'session_date'").fetchone()[0] == "TEXT"
+    finally:
+        conn.close()
+    [row] = auth_store.list_user_sessions(db_path, user_id=user["id"])
+    assert row["session_date"] == "2025-03-01"